@@ -0,0 +1,228 @@
+# analytics_mirror.py
+"""
+Analytical mirror of hired_employees for reports: a local Parquet dataset partitioned by year and quarter
+(RESULTS/ANALYTICS/hired_employees/year=2021/quarter=3/part-*.parquet), so report scans don't hit the database.
+
+The mirror is appended by each committed import batch, cleared by truncates and rebuilt from Avro backups
+(on restore or with `python manage.py rebuild-mirror`). Reports read it with partition pruning (years/date range)
+and column projection. Requires pyarrow, enabled with ANALYTICS_MIRROR_ENABLED=true.
+
+The mirror is used only while it's "ready" (RESULTS/ANALYTICS/hired_employees/_READY exists): a failed append marks it
+stale and reports go back to the database until the next rebuild.
+"""
+import os
+import glob
+import uuid
+import shutil
+import threading
+import pandas as pd
+
+from config import ANALYTICS_FOLDER, BACKUPS_FOLDER, ANALYTICS_MIRROR_ENABLED, SHOW_CONSOLE_LOGS_REPORTS
+
+MIRROR_FOLDER = f"{ANALYTICS_FOLDER}/hired_employees"
+READY_FILE = f"{MIRROR_FOLDER}/_READY"
+# columns used by the reports
+MIRROR_COLUMNS = ["id", "datetime", "department_id", "job_id"]
+
+# appends, clears and rebuilds of this process (writers of hired_employees are also serialized by the table lock)
+mirror_lock = threading.Lock()
+
+
+def get_mirror_schema():
+    """ Arrow schema of the dataset files and the hive partitioning (year=/quarter=) """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("datetime", pa.timestamp("us")),
+        ("department_id", pa.int64()),
+        ("job_id", pa.int64()),
+    ])
+    partitioning = ds.partitioning(pa.schema([("year", pa.int16()), ("quarter", pa.int8())]), flavor="hive")
+    return schema, partitioning
+
+
+def is_mirror_ready():
+    """ True if reports can read the mirror """
+    return ANALYTICS_MIRROR_ENABLED and os.path.exists(READY_FILE)
+
+
+def mark_mirror_stale(reason):
+    """ Stop using the mirror until it's rebuilt """
+    print(f"Analytics mirror marked stale ({reason}), run `python manage.py rebuild-mirror`")
+    if os.path.exists(READY_FILE):
+        os.remove(READY_FILE)
+
+
+def to_mirror_frame(df):
+    """ Mirror columns of hired_employees rows with year/quarter partition columns (tz-aware datetimes keep their wall time, as in the database) """
+    df = pd.DataFrame({column: df[column] for column in MIRROR_COLUMNS})
+    datetimes = pd.to_datetime(df["datetime"])
+    if datetimes.dt.tz is not None:
+        datetimes = datetimes.dt.tz_localize(None)
+    df["datetime"] = datetimes.astype("datetime64[us]")
+    # rows without a datetime can't be partitioned, they are never counted by the reports either
+    df = df[df["datetime"].notnull()].copy()
+    for column in ["id", "department_id", "job_id"]:
+        df[column] = df[column].astype("int64")
+    df["year"] = df["datetime"].dt.year.astype("int16")
+    df["quarter"] = df["datetime"].dt.quarter.astype("int8")
+    return df
+
+
+def write_mirror_files(df, base_dir):
+    """ Write rows as new parquet files in their year/quarter partitions """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    schema, partitioning = get_mirror_schema()
+    table = pa.Table.from_pandas(df, schema=schema.append(pa.field("year", pa.int16())).append(pa.field("quarter", pa.int8())), preserve_index=False)
+    ds.write_dataset(
+        table, base_dir, format="parquet", partitioning=partitioning,
+        basename_template=f"part-{uuid.uuid4()}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def append_to_mirror(valid_df):
+    """
+    Append the rows of a committed hired_employees import batch. Errors don't fail the import, they mark the mirror stale.
+    Returns:
+        bool: True if the rows were appended
+    """
+    if not is_mirror_ready() or valid_df.empty:
+        return False
+    with mirror_lock:
+        try:
+            write_mirror_files(to_mirror_frame(valid_df), MIRROR_FOLDER)
+            return True
+        except Exception as e:
+            mark_mirror_stale(f"append failed: {e}")
+            return False
+
+
+def reset_mirror():
+    """ Empty (but ready) mirror, e.g. after hired_employees is truncated """
+    if not ANALYTICS_MIRROR_ENABLED:
+        return
+    with mirror_lock:
+        shutil.rmtree(MIRROR_FOLDER, ignore_errors=True)
+        os.makedirs(MIRROR_FOLDER, exist_ok=True)
+        open(READY_FILE, "w").close()
+
+
+def get_latest_backup_file():
+    """ Newest hired_employees Avro backup, or None """
+    backup_files = glob.glob(f"{BACKUPS_FOLDER}/hired_employees___*.avro")
+    return max(backup_files, key=os.path.getmtime) if backup_files else None
+
+
+def get_live_row_count():
+    """ hired_employees row count of the table_counts stats table, read on the primary (imported here, table_counts imports models) """
+    from sqlalchemy import text
+    from models import engine
+
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT row_count FROM table_counts WHERE table_name = 'hired_employees'")).scalar()
+
+
+def rebuild_mirror_from_backup(backup_file=None, batch_size=100000):
+    """
+    Rebuild the mirror from an Avro backup of hired_employees (compacts the small files written by imports).
+    The new dataset is written next to the current one and swapped in when complete.
+    It's marked ready only if the backup has as many rows as the live table (table_counts): rows committed after
+    the backup would be missing from the mirror, so it's swapped in stale and reports keep reading the database.
+
+    Args:
+        backup_file (str): path of the backup, defaults to the newest hired_employees backup
+        batch_size (int): records per written batch
+    Returns:
+        dict: {"backup_file", "rows", "live_rows", "ready"}
+    Raises:
+        FileNotFoundError: no backup available
+    """
+    import fastavro
+
+    backup_file = backup_file or get_latest_backup_file()
+    if backup_file is None or not os.path.exists(backup_file):
+        raise FileNotFoundError(f"No hired_employees backup to rebuild the analytics mirror from: {backup_file}")
+
+    tmp_folder = f"{MIRROR_FOLDER}__rebuild"
+    shutil.rmtree(tmp_folder, ignore_errors=True)
+    os.makedirs(tmp_folder)
+    rows = 0
+    with mirror_lock:
+        with open(backup_file, "rb") as f:
+            records = []
+            for record in fastavro.reader(f):
+                records.append(record)
+                if len(records) >= batch_size:
+                    write_mirror_files(to_mirror_frame(pd.DataFrame.from_records(records)), tmp_folder)
+                    rows += len(records)
+                    records = []
+            if records:
+                write_mirror_files(to_mirror_frame(pd.DataFrame.from_records(records)), tmp_folder)
+                rows += len(records)
+
+        # the caller holds the hired_employees table lock, no batch can be committed until the swap
+        live_rows = get_live_row_count()
+        ready = live_rows == rows
+        if ready:
+            open(f"{tmp_folder}/_READY", "w").close()
+        shutil.rmtree(MIRROR_FOLDER, ignore_errors=True)
+        os.replace(tmp_folder, MIRROR_FOLDER)
+
+    if not ready:
+        mark_mirror_stale(f"backup {os.path.basename(backup_file)} has {rows} rows, hired_employees has {live_rows}")
+    elif SHOW_CONSOLE_LOGS_REPORTS:
+        print(f"Analytics mirror rebuilt from {backup_file}: {rows} rows")
+    return {"backup_file": backup_file, "rows": rows, "live_rows": live_rows, "ready": ready}
+
+
+def get_mirror_filter(periods):
+    """
+    Arrow filter expression for report periods. Partition fields (year) prune whole directories,
+    the datetime bounds are applied to the remaining row groups.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from periods import get_date_range_end
+
+    conditions = []
+    if periods["years"]:
+        conditions.append(ds.field("year").isin(periods["years"]))
+    if periods["start_date"] is not None:
+        conditions.append(ds.field("year") >= periods["start_date"].year)
+        conditions.append(ds.field("datetime") >= pa.scalar(periods["start_date"], pa.timestamp("us")))
+    if periods["end_date"] is not None:
+        conditions.append(ds.field("year") <= periods["end_date"].year)
+        conditions.append(ds.field("datetime") < pa.scalar(get_date_range_end(periods), pa.timestamp("us")))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def load_mirror_hired_employees(periods, columns=None):
+    """
+    hired_employees rows within the report periods from the mirror (only the needed partitions and columns are read).
+
+    Args:
+        periods (dict): parse_periods() result
+        columns (list): columns to read, default MIRROR_COLUMNS
+    Returns:
+        pd.DataFrame: same columns and dtypes as report_data.load_hired_employees()
+    """
+    import pyarrow.dataset as ds
+    from report_data import compact_hired_employees
+
+    schema, partitioning = get_mirror_schema()
+    for field in partitioning.schema:
+        schema = schema.append(field)
+    # _READY is skipped (files starting with _ or . are ignored)
+    dataset = ds.dataset(MIRROR_FOLDER, format="parquet", partitioning=partitioning, schema=schema)
+    table = dataset.to_table(columns=columns or MIRROR_COLUMNS, filter=get_mirror_filter(periods))
+    df = table.to_pandas()
+    df["datetime"] = df["datetime"].astype("datetime64[ns]")
+    return compact_hired_employees(df)
@@ -1,45 +1,142 @@
 import os
-from flask import Flask, jsonify, render_template, request, send_from_directory, abort
+from flask import Flask, jsonify, render_template, request, make_response, g
 import json
+import hashlib
+import time
 import traceback
-import mimetypes
 
-from config import RESULT_FOLDER, UPLOAD_FOLDER
-from models import initialize_db
-from csv_to_db import process_valid_invalid_results, get_table_counts, get_import_logs, force_truncate_table
-from backups import create_backup, restore_backup, get_backup_files
-
-from req001 import process_requirement1
-from req002 import process_requirement2
+from config import RESULT_FOLDER, UPLOAD_FOLDER, REPORT_SCHEDULER_ENABLED, ARTIFACT_USE_X_SENDFILE, create_result_folders
+from models import check_db_connection, engine, read_engine
+from db_pool import get_pool_stats
+from metrics import render_metrics, HTTP_REQUEST_SECONDS
+from artifacts import send_artifact
+from table_locks import TableBusyError
+from read_replica import get_replica_lag, get_read_engine
+from profiling import should_profile, start_request_profiler, stop_request_profiler
+from csv_to_db import process_valid_invalid_results, get_table_counts, get_import_logs, get_import_transactions, force_truncate_table, reprocess_quarantine
+from quarantine import QUARANTINE_TABLES, get_quarantine_summary
+from file_importer import is_archive, import_archive
+from backups import create_backup, restore_backup, verify_backup, get_backup_files
+
+from report_scheduler import start_report_scheduler, request_report_refresh, generate_report_snapshots, get_latest_snapshot
+from report_api import query_hires_by_quarter, query_top_departments, to_report_payload
+from periods import parse_periods
 
 app = Flask(__name__, template_folder='templates')
+# let Apache/lighttpd send /serve files (X-Sendfile header)
+app.config['USE_X_SENDFILE'] = ARTIFACT_USE_X_SENDFILE
+
+# Tables are created once with `python manage.py init-db` (not on every worker boot)
+create_result_folders()
 
-# Initialize the database
-valid_connection, error_msg = initialize_db()
-if not valid_connection:
-    print("Database connection failed")
-    exit()
-else:
-    print("Database connection Successful")
+# Pre-warm report snapshots in background
+# started on the first request (not at import) so it runs in each gunicorn worker when the app is preloaded,
+# threads started in the preloaded parent don't survive the fork (see gunicorn.conf.py post_fork)
+@app.before_request
+def ensure_report_scheduler():
+    start_report_scheduler()
 
 # TODO: securuty considerations/options (not implemented yet)
 # use simple API key 
 # use environment variable for API key
 # use authentication mechansim in cloud enironment
 
+# HTTP latency per route (route template, e.g. /serve/<path:filename>, to keep label cardinality low)
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def observe_request_latency(response):
+    if hasattr(g, "request_start"):
+        route = request.url_rule.rule if request.url_rule else "not_found"
+        HTTP_REQUEST_SECONDS.labels(route, request.method, response.status_code).observe(time.perf_counter() - g.request_start)
+    return response
+
+# PROFILING
+# e.g. curl -X POST -H "X-Profile: 1" -F "table_name=jobs" http://127.0.0.1:8080/backups-create
+# the profile artifacts are linked in the X-Profile-Pstats and X-Profile-Collapsed response headers
+@app.before_request
+def start_profiler():
+    if should_profile(request):
+        endpoint = request.endpoint or "not_found"
+        g.profiler = start_request_profiler(endpoint)
+
+@app.after_request
+def stop_profiler(response):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        if should_profile(request):
+            response.headers["X-Profile"] = "busy, another request is being profiled"
+        return response
+    profile = stop_request_profiler(profiler)
+    response.headers["X-Profile-Pstats"] = "/serve/" + os.path.relpath(profile["pstats"], RESULT_FOLDER)
+    response.headers["X-Profile-Collapsed"] = "/serve/" + os.path.relpath(profile["collapsed"], RESULT_FOLDER)
+    response.headers["X-Profile-Elapsed"] = str(profile["elapsed_seconds"])
+    print(f"Request profiled: {profile}")
+    return response
+
+@app.teardown_request
+def release_profiler(exception=None):
+    # after_request is skipped on unhandled errors, make sure the profiler is stopped
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        stop_request_profiler(profiler)
+
+# TABLE LOCKS (admission control)
+# imports, restores and truncates of a busy table (too many queued requests or lock wait timeout) get a 429
+@app.errorhandler(TableBusyError)
+def table_busy(e):
+    response = jsonify({"error": str(e), "table_name": e.table_name, "retry_after": e.retry_after})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+# METRICS (Prometheus text format)
+# e.g. curl http://127.0.0.1:8080/metrics
+@app.route("/metrics")
+def metrics():
+    pool_gauges = {f"db_pool_{name}": value for name, value in get_pool_stats(engine).items()}
+    if read_engine is not engine:
+        pool_gauges.update({f"db_read_pool_{name}": value for name, value in get_pool_stats(read_engine, "read").items()})
+    response = make_response(render_metrics(extra_gauges=pool_gauges), 200)
+    response.mimetype = "text/plain"
+    return response
+
+
 # HOME
 @app.route("/")
 def index():
+    valid_connection, error_msg = check_db_connection()
+    if not valid_connection:
+        print("Database connection failed")
     return render_template('index.html', error_msg=error_msg)
 
 
 # DASHBOARD
+# Charts and tables are rendered client side from the JSON report API
 @app.route("/dashboard")
 def dashboard():
-    # Generate reports for each requirement and pass to the template
+    # one year or a comma separated list of years, e.g. 2020,2021
+    year = request.args.get('year', '2021')
+    table_counts = get_table_counts()
+    return render_template('dashboard.html', table_counts=table_counts, year=year)
+
 
-    results1 = process_requirement1(year=2021)
-    results2 = process_requirement2(year=2021)
+# REPORTS (server side generated files: csv, html and plot images)
+@app.route("/reports")
+def reports_page():
+    # Serve the latest report snapshots, generated in background after imports/restores (see report_scheduler.py)
+    results1 = get_latest_snapshot("req_01_hires_dep_job_quarter")
+    results2 = get_latest_snapshot("req_02_hires_dep_top")
+    if results1 is None or results2 is None:
+        if REPORT_SCHEDULER_ENABLED:
+            request_report_refresh("reports page without snapshots")
+            return("Reports are being generated, refresh the page in a few seconds.")
+        # no scheduler running, generate the reports in the request
+        generate_report_snapshots()
+        results1 = get_latest_snapshot("req_01_hires_dep_job_quarter")
+        results2 = get_latest_snapshot("req_02_hires_dep_top")
     if results1 is None or results2 is None:
         return("No data available to generate reports")
     
@@ -48,6 +145,7 @@ def dashboard():
     # Format results for display in template
     req1_dict = {
         "report_name": results1["report_name"],
+        "datetime": results1["datetime"],
         "html": results1["html"],
         "csv": results1["csv"],
         "image1": results1["images"].split(",")[0],
@@ -56,13 +154,67 @@ def dashboard():
 
     req2_dict = {
         "report_name": results2["report_name"],
+        "datetime": results2["datetime"],
         "html": results2["html"],
         "csv": results2["csv"],
         "image1": results2["images"], # Assuming there is only one image for req2
     }
     table_counts = get_table_counts()
 
-    return render_template('dashboard.html', table_counts=table_counts, results1=req1_dict, results2=req2_dict)
+    return render_template('reports.html', table_counts=table_counts, results1=req1_dict, results2=req2_dict)
+
+
+# REPORTS API
+# e.g. curl "http://127.0.0.1:8080/api/reports/hires-by-quarter?year=2020,2021"
+# e.g. curl "http://127.0.0.1:8080/api/reports/top-departments?start_date=2021-01-01&end_date=2021-06-30"
+def get_period_args():
+    """ Read report periods from the query string: year (repeated or comma separated), start_date, end_date """
+    years = ",".join(request.args.getlist('year'))
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    if not years and not start_date and not end_date:
+        years = "2021"
+    return parse_periods(years, start_date, end_date)
+
+def report_response(report_name, periods, df):
+    """
+    Build a JSON (default) or CSV (?format=csv) response with ETag/Cache-Control headers.
+    Returns 304 if the client already has the same content.
+    """
+    if request.args.get('format') == 'csv':
+        body = df.to_csv(index=False)
+        mimetype = 'text/csv'
+    else:
+        body = json.dumps(to_report_payload(report_name, periods, df), default=str)
+        mimetype = 'application/json'
+
+    etag = hashlib.sha256(body.encode('utf-8')).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(body, 200)
+        response.mimetype = mimetype
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
+@app.route("/api/reports/hires-by-quarter")
+def api_hires_by_quarter():
+    try:
+        periods = get_period_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    df = query_hires_by_quarter(periods["years"], periods["start_date"], periods["end_date"])
+    return report_response("req_01_hires_dep_job_quarter", periods, df)
+
+@app.route("/api/reports/top-departments")
+def api_top_departments():
+    try:
+        periods = get_period_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    df = query_top_departments(periods["years"], periods["start_date"], periods["end_date"])
+    return report_response("req_02_hires_dep_top", periods, df)
 
 
 # IMPORT CSV DATA
@@ -78,9 +230,11 @@ def get_import():
         file = request.files['file']
         table_name  = request.form.get('table_name')  # Get table name        
         chunk_size = request.form.get('chunk_size')  # Get chunk size
+        # zip/tar archives contain the files of several tables, the table is inferred from each file name
+        archive = is_archive(file.filename)
 
         # validate data
-        if file.filename == '' or not table_name or not chunk_size: 
+        if file.filename == '' or not (table_name or archive) or not chunk_size: 
             # return redirect(request.url)
             return "Invalid data.\n\n", 400
 
@@ -106,8 +260,21 @@ def get_import():
 
             print(f"PARAMS:table_name: {table_name}, Chunk size: {chunk_size}")
 
+        if archive:
+            # full refresh of the archive tables (all or nothing), under one parent transaction
+            try:
+                result = import_archive(imported_file, chunk_size)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            if result["status"] != "success":
+                # nothing was loaded, see the result of each file
+                return jsonify(result), 400
+            request_report_refresh(f"import archive {filename}")
+            return jsonify(result), 201
+
         # Process data and get logs
         logs_file_path = process_valid_invalid_results(imported_file, chunk_size, table_name)
+        request_report_refresh(f"import {table_name}")
         response = {
                 "table_name": table_name,
                 "chunk_size": chunk_size,
@@ -119,19 +286,60 @@ def get_import():
         return f"\n\nData processed successfully, check logs for details: \n{logs_file_path}.\n\n", 201
         # return jsonify(response), 201
     else:
-        # get import transactions logs (last 100)
+        # get import transactions logs (last 100, ?cursor= for older pages)
         number_of_logs=100
-        import_logs_html = get_import_logs(number_of_logs=number_of_logs)
+        import_logs_html = get_import_logs(number_of_logs=number_of_logs, cursor=request.args.get('cursor'))
         # render the import page
         return render_template('import.html', import_logs_html=import_logs_html, number_of_logs=number_of_logs)
 
+# IMPORT HISTORY API (keyset pagination, newest first)
+# e.g. curl "http://127.0.0.1:8080/api/imports?table_name=hired_employees&status=partial&limit=50"
+# next page: curl "http://127.0.0.1:8080/api/imports?cursor=<next_cursor>"
+@app.route("/api/imports")
+def api_imports():
+    try:
+        page = get_import_transactions(
+            limit=int(request.args.get('limit', 100)),
+            cursor=request.args.get('cursor'),
+            table_name=request.args.get('table_name'),
+            status=request.args.get('status') or None,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    for transaction in page["transactions"]:
+        transaction["datetime"] = transaction["datetime"].isoformat() if transaction["datetime"] else None
+    return jsonify(page)
+
 @app.route("/force-truncate-table", methods=['GET', 'POST'])
 def force_truncate():
     if request.method == 'POST':
         table_name  = request.form.get('table_name')
         result = force_truncate_table(table_name)
+        request_report_refresh(f"truncate {table_name}")
         return result
 
+# QUARANTINE (invalid rows of imports, with raw values and reason codes)
+# e.g. curl "http://127.0.0.1:8080/api/quarantine?table_name=hired_employees"
+@app.route("/api/quarantine")
+def api_quarantine():
+    with get_read_engine().connect() as connection:
+        summary = get_quarantine_summary(connection, table_name=request.args.get('table_name'))
+    return jsonify({"quarantine": summary})
+
+# re-validate pending rows (e.g. fixed with SQL) and insert the valid ones
+# e.g. curl -X POST -F "table_name=hired_employees" -F "import_id=<transactions.import_id>" http://127.0.0.1:8080/quarantine/reprocess
+@app.route("/quarantine/reprocess", methods=['POST'])
+def quarantine_reprocess():
+    table_name = request.values.get('table_name')
+    if table_name not in QUARANTINE_TABLES:
+        return jsonify({"error": f"table_name must be one of: {', '.join(QUARANTINE_TABLES)}"}), 400
+    is_valid, result = reprocess_quarantine(table_name, import_id=request.values.get('import_id') or None)
+    if not is_valid:
+        return jsonify(result), 500
+    if result["reprocessed"]:
+        request_report_refresh(f"reprocess quarantine {table_name}")
+    return jsonify(result)
+
 # BACKUPS
 @app.route("/backups")
 def backup_page():
@@ -159,10 +367,25 @@ def backup_restore():
 
         is_vallid, result = restore_backup(table_name, restore_file_name)
         if not is_vallid:
-            return f"Error restoring backup: {result}"
+            return f"Error restoring backup: {result}", 400
+        request_report_refresh(f"restore {table_name}")
         
         return f"Backup restored! File name: {restore_file_name} - table name: {table_name}\n\n{result}", 201
 
+# e.g. curl -X POST -F "backup_file_name=departments___d51850d6-0974-4563-80d9-4f437fecd8b6.avro" http://127.0.0.1:8080/backups-verify
+@app.route("/backups-verify", methods=['GET', 'POST'])
+def backup_verify():
+    backup_file_name = request.values.get('backup_file_name')
+    if not backup_file_name:
+        return "Must provide backup_file_name to verify backup.", 400
+
+    # Security check: only file names inside BACKUPS_FOLDER are allowed
+    if os.path.basename(backup_file_name) != backup_file_name:
+        return "Invalid backup file name.", 400
+
+    is_valid, result = verify_backup(backup_file_name)
+    return jsonify(result), (200 if is_valid else 422)
+
 @app.route("/backups-create", methods=['GET', 'POST'])
 def backup_create():
     if request.method == 'POST':
@@ -185,6 +408,16 @@ def backup_create():
         return f"Backup created for Table name: {table_name}\n\n{result}", 201
 
 
+# DB connection pool stats, e.g. curl http://127.0.0.1:8080/health/db-pool
+@app.route("/health/db-pool")
+def db_pool_health():
+    stats = get_pool_stats(engine)
+    if read_engine is not engine:
+        stats["read"] = get_pool_stats(read_engine, "read")
+        stats["read"]["replica_lag"] = get_replica_lag()
+    return jsonify(stats)
+
+
 @app.route('/serve/<path:filename>')
 def serve_file(filename):
     """
@@ -196,24 +429,8 @@ def serve_file(filename):
     Returns:
         Flask Response: The file, or an error response if the file is not found or inaccessible.
     """
-    filepath = os.path.join(RESULT_FOLDER, filename)
-
-    # Security check: Ensure the file is within the designated directory
-    if not filepath.startswith(RESULT_FOLDER):
-        abort(403, description="Forbidden: Attempted access outside allowed directory.")  # Forbidden
-
-    if not os.path.exists(filepath):
-        abort(404, description=f"File not found: {filename}") # File not found
-
-    # Determine the content type of the file
-    content_type = mimetypes.guess_type(filepath)[0]
-    if content_type is None:
-      content_type = "application/octet-stream"  # Default content type if unknown
-
-    try:
-        return send_from_directory(RESULT_FOLDER, filename, mimetype=content_type)
-    except Exception as e:
-        abort(500, description=f"Internal Server Error: {e}") # Internal server error
+    # ETag/304, range requests, precompressed .gz siblings and X-Accel-Redirect/X-Sendfile offload (see artifacts.py)
+    return send_artifact(filename)
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8080, debug=True)
@@ -0,0 +1,93 @@
+# artifacts.py
+"""
+Files generated by the app (import logs, reports, charts, traces, backups) and how they are served by /serve:
+precompressed .gz siblings written next to text artifacts, strong ETags with 304 responses, range requests,
+and optional offload to the web server (X-Accel-Redirect for nginx, X-Sendfile for Apache/lighttpd).
+"""
+import os
+import gzip
+import mimetypes
+from urllib.parse import quote
+from flask import request, send_file, abort, make_response
+from werkzeug.security import safe_join
+
+from config import RESULT_FOLDER, ARTIFACT_MAX_AGE, ARTIFACT_GZIP_MIN_SIZE, ARTIFACT_GZIP_LEVEL, ARTIFACT_ACCEL_REDIRECT_PREFIX
+
+# text artifacts worth compressing (png charts and avro backups are already compressed)
+COMPRESSIBLE_EXTENSIONS = {".json", ".csv", ".html", ".svg", ".txt", ".collapsed", ".jsonl"}
+
+
+def compress_artifact(file_path):
+    """
+    Write a gzip sibling (file.json.gz) of a text artifact, called right after the artifact is written
+    so requests never compress on the fly. Small files and binary formats are skipped.
+
+    Returns:
+        str: path of the .gz file, or None if the file was not compressed
+    """
+    if os.path.splitext(file_path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return None
+    try:
+        if os.path.getsize(file_path) < ARTIFACT_GZIP_MIN_SIZE:
+            return None
+        gz_path = f"{file_path}.gz"
+        tmp_path = f"{gz_path}.tmp"
+        # mtime=0 keeps the gzip bytes (and ETag) stable for the same content
+        with open(file_path, "rb") as f_in, gzip.GzipFile(tmp_path, "wb", compresslevel=ARTIFACT_GZIP_LEVEL, mtime=0) as f_out:
+            while chunk := f_in.read(1024 * 1024):
+                f_out.write(chunk)
+        os.replace(tmp_path, gz_path)
+        return gz_path
+    except OSError as e:
+        print(f"An error occurred compressing artifact {file_path}: {e}")
+        return None
+
+
+def get_gzip_sibling(file_path):
+    """ Path of an up to date .gz sibling the client can use, or None """
+    if request.range is not None or request.accept_encodings["gzip"] <= 0:
+        # ranges are served from the original bytes
+        return None
+    gz_path = f"{file_path}.gz"
+    try:
+        if os.stat(gz_path).st_mtime >= os.stat(file_path).st_mtime:
+            return gz_path
+    except OSError:
+        pass
+    return None
+
+
+def send_artifact(filename):
+    """
+    Response for a file in RESULT_FOLDER.
+    send_file(conditional=True) adds a strong ETag (mtime, size and path) and Last-Modified, answers
+    If-None-Match/If-Modified-Since with 304 and Range with 206.
+
+    Args:
+        filename (str): path relative to RESULT_FOLDER
+    Returns:
+        Flask Response
+    """
+    # Security check: Ensure the file is within the designated directory
+    file_path = safe_join(RESULT_FOLDER, filename)
+    if file_path is None:
+        abort(403, description="Forbidden: Attempted access outside allowed directory.")
+    if not os.path.isfile(file_path):
+        abort(404, description=f"File not found: {filename}")
+
+    mimetype = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+
+    if ARTIFACT_ACCEL_REDIRECT_PREFIX:
+        # nginx serves the file from an internal location (etag, ranges, gzip_static), the worker is released right away
+        response = make_response("", 200)
+        response.headers["X-Accel-Redirect"] = f"{ARTIFACT_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quote(filename)}"
+        response.mimetype = mimetype
+        return response
+
+    gz_path = get_gzip_sibling(file_path)
+    response = send_file(gz_path or file_path, mimetype=mimetype, conditional=True, etag=True, max_age=ARTIFACT_MAX_AGE)
+    if gz_path is not None:
+        response.headers["Content-Encoding"] = "gzip"
+    if os.path.splitext(file_path)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+        response.vary.add("Accept-Encoding")
+    return response
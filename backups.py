@@ -3,20 +3,26 @@
 import traceback
 import os
 import uuid
+import json
+import hashlib
+import time
 import fastavro
-from sqlalchemy import insert, MetaData, text
-from sqlalchemy.orm import sessionmaker
+from contextlib import contextmanager
+from fastavro.schema import to_parsing_canonical_form, fingerprint
+from sqlalchemy import insert, inspect, MetaData, text
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.sql.sqltypes import Integer, String, DateTime, Boolean, Float, Numeric
 from datetime import datetime, timezone
 
-from config import BACKUPS_FOLDER
+from config import BACKUPS_FOLDER, ANALYTICS_MIRROR_ENABLED
 # re use sqlAlchemy engine from models.py
-from models import engine, Session, metadata, Job, Department, HiredEmployee, BackupFile
-
-# Session = sessionmaker(bind=engine)
-# metadata = MetaData()
-
+from models import engine, Session, Job, Department, HiredEmployee, BackupFile
+from report_data import invalidate_dimension_cache
+from read_replica import get_read_engine
+from analytics_mirror import rebuild_mirror_from_backup, mark_mirror_stale
+from table_locks import acquire_table_lock, release_table_lock
+from table_counts import add_table_count, set_table_count, invalidate_table_counts_cache
+from metrics import BACKUP_SECONDS, BACKUP_ROWS
 
 # table names to model class mappings
 # TODO: need to optimize this to be dynamic
@@ -26,6 +32,9 @@ TABLES = {
     'hired_employees': HiredEmployee,
 }
 
+# number of records inserted per executemany call when restoring a backup
+RESTORE_BATCH_SIZE = 5000
+
 def get_avro_type(sql_type):
     """
     Map SQLAlchemy types to Avro types.
@@ -43,6 +52,147 @@ def get_avro_type(sql_type):
     }
     return type_map.get(type(sql_type), "string") 
 
+def get_avro_schema(table_name):
+    """
+    Build the Avro schema of a table from its SQLAlchemy model.
+    :param table_name: Name of the table
+    :return: Avro schema (dict)
+    """
+    model_class = TABLES[table_name]
+    return {
+        "type": "record",
+        "name": table_name,
+        "fields": [{"name": col.name, "type": get_avro_type(col.type)} for col in model_class.__table__.columns],
+    }
+
+def get_schema_fingerprint(schema):
+    """
+    Fingerprint an Avro schema using its parsing canonical form, so field order/type changes are detected.
+    :param schema: Avro schema (dict)
+    :return: SHA-256 fingerprint (hex string)
+    """
+    parsed_schema = fastavro.parse_schema(schema)
+    canonical_form = to_parsing_canonical_form(parsed_schema)
+    return fingerprint(canonical_form, "SHA-256")
+
+def get_manifest_path(backup_file):
+    """Manifest file stored next to the avro file, e.g. jobs___<uuid>.avro.manifest.json"""
+    return f"{BACKUPS_FOLDER}/{backup_file}.manifest.json"
+
+def read_block_checksums(file_path):
+    """
+    Read an avro file block by block (records are not decoded) and checksum each block.
+    :param file_path: path to the avro file
+    :return: tuple (writer_schema, list of blocks with num_records and sha256)
+    """
+    blocks = []
+    with open(file_path, "rb") as f:
+        reader = fastavro.block_reader(f)
+        writer_schema = reader.writer_schema
+        for block in reader:
+            blocks.append({
+                "num_records": block.num_records,
+                "sha256": hashlib.sha256(block.bytes_.getvalue()).hexdigest(),
+            })
+    return writer_schema, blocks
+
+def write_backup_manifest(table_name, backup_file, schema, row_count, min_id, max_id):
+    """
+    Writes the manifest of a backup file: row count, min/max id, per-block checksums and schema fingerprint.
+    Returns:
+        str: path to the manifest file
+    """
+    _, blocks = read_block_checksums(f"{BACKUPS_FOLDER}/{backup_file}")
+    manifest = {
+        "table_name": table_name,
+        "avro_file": backup_file,
+        "created_at": datetime.now().isoformat(),
+        "row_count": row_count,
+        "min_id": min_id,
+        "max_id": max_id,
+        "schema_fingerprint": get_schema_fingerprint(schema),
+        "blocks": blocks,
+    }
+    manifest_path = get_manifest_path(backup_file)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=4)
+    return manifest_path
+
+def verify_backup(backup_file):
+    """
+    Verifies an avro backup file against its manifest in one sequential pass, without restoring it.
+    Only block headers and raw block bytes are read, records are not decoded.
+
+    Args:
+        backup_file (str): The name of the Avro backup file.
+    Returns:
+        bool: True if the backup file is intact, False otherwise.
+        dict: A dictionary containing the action, status, and any error messages.
+    """
+    try:
+        manifest_path = get_manifest_path(backup_file)
+        if not os.path.exists(manifest_path):
+            return False, {
+                "action": "verify_backup",
+                "status": "error",
+                "error": f"Manifest not found for backup file: {backup_file}"
+            }
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+
+        writer_schema, blocks = read_block_checksums(f"{BACKUPS_FOLDER}/{backup_file}")
+
+        errors = []
+        row_count = sum(block["num_records"] for block in blocks)
+        if row_count != manifest["row_count"]:
+            errors.append(f"Row count mismatch: expected {manifest['row_count']}, found {row_count}")
+        if get_schema_fingerprint(writer_schema) != manifest["schema_fingerprint"]:
+            errors.append("Schema fingerprint mismatch")
+        if len(blocks) != len(manifest["blocks"]):
+            errors.append(f"Block count mismatch: expected {len(manifest['blocks'])}, found {len(blocks)}")
+        for i, (block, expected) in enumerate(zip(blocks, manifest["blocks"])):
+            if block["sha256"] != expected["sha256"] or block["num_records"] != expected["num_records"]:
+                errors.append(f"Checksum mismatch in block {i}")
+
+        return len(errors) == 0, {
+            "action": "verify_backup",
+            "status": "success" if len(errors) == 0 else "corrupted",
+            "backup_file": backup_file,
+            "table_name": manifest["table_name"],
+            "row_count": row_count,
+            "min_id": manifest["min_id"],
+            "max_id": manifest["max_id"],
+            "blocks": len(blocks),
+            "errors": errors
+        }
+    except Exception as e:
+        return False, {
+            "action": "verify_backup",
+            "status": "error",
+            "error": str(e)
+        }
+
+def check_schema_compatibility(table_name, writer_schema):
+    """
+    Checks if the schema of a backup file can be restored into the current table model.
+    :param table_name: Name of the table to restore
+    :param writer_schema: Avro schema read from the backup file header
+    :return: tuple (bool, error message)
+    """
+    if table_name not in TABLES:
+        return False, f"Table '{table_name}' not supported"
+    table_schema = get_avro_schema(table_name)
+    if get_schema_fingerprint(writer_schema) == get_schema_fingerprint(table_schema):
+        return True, ""
+    # fingerprints differ, accept backups whose fields are all present in the table with the same types
+    table_fields = {field["name"]: field["type"] for field in table_schema["fields"]}
+    for field in writer_schema.get("fields", []):
+        if field["name"] not in table_fields:
+            return False, f"Column '{field['name']}' not found in table '{table_name}'"
+        if json.dumps(field["type"], sort_keys=True) != json.dumps(table_fields[field["name"]], sort_keys=True):
+            return False, f"Column '{field['name']}' type does not match table '{table_name}'"
+    return True, ""
+
 def create_backup(table_name):
     """
     Creates an Avro backup of a sql table.
@@ -51,31 +201,39 @@ def create_backup(table_name):
         bool: True if the backup was restored successfully, False otherwise.
         dict: A dictionary containing the action, status, and any error messages.
     """
+    start = time.perf_counter()
     try:
         model_class = TABLES[table_name]
         backup_file = f"{table_name}___{uuid.uuid4()}.avro"
-        session = Session()
+        # table data is read from the read replica (when configured), the backup log is written to the primary
+        session = Session(bind=get_read_engine())
         rows = session.query(model_class).all()
 
         session.close()
 
-        schema = {
-            "type": "record",
-            "name": table_name,
-            "fields": [{"name": col.name, "type": get_avro_type(col.type)} for col in model_class.__table__.columns],
-        }
+        schema = get_avro_schema(table_name)
 
         # Convert datetime objects to milliseconds since epoch for Avro compatibility
         avro_rows = []
+        min_id, max_id = None, None
         for row in rows:
             row_dict = row.__dict__.copy() # Create a shallow copy of the row's attributes, to avoid inadvertently modifying the actual ORM-mapped row object
             if 'datetime' in row_dict and row_dict['datetime']: # Check if datetime field exists and is not null. Note, in some cases, it can be None even if it's not null in the DB
                 row_dict['datetime'] = int(row_dict['datetime'].timestamp() * 1000)
+            # keep track of id range for the manifest
+            min_id = row_dict['id'] if min_id is None else min(min_id, row_dict['id'])
+            max_id = row_dict['id'] if max_id is None else max(max_id, row_dict['id'])
             avro_rows.append(row_dict)
 
         with open(f"{BACKUPS_FOLDER}/{backup_file}", "wb") as f:
             fastavro.writer(f, fastavro.parse_schema(schema), avro_rows)
 
+        # write manifest next to the backup file so it can be verified without restoring it
+        manifest_path = write_backup_manifest(table_name, backup_file, schema, len(avro_rows), min_id, max_id)
+
+        BACKUP_SECONDS.labels(table_name, "create").observe(time.perf_counter() - start)
+        BACKUP_ROWS.labels(table_name, "create").inc(len(avro_rows))
+
         print(f"Backup of table '{table_name}' created at: {backup_file}")
         backup_data = {
             'table_name': table_name,
@@ -89,13 +247,16 @@ def create_backup(table_name):
         # Execute the insert statement within a session
         with Session() as session:
             session.execute(stmt)
+            add_table_count(session, "backups_files", 1)
             session.commit()
             session.close()
+        invalidate_table_counts_cache()
             
         return True, {
             "action": "create_backup",
             "status": "success",
             "file_name": backup_file,
+            "manifest_file": os.path.basename(manifest_path),
         }
     except SQLAlchemyError as e:
         # print(f"Error during commit: {e}")
@@ -113,9 +274,107 @@ def create_backup(table_name):
             "error": str(e)
         }
         
+def convert_avro_record(record):
+    """Convert datetime format of an avro record for compatibility with the db"""
+    if 'datetime' in record and isinstance(record['datetime'], int): # Check data type and if it exists
+        try:  # Try parsing without timezone info
+            record['datetime'] = datetime.fromtimestamp(record['datetime'] / 1000)
+        except:  # Try parsing with timezone info
+            record['datetime'] = datetime.fromtimestamp(record['datetime'] / 1000, tz=timezone.utc)
+    elif 'datetime' in record and isinstance(record['datetime'], datetime):
+        pass #already a datetime - don't modify
+    return record
+
+def create_table_indexes(connection, table_name, target_table_name):
+    """
+    Create the secondary indexes of a model table (same index names) on target_table_name.
+    Used to build the indexes of a restored table after the bulk load, in one pass over the loaded rows.
+    """
+    for index in TABLES[table_name].__table__.indexes:
+        unique = "UNIQUE " if index.unique else ""
+        columns = ", ".join(column.name for column in index.columns)
+        connection.execute(text(f"CREATE {unique}INDEX {index.name} ON {target_table_name} ({columns});"))
+
+def get_shadow_table_name(table_name):
+    return f"{table_name}__restore"
+
+def create_shadow_table(table_name):
+    """
+    Create an empty shadow table of a model table, e.g. hired_employees__restore (dropped first if a previous load left it).
+    Only the columns and primary key are created, secondary indexes are built after the load (build_shadow_indexes).
+    """
+    shadow_table = TABLES[table_name].__table__.to_metadata(MetaData(), name=get_shadow_table_name(table_name))
+    shadow_table.indexes.clear()
+    shadow_table.drop(engine, checkfirst=True)
+    shadow_table.create(engine)
+    return shadow_table
+
+def build_shadow_indexes(connection, table_name):
+    """ MySQL: index names are per table, build them on the loaded shadow table before the swap (SQLite: in swap_tables) """
+    if engine.dialect.name == "mysql":
+        create_table_indexes(connection, table_name, get_shadow_table_name(table_name))
+
+@contextmanager
+def ddl_transaction():
+    """
+    engine.begin() for table swaps. pysqlite doesn't open a transaction before DDL statements
+    (each ALTER TABLE would be committed on its own), so BEGIN is sent explicitly on SQLite:
+    the renames are committed or rolled back together.
+    """
+    with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            connection.exec_driver_sql("BEGIN")
+        try:
+            yield connection
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+def swap_tables(connection, table_name, shadow_table_name):
+    """
+    Atomically replaces a table with its shadow table, connection must come from ddl_transaction().
+    MySQL: single RENAME TABLE statement (atomic for readers), the shadow table already has its indexes.
+    SQLite: renames executed inside the same transaction (ddl_transaction), index names are global so the
+    indexes are created once the old table (and its indexes) is dropped.
+    """
+    old_table_name = f"{table_name}__old"
+    if engine.dialect.name == "mysql":
+        connection.execute(text(f"DROP TABLE IF EXISTS {old_table_name};"))
+        connection.execute(text(f"RENAME TABLE {table_name} TO {old_table_name}, {shadow_table_name} TO {table_name};"))
+        connection.execute(text(f"DROP TABLE {old_table_name};"))
+    else:
+        # e.g. sqlite, only atomic inside ddl_transaction(): pysqlite runs DDL outside of a transaction otherwise
+        connection.execute(text(f"DROP TABLE IF EXISTS {old_table_name};"))
+        connection.execute(text(f"ALTER TABLE {table_name} RENAME TO {old_table_name};"))
+        connection.execute(text(f"ALTER TABLE {shadow_table_name} RENAME TO {table_name};"))
+        connection.execute(text(f"DROP TABLE {old_table_name};"))
+        create_table_indexes(connection, table_name, table_name)
+
+def swap_shadow_tables(connection, table_names):
+    """
+    Atomically replaces several tables with their shadow tables (all or none), e.g. an archive import of all tables.
+    MySQL: one RENAME TABLE statement for all tables. SQLite: swap_tables of each table in the same transaction,
+    connection must come from ddl_transaction().
+    """
+    if engine.dialect.name == "mysql":
+        renames = []
+        for table_name in table_names:
+            connection.execute(text(f"DROP TABLE IF EXISTS {table_name}__old;"))
+            renames.append(f"{table_name} TO {table_name}__old, {get_shadow_table_name(table_name)} TO {table_name}")
+        connection.execute(text(f"RENAME TABLE {', '.join(renames)};"))
+        for table_name in table_names:
+            connection.execute(text(f"DROP TABLE {table_name}__old;"))
+    else:
+        for table_name in table_names:
+            swap_tables(connection, table_name, get_shadow_table_name(table_name))
+
 def restore_backup(table_name, backup_file):
     """
     Restores a sql table from an Avro backup file.
+    Data is bulk loaded into a shadow table (e.g. hired_employees__restore) which is then swapped
+    with the live table, so readers never see an empty or partially restored table.
+    Waits for imports/truncates of the table (table lock), raises TableBusyError if the table is busy.
 
     Args:
         table_name (str): The name of the table to restore.
@@ -124,43 +383,75 @@ def restore_backup(table_name, backup_file):
         bool: True if the backup was restored successfully, False otherwise.
         dict: A dictionary containing the action, status, and any error messages.
     """
+    if table_name not in TABLES:
+        return False, {
+            "action": "restore_backup",
+            "status": "error",
+            "error": f"Unknown table '{table_name}', expected one of: {', '.join(TABLES)}"
+        }
+    shadow_table_name = get_shadow_table_name(table_name)
+    shadow_table = None
+    lock = acquire_table_lock(table_name, "restore")
+    start = time.perf_counter()
     try:
         # open the backup file and read the data
         with open(f"{BACKUPS_FOLDER}/{backup_file}", "rb") as f:
             avro_reader = fastavro.reader(f)
-            data = list(avro_reader)  # Read all records into a list
+            # validate schema compatibility before touching the table
+            is_compatible, schema_error = check_schema_compatibility(table_name, avro_reader.writer_schema)
+            if not is_compatible:
+                return False, {
+                    "action": "restore_backup",
+                    "status": "error",
+                    "error": f"Incompatible backup schema: {schema_error}"
+                }
 
-        session = Session()
-        # metadata = MetaData()
-        metadata.reflect(engine, only=[table_name])  # Use reflect
-        table = metadata.tables[table_name] 
-        
-        # Check if the table exists and truncate it
-        result_tbl_chk = session.execute(text(f"SELECT 1 FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{table_name}' LIMIT 1;"))
-        table_exists = result_tbl_chk.scalar() #scalar() for single value
-        if table_exists:
-            session.execute(text(f"TRUNCATE TABLE {table_name};"))
-            session.commit()
-            print(f"Table '{table_name}' truncated.")
+            # create shadow table (same columns as the model table), secondary indexes are built after the load
+            shadow_table = create_shadow_table(table_name)
+
+            # bulk load records into shadow table using executemany batches
+            total_records = 0
+            with engine.begin() as connection:
+                batch = []
+                for record in avro_reader:
+                    batch.append(convert_avro_record(record))
+                    if len(batch) >= RESTORE_BATCH_SIZE:
+                        connection.execute(shadow_table.insert(), batch)
+                        total_records += len(batch)
+                        batch = []
+                if batch:
+                    connection.execute(shadow_table.insert(), batch)
+                    total_records += len(batch)
+        print("\nEnd data insertion")
+        with engine.begin() as connection:
+            build_shadow_indexes(connection, table_name)
+
+        # swap shadow table with the live table
+        if inspect(engine).has_table(table_name):
+            with ddl_transaction() as connection:
+                swap_tables(connection, table_name, shadow_table_name)
+                set_table_count(connection, table_name, total_records)
         else:
             print(f"Table '{table_name}' does not exist.")
+            with ddl_transaction() as connection:
+                connection.execute(text(f"ALTER TABLE {shadow_table_name} RENAME TO {table_name};"))
+                if engine.dialect.name != "mysql":
+                    create_table_indexes(connection, table_name, table_name)
+                set_table_count(connection, table_name, total_records)
 
-        # TODO: Add extra check if table exists and has the same schema, truncate it
-        
-        # Insert data into the table
-        for record in data:
-            # Convert datetime format for compatibility
-            if 'datetime' in record and isinstance(record['datetime'], int): # Check data type and if it exists
-                try:  # Try parsing without timezone info
-                    record['datetime'] = datetime.fromtimestamp(record['datetime'] / 1000)
-                except:  # Try parsing with timezone info
-                    record['datetime'] = datetime.fromtimestamp(record['datetime'] / 1000, tz=timezone.utc)
-            elif 'datetime' in record and isinstance(record['datetime'], datetime):
-                pass #already a datetime - don't modify
-            session.execute(table.insert().values(record))
-        print("\nEnd data insertion")
-        session.commit()
-        session.close()
+        if table_name == "hired_employees" and ANALYTICS_MIRROR_ENABLED:
+            # the analytics mirror is rebuilt from the restored backup
+            try:
+                rebuild_mirror_from_backup(f"{BACKUPS_FOLDER}/{backup_file}")
+            except Exception as e:
+                mark_mirror_stale(f"rebuild after restore failed: {e}")
+
+        BACKUP_SECONDS.labels(table_name, "restore").observe(time.perf_counter() - start)
+        BACKUP_ROWS.labels(table_name, "restore").inc(total_records)
+
+        # cached department/job names used by reports are stale after a restore
+        invalidate_dimension_cache(table_name)
+        invalidate_table_counts_cache()
 
         print(f"Backup file: '{backup_file}' restored to table '{table_name}'")
 
@@ -168,24 +459,36 @@ def restore_backup(table_name, backup_file):
             "action": "restore_backup",
             "status": "success",
             "backup_file": backup_file,
-            "table_name": table_name
+            "table_name": table_name,
+            "total_records": total_records
         }
 
     except SQLAlchemyError as e:
-        session.rollback()
+        drop_shadow_table(shadow_table)
         return False, {
             "action": "restore_backup",
             "status": "SQLAlchemyError",
             "error": str(e)
         }
     except Exception as e:
-        session.rollback()
+        drop_shadow_table(shadow_table)
         print(f"Error restoring backup: {e}")
         return False, {
             "action": "restore_backup",
             "status": "error",
             "error": str(e)
         }
+    finally:
+        release_table_lock(lock)
+
+def drop_shadow_table(shadow_table):
+    """Clean up a partially loaded shadow table, live table is never modified on errors"""
+    if shadow_table is None:
+        return
+    try:
+        shadow_table.drop(engine, checkfirst=True)
+    except SQLAlchemyError as e:
+        print(f"Error dropping shadow table '{shadow_table.name}': {e}")
 
 def get_backup_files():
     session = Session()
@@ -0,0 +1,95 @@
+# benchmarks/generate_data.py
+"""
+Synthetic data generator: departments.csv, jobs.csv and hired_employees.csv in the same
+format as the files in data/ (no header), at a configurable scale and error rate.
+
+e.g. python benchmarks/generate_data.py --rows 1000000 --error-rate 0.01 --output-dir RESULTS/BENCHMARKS/data
+"""
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+# number of rows written per chunk, keeps memory bounded for 10M+ rows
+WRITE_CHUNK_SIZE = 500_000
+
+FIRST_NAMES = ["Harold", "Ty", "Lyman", "Lotti", "Gretna", "Marlon", "Lorie", "Aurea", "Cicily", "Ignatius",
+               "Verna", "Mallory", "Otho", "Shaun", "Willy", "Cheri", "Rosalind", "Nollie", "Danika", "Jerome"]
+LAST_NAMES = ["Vogt", "Hofer", "Hadye", "Dunkerly", "Vaughan", "Lynch", "Marks", "Adams", "Mapes", "Coey",
+              "Rudd", "Fenn", "Tabor", "Caddy", "Gunter", "Whitt", "Rowe", "Pryor", "Keel", "Horn"]
+
+
+def generate_dimension(num_rows, prefix, error_rate, rng):
+    """ Dimension table (id, name) with a share of invalid rows (missing name or non numeric id) """
+    df = pd.DataFrame({
+        "id": np.arange(1, num_rows + 1).astype(str),
+        "name": [f"{prefix} {i}" for i in range(1, num_rows + 1)],
+    })
+    errors = rng.random(num_rows) < error_rate
+    missing_name = errors & (rng.random(num_rows) < 0.5)
+    df.loc[missing_name, "name"] = ""
+    df.loc[errors & ~missing_name, "id"] = "not number"
+    return df
+
+
+def generate_hired_employees_chunk(start_id, num_rows, num_departments, num_jobs, error_rate, rng):
+    """ hired_employees rows (id, name, datetime, department_id, job_id) with a share of invalid rows """
+    seconds = rng.integers(0, 3 * 365 * 24 * 3600, num_rows)
+    datetimes = (pd.Timestamp("2020-01-01") + pd.to_timedelta(seconds, unit="s")).strftime("%Y-%m-%dT%H:%M:%SZ")
+    df = pd.DataFrame({
+        "id": np.arange(start_id, start_id + num_rows).astype(str),
+        "name": pd.Series(rng.choice(FIRST_NAMES, num_rows)) + " " + pd.Series(rng.choice(LAST_NAMES, num_rows)),
+        "datetime": datetimes,
+        "department_id": rng.integers(1, num_departments + 1, num_rows).astype(str),
+        "job_id": rng.integers(1, num_jobs + 1, num_rows).astype(str),
+    })
+    # invalid rows: one random column emptied or an unparsable date
+    errors = np.flatnonzero(rng.random(num_rows) < error_rate)
+    error_columns = rng.integers(0, 5, len(errors))
+    for column_index, column in enumerate(df.columns):
+        rows = errors[error_columns == column_index]
+        df.loc[rows, column] = "not a date" if column == "datetime" else ""
+    return df
+
+
+def generate_dataset(output_dir, rows, departments=12, jobs=183, error_rate=0.0, seed=42):
+    """
+    Write departments.csv, jobs.csv and hired_employees.csv into output_dir.
+    Returns:
+        dict: {table_name: file path}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    files = {
+        "departments": os.path.join(output_dir, "departments.csv"),
+        "jobs": os.path.join(output_dir, "jobs.csv"),
+        "hired_employees": os.path.join(output_dir, "hired_employees.csv"),
+    }
+    generate_dimension(departments, "Department", error_rate, rng).to_csv(files["departments"], header=False, index=False)
+    generate_dimension(jobs, "Job", error_rate, rng).to_csv(files["jobs"], header=False, index=False)
+
+    with open(files["hired_employees"], "w") as f:
+        for start in range(0, rows, WRITE_CHUNK_SIZE):
+            num_rows = min(WRITE_CHUNK_SIZE, rows - start)
+            df = generate_hired_employees_chunk(start + 1, num_rows, departments, jobs, error_rate, rng)
+            df.to_csv(f, header=False, index=False)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="hired_employees rows (1k to 10M)")
+    parser.add_argument("--departments", type=int, default=12)
+    parser.add_argument("--jobs", type=int, default=183)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of invalid rows, e.g. 0.01")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default="RESULTS/BENCHMARKS/data")
+    args = parser.parse_args()
+
+    files = generate_dataset(args.output_dir, args.rows, args.departments, args.jobs, args.error_rate, args.seed)
+    for table_name, file_path in files.items():
+        print(f"{table_name}: {file_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# benchmarks/report_memory.py
+"""
+Memory benchmark of the report DataFrames: SELECT * with default dtypes vs compact typed loading.
+Runs on a synthetic hired_employees table (no database needed).
+
+e.g. python benchmarks/report_memory.py --rows 10000000
+"""
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from report_data import compact_hired_employees, HIRED_EMPLOYEES_REPORT_COLUMNS
+
+
+def synthetic_hired_employees(rows, seed=42):
+    """ DataFrame shaped like pd.read_sql("SELECT * FROM hired_employees") """
+    rng = np.random.default_rng(seed)
+    datetimes = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 3 * 365 * 24 * 3600, rows), unit="s")
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1, dtype=np.int64),
+        "name": pd.Series(rng.integers(0, 50000, rows)).map(lambda i: f"Employee Name {i}"),
+        "datetime": datetimes,
+        "datetime_str": datetimes.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "department_id": rng.integers(1, 13, rows).astype(np.float64),  # nullable int columns are read as float
+        "job_id": rng.integers(1, 184, rows).astype(np.float64),
+    })
+
+
+def memory_mb(df):
+    return round(df.memory_usage(deep=True).sum() / 1024 ** 2, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    df = synthetic_hired_employees(args.rows)
+    select_all_mb = memory_mb(df)
+
+    compact_df = compact_hired_employees(df[HIRED_EMPLOYEES_REPORT_COLUMNS].copy())
+    compact_mb = memory_mb(compact_df)
+
+    print(json.dumps({
+        "benchmark": "report_memory",
+        "rows": args.rows,
+        "select_all_mb": select_all_mb,
+        "compact_mb": compact_mb,
+        "reduction": round(select_all_mb / compact_mb, 1),
+        "compact_dtypes": {column: str(dtype) for column, dtype in compact_df.dtypes.items()},
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# benchmarks/run_benchmarks.py
+"""
+Benchmark of the whole pipeline on synthetic data against a local SQLite database (stand-in for MySQL):
+validation only, import, backup, restore, req001 and req002.
+
+Results (throughput, latency percentiles, peak RSS) are written as JSON. With --baseline, results are
+compared to a stored baseline and the script exits with code 1 if any step is slower than the tolerance.
+
+Run from the project root (RESULTS folder and app modules are relative to it), e.g.
+    python benchmarks/run_benchmarks.py --rows 100000 --repeat 3 --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --rows 100000 --repeat 3 --baseline benchmarks/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+from datetime import datetime
+
+import numpy as np
+
+BENCHMARKS_FOLDER = "RESULTS/BENCHMARKS"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="hired_employees rows (1k to 10M)")
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--chunk-size", type=int, default=1000, help="import batch size")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each step, used for latency percentiles")
+    parser.add_argument("--database-uri", default=f"sqlite:///{BENCHMARKS_FOLDER}/benchmark.db")
+    parser.add_argument("--output", default=f"{BENCHMARKS_FOLDER}/results.json")
+    parser.add_argument("--baseline", help="baseline results JSON to compare against (regression gate)")
+    parser.add_argument("--save-baseline", help="also save the results as a baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs baseline p50, e.g. 0.2 = 20%%")
+    return parser.parse_args()
+
+
+def peak_rss_mb():
+    """ Peak resident set size of the process (ru_maxrss is KB on Linux, bytes on macOS) """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+
+
+def summarize(step_name, durations, rows):
+    p50 = float(np.percentile(durations, 50))
+    return {
+        "step": step_name,
+        "rows": rows,
+        "runs": len(durations),
+        "p50_seconds": round(p50, 4),
+        "p95_seconds": round(float(np.percentile(durations, 95)), 4),
+        "max_seconds": round(max(durations), 4),
+        "rows_per_second": round(rows / p50, 1) if p50 > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_pipeline(files, chunk_size):
+    """
+    Run every step once on a fresh database.
+    Returns:
+        dict: {step name: duration in seconds}
+    """
+    # imported after DATABASE_URI is set
+    from models import delete_all_tables, initialize_db
+    from csv_to_db import load_csv_data, separate_valid_invalid_data, process_valid_invalid_results
+    from backups import create_backup, restore_backup
+    from req001 import process_requirement1
+    from req002 import process_requirement2
+
+    from config import create_result_folders
+
+    create_result_folders()
+    delete_all_tables()
+    initialize_db()
+    durations = {}
+
+    start = time.perf_counter()
+    separate_valid_invalid_data(load_csv_data(files["hired_employees"], chunk_size, "hired_employees"), "hired_employees")
+    durations["validation_only"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for table_name in ["departments", "jobs", "hired_employees"]:
+        process_valid_invalid_results(files[table_name], chunk_size, table_name)
+    durations["import"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    is_valid, result = create_backup("hired_employees")
+    durations["backup"] = time.perf_counter() - start
+    if not is_valid:
+        raise RuntimeError(f"Backup failed: {result}")
+
+    start = time.perf_counter()
+    is_valid, restore_result = restore_backup("hired_employees", result["file_name"])
+    durations["restore"] = time.perf_counter() - start
+    if not is_valid:
+        raise RuntimeError(f"Restore failed: {restore_result}")
+
+    start = time.perf_counter()
+    process_requirement1(year=2021, wait_for_charts=True)
+    durations["req001"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    process_requirement2(year=2021, wait_for_charts=True)
+    durations["req002"] = time.perf_counter() - start
+
+    return durations
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Regression gate: a step regresses if its p50 is slower than the baseline p50 by more than the tolerance.
+    Returns:
+        list: regressions found (empty if none)
+    """
+    baseline_steps = {step["step"]: step for step in baseline["steps"]}
+    regressions = []
+    for step in results["steps"]:
+        baseline_step = baseline_steps.get(step["step"])
+        if baseline_step is None:
+            continue
+        limit = baseline_step["p50_seconds"] * (1 + tolerance)
+        if step["p50_seconds"] > limit:
+            regressions.append({
+                "step": step["step"],
+                "baseline_p50_seconds": baseline_step["p50_seconds"],
+                "p50_seconds": step["p50_seconds"],
+                "slowdown": round(step["p50_seconds"] / baseline_step["p50_seconds"] - 1, 3),
+            })
+    return regressions
+
+
+def main():
+    args = parse_args()
+    os.makedirs(BENCHMARKS_FOLDER, exist_ok=True)
+
+    # point the app to the benchmark database before any app module is imported
+    os.environ["DATABASE_URI"] = args.database_uri
+    os.environ["REPORT_SCHEDULER_ENABLED"] = "false"
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from generate_data import generate_dataset
+
+    files = generate_dataset(f"{BENCHMARKS_FOLDER}/data", args.rows, error_rate=args.error_rate)
+
+    runs = {}
+    for _ in range(args.repeat):
+        for step_name, duration in run_pipeline(files, args.chunk_size).items():
+            runs.setdefault(step_name, []).append(duration)
+
+    results = {
+        "created_at": datetime.now().isoformat(),
+        "rows": args.rows,
+        "error_rate": args.error_rate,
+        "chunk_size": args.chunk_size,
+        "database": args.database_uri.split(":")[0],
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "steps": [summarize(step_name, durations, args.rows) for step_name, durations in runs.items()],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        results["regressions"] = compare_to_baseline(results, baseline, args.tolerance)
+        if results["regressions"]:
+            exit_code = 1
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=4)
+
+    print(json.dumps(results, indent=4))
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
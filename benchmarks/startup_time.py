@@ -0,0 +1,115 @@
+# benchmarks/startup_time.py
+"""
+Startup time of the app (what each gunicorn worker pays without --preload): `python -X importtime -c "import app"`.
+
+Reports the total import time and the slowest top-level modules, and exits with code 1 if the total is over the
+budget (--budget-ms). Heavy modules (matplotlib, seaborn, req001/req002) must not show up here, they are loaded
+on the first report.
+
+Run from the project root, e.g.
+    python benchmarks/startup_time.py --budget-ms 1500
+    python benchmarks/startup_time.py --module report_scheduler --top 20
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# modules that should only be imported on first use
+LAZY_MODULES = ["matplotlib", "seaborn", "req001", "req002", "charts"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app", help="module to import")
+    parser.add_argument("--budget-ms", type=float, default=1500, help="max total import time in milliseconds")
+    parser.add_argument("--repeat", type=int, default=3, help="imports to run, the fastest one is reported")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level modules to show")
+    parser.add_argument("--database-uri", default="sqlite:///RESULTS/startup_time.db")
+    return parser.parse_args()
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output lines: "import time: self [us] | cumulative | imported package".
+    Returns:
+        list: (module, cumulative microseconds, nesting level) in import order
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        modules.append((name.strip(), int(cumulative), level))
+    return modules
+
+
+def get_module_import_time(modules, module):
+    """
+    The module's cumulative import time and its direct imports (children are listed before their parent).
+    Returns:
+        tuple: (cumulative microseconds, [(module, cumulative microseconds)])
+    """
+    for index in range(len(modules) - 1, -1, -1):
+        name, cumulative, level = modules[index]
+        if name == module and level == 0:
+            break
+    else:
+        raise ValueError(f"{module} not found in the importtime output")
+    direct_imports = []
+    for name, child_cumulative, level in reversed(modules[:index]):
+        if level == 0:
+            break
+        if level == 1:
+            direct_imports.append((name, child_cumulative))
+    return cumulative, direct_imports
+
+
+def measure_import(module, env):
+    """ Import the module in a fresh interpreter and return the parsed importtime output """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def main():
+    args = parse_args()
+    env = dict(os.environ)
+    # no scheduler thread / database access while importing
+    env.setdefault("DATABASE_URI", args.database_uri)
+    env["REPORT_SCHEDULER_ENABLED"] = "false"
+
+    runs = [measure_import(args.module, env) for _ in range(args.repeat)]
+    totals = [get_module_import_time(modules, args.module)[0] for modules in runs]
+    fastest = runs[totals.index(min(totals))]
+    _, direct_imports = get_module_import_time(fastest, args.module)
+    top_level = sorted(direct_imports, key=lambda m: -m[1])
+    imported = {name.split(".")[0] for name, _, _ in fastest} | {name for name, _, _ in fastest}
+
+    total_ms = min(totals) / 1000
+    results = {
+        "module": args.module,
+        "total_ms": round(total_ms, 1),
+        "budget_ms": args.budget_ms,
+        "runs_ms": [round(total / 1000, 1) for total in totals],
+        "slowest_modules_ms": {name: round(cumulative / 1000, 1) for name, cumulative in top_level[:args.top]},
+        "eager_heavy_modules": [name for name in LAZY_MODULES if name in imported],
+    }
+    print(json.dumps(results, indent=4))
+
+    if total_ms > args.budget_ms:
+        print(f"Startup time {total_ms:.1f} ms is over the budget of {args.budget_ms} ms")
+        sys.exit(1)
+    if results["eager_heavy_modules"]:
+        print(f"Modules expected to be lazy were imported at startup: {results['eager_heavy_modules']}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
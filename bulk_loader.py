@@ -0,0 +1,126 @@
+# bulk_loader.py
+"""
+Native bulk load of validated import batches (opt-in, IMPORT_BULK_LOAD=true).
+Valid rows are loaded into a staging table with the database loader and merged into the target table
+with one INSERT ... SELECT, so a batch with duplicated ids is still rejected as a whole (IntegrityError).
+
+MySQL: LOAD DATA LOCAL INFILE from a temporary tab separated file (requires local_infile=ON on the server).
+SQLite: the driver has no loader, rows go through one raw executemany into a TEMP staging table (no ORM objects).
+The same executemany path is used on MySQL with native_loader=False (e.g. quarantine reprocessing when
+IMPORT_BULK_LOAD is off and the connections don't allow LOCAL INFILE).
+"""
+import os
+import tempfile
+from sqlalchemy import text
+
+# target columns of each table, in load order
+BULK_COLUMNS = {
+    "departments": ["id", "department"],
+    "jobs": ["id", "job"],
+    "hired_employees": ["id", "name", "datetime", "datetime_str", "department_id", "job_id"],
+}
+INTEGER_COLUMNS = ["id", "department_id", "job_id"]
+
+# datetime text format read by each database
+DATETIME_FORMATS = {
+    "mysql": "%Y-%m-%d %H:%M:%S",
+    "sqlite": "%Y-%m-%d %H:%M:%S.%f",  # same format as the SQLAlchemy DateTime type
+}
+
+
+def get_staging_table_name(table_name):
+    return f"{table_name}__staging"
+
+
+def prepare_batch(valid_df, table_name, datetime_format):
+    """
+    Valid rows of a batch as the target columns: ints as int64, datetimes as text and missing datetime_str as "".
+    Returns:
+        DataFrame: columns in BULK_COLUMNS order
+    """
+    df = valid_df.reindex(columns=BULK_COLUMNS[table_name])
+    for column in df.columns:
+        if column in INTEGER_COLUMNS:
+            df[column] = df[column].astype("int64")
+    if "datetime" in df.columns:
+        datetimes = df["datetime"]
+        if datetimes.dt.tz is not None:
+            # same wall time the ORM path stores
+            datetimes = datetimes.dt.tz_localize(None)
+        df["datetime"] = datetimes.dt.strftime(datetime_format)
+    if "datetime_str" in df.columns:
+        df["datetime_str"] = df["datetime_str"].fillna("").astype(str)
+    return df
+
+
+def create_staging_table(connection, table_name):
+    """ Empty session temporary table with the target columns and no keys (duplicates are detected by the merge) """
+    staging_table = get_staging_table_name(table_name)
+    columns = ", ".join(BULK_COLUMNS[table_name])
+    connection.execute(text(f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging_table} AS SELECT {columns} FROM {table_name} WHERE 1 = 0"))
+    connection.execute(text(f"DELETE FROM {staging_table}"))
+    return staging_table
+
+
+def load_staging_mysql(connection, staging_table, df):
+    """ LOAD DATA LOCAL INFILE from a temporary tsv file (quoted fields with tabs/new lines, "" for quotes) """
+    columns = ", ".join(df.columns)
+    with tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False, newline="", encoding="utf-8") as f:
+        df.to_csv(f, sep="\t", header=False, index=False, lineterminator="\n")
+        file_path = f.name
+    try:
+        connection.execute(
+            text(
+                f"LOAD DATA LOCAL INFILE :file_path INTO TABLE {staging_table} CHARACTER SET utf8mb4 "
+                r"FIELDS TERMINATED BY '\t' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' LINES TERMINATED BY '\n' "
+                f"({columns})"
+            ),
+            {"file_path": file_path},
+        )
+    finally:
+        os.remove(file_path)
+
+
+def load_staging_executemany(connection, staging_table, df):
+    """ One executemany of plain tuples into the staging table (placeholders of the driver paramstyle) """
+    placeholder = "?" if connection.dialect.paramstyle == "qmark" else "%s"
+    placeholders = ", ".join(placeholder for _ in df.columns)
+    rows = list(zip(*(df[column].tolist() for column in df.columns)))
+    connection.exec_driver_sql(f"INSERT INTO {staging_table} ({', '.join(df.columns)}) VALUES ({placeholders})", rows)
+
+
+def bulk_insert_batch(connection, table_name, valid_df, native_loader=True, target_table=None):
+    """
+    Load the valid rows of a batch with the native loader and merge them into the table.
+    Runs in the caller's transaction (commit/rollback is done by the caller).
+
+    Args:
+        connection: SQLAlchemy connection, e.g. session.connection()
+        table_name (str): target table
+        valid_df (DataFrame): validated rows of the batch
+        native_loader (bool): LOAD DATA LOCAL INFILE on MySQL (requires local_infile, see IMPORT_BULK_LOAD),
+            False loads the staging table with one executemany
+        target_table (str): table the rows are merged into, default table_name (e.g. a <table>__restore shadow table)
+    Returns:
+        int: number of rows merged
+    Raises:
+        sqlalchemy.exc.IntegrityError: rows violate the table keys (the batch is rejected)
+    """
+    if valid_df.empty:
+        return 0
+    dialect = connection.dialect.name
+    if dialect not in DATETIME_FORMATS:
+        raise ValueError(f"Bulk load is not supported for {dialect}")
+
+    df = prepare_batch(valid_df, table_name, DATETIME_FORMATS[dialect])
+    staging_table = create_staging_table(connection, table_name)
+    if dialect == "mysql" and native_loader:
+        load_staging_mysql(connection, staging_table, df)
+    else:
+        load_staging_executemany(connection, staging_table, df)
+
+    # set-based merge into the target table
+    columns = ", ".join(df.columns)
+    connection.execute(text(f"INSERT INTO {target_table or table_name} ({columns}) SELECT {columns} FROM {staging_table}"))
+    connection.execute(text(f"DELETE FROM {staging_table}"))
+    return len(df)
@@ -0,0 +1,110 @@
+# charts.py
+""" Render report charts in a background pool with content-addressed caching of image files """
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")  # non-interactive backend, no GUI state shared across requests
+from matplotlib.figure import Figure
+
+from config import RESULT_FOLDER, CHARTS_FOLDER, CHART_DPI, CHART_FORMAT, CHART_RENDER_WORKERS, SHOW_CONSOLE_LOGS_REPORTS
+from artifacts import compress_artifact
+
+# renderer pool, charts are rendered off the request path
+executor = ThreadPoolExecutor(max_workers=CHART_RENDER_WORKERS, thread_name_prefix="chart-renderer")
+
+# charts currently being rendered: {file_path: Future}
+pending_charts = {}
+pending_lock = threading.Lock()
+
+PLACEHOLDER_FILE = "placeholder.svg"
+PLACEHOLDER_SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="800" height="200">
+<rect width="100%" height="100%" fill="#f3f4f6"/>
+<text x="50%" y="50%" text-anchor="middle" font-family="sans-serif" font-size="20" fill="#6b7280">Rendering chart, refresh in a few seconds ...</text>
+</svg>"""
+
+
+def get_chart_key(chart_name, df, dpi, image_format):
+    """
+    Content address of a chart: hash of the aggregated data and the render options.
+    Same data -> same file, so charts are only rendered once.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{chart_name}|{dpi}|{image_format}|".encode("utf-8"))
+    digest.update(df.to_csv(index=False).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def get_placeholder():
+    """ Returns the placeholder image path (relative to RESULT_FOLDER), created on first use """
+    file_path = f"{CHARTS_FOLDER}/{PLACEHOLDER_FILE}"
+    if not os.path.exists(file_path):
+        with open(file_path, "w") as f:
+            f.write(PLACEHOLDER_SVG)
+    return os.path.relpath(file_path, RESULT_FOLDER)
+
+
+def render_chart(render_fn, df, file_path, figsize, dpi, image_format):
+    """
+    Render a chart into a file. The figure is created and released explicitly (no pyplot global state).
+    The image is written to a temp file and renamed, so a partially written file is never served.
+    """
+    fig = Figure(figsize=figsize)
+    try:
+        ax = fig.add_subplot()
+        render_fn(df, ax)
+        fig.tight_layout()
+        tmp_file_path = f"{file_path}.tmp"
+        fig.savefig(tmp_file_path, bbox_inches='tight', dpi=dpi, format=image_format)
+        os.replace(tmp_file_path, file_path)
+        # svg charts get a .gz sibling (png is skipped)
+        compress_artifact(file_path)
+        if SHOW_CONSOLE_LOGS_REPORTS:
+            print(f"Chart rendered: {file_path}")
+    except Exception as e:
+        print(f"An error occurred rendering chart {file_path}: {e}")
+    finally:
+        fig.clear()
+        with pending_lock:
+            pending_charts.pop(file_path, None)
+
+
+def request_chart(chart_name, df, render_fn, figsize=(10, 6), dpi=None, image_format=None, wait=False):
+    """
+    Get the image of a chart, rendering it in the background if it is not cached yet.
+
+    Args:
+        chart_name (str): name of the chart, used as file name prefix
+        df (pd.DataFrame): aggregated data to plot, also used as cache key
+        render_fn (callable): function(df, ax) drawing the chart on a matplotlib Axes
+        figsize (tuple): figure size in inches
+        dpi (int): image resolution, default CHART_DPI
+        image_format (str): 'png' or 'svg', default CHART_FORMAT
+        wait (bool): block until the chart is rendered
+    Returns:
+        tuple: (image path relative to RESULT_FOLDER, bool ready). If the chart is not ready the placeholder path is returned.
+    """
+    dpi = dpi or CHART_DPI
+    image_format = image_format or CHART_FORMAT
+    chart_key = get_chart_key(chart_name, df, dpi, image_format)
+    file_path = f"{CHARTS_FOLDER}/{chart_name}___{chart_key}.{image_format}"
+    image_path = os.path.relpath(file_path, RESULT_FOLDER)
+
+    if os.path.exists(file_path):
+        return image_path, True
+
+    with pending_lock:
+        future = pending_charts.get(file_path)
+        if future is None:
+            # copy data, the caller may keep modifying its DataFrame
+            future = executor.submit(render_chart, render_fn, df.copy(), file_path, figsize, dpi, image_format)
+            pending_charts[file_path] = future
+
+    if wait:
+        future.result()
+        if os.path.exists(file_path):
+            return image_path, True
+
+    return get_placeholder(), False
@@ -25,13 +25,35 @@ db_user = os.environ.get("DB_USER")
 db_password = os.environ.get("DB_PASS")
 db_port = os.environ.get("DB_PORT")
 
+# Connection pool settings (per process)
+# Under gunicorn, set DB_MAX_CONNECTIONS to split a total connection budget between workers (WEB_CONCURRENCY)
+gunicorn_workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+db_max_connections = os.environ.get("DB_MAX_CONNECTIONS")
+if db_max_connections:
+    default_pool_size = max(1, int(db_max_connections) // gunicorn_workers)
+else:
+    default_pool_size = 5
+
 db_config = {
-    "pool_size": 5,
-    "max_overflow": 2,
-    "pool_timeout": 30,
-    "pool_recycle": 1800,
+    "pool_size": int(os.environ.get("DB_POOL_SIZE", default_pool_size)),
+    "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 2)),
+    "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+    "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+    "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true",
 }
 
+# Optional read replica (or a second database / SQLite file as a stand-in) for report queries, counts, import history
+# and backups, with its own pool. Reads fall back to the primary when the replica lags more than REPLICA_MAX_LAG seconds
+READ_DATABASE_URI = os.environ.get("READ_DATABASE_URI")
+read_db_config = dict(db_config)
+read_db_config.update({
+    "pool_size": int(os.environ.get("READ_DB_POOL_SIZE", db_config["pool_size"])),
+    "max_overflow": int(os.environ.get("READ_DB_MAX_OVERFLOW", db_config["max_overflow"])),
+})
+REPLICA_MAX_LAG = float(os.environ.get("REPLICA_MAX_LAG", 5))
+# seconds the measured replica lag is reused before checking again
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get("REPLICA_LAG_CHECK_INTERVAL", 5))
+
 # Check if running on Google Cloud SQL o local MySQL 
 if USE_CLOUD_SQL and os.environ.get("INSTANCE_CONNECTION_NAME"):
     db_socket_dir = os.environ.get("DB_SOCKET_DIR", "/cloudsql")
@@ -40,22 +62,80 @@ if USE_CLOUD_SQL and os.environ.get("INSTANCE_CONNECTION_NAME"):
 else:
     DATABASE_URI = f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
 
+# optional full database URI, e.g. sqlite:///RESULTS/local.db for local tests and benchmarks
+if os.environ.get("DATABASE_URI"):
+    DATABASE_URI = os.environ.get("DATABASE_URI")
+
 """define directories"""
 RESULT_FOLDER = 'RESULTS'
 
 UPLOAD_FOLDER = f"{RESULT_FOLDER}/UPLOADS"
 LOGS_FOLDER  = f"{RESULT_FOLDER}/LOGS"
 BACKUPS_FOLDER = f"{RESULT_FOLDER}/BACKUPS"
+CHARTS_FOLDER = f"{RESULT_FOLDER}/CHARTS"
+TRACES_FOLDER = f"{RESULT_FOLDER}/TRACES"
+PROFILES_FOLDER = f"{RESULT_FOLDER}/PROFILES"
+LOCKS_FOLDER = f"{RESULT_FOLDER}/LOCKS"
+ANALYTICS_FOLDER = f"{RESULT_FOLDER}/ANALYTICS"
+
+# reports read hired_employees from a Parquet mirror partitioned by year/quarter (requires pyarrow, see analytics_mirror.py)
+ANALYTICS_MIRROR_ENABLED = os.environ.get("ANALYTICS_MIRROR_ENABLED", "false").lower() == "true"
+
+# per-table writer locks (imports, restores, truncates): max seconds to wait, max waiting requests per table
+# (per process) before answering 429, and the Retry-After seconds sent with it
+TABLE_LOCK_TIMEOUT = int(os.environ.get("TABLE_LOCK_TIMEOUT", 30))
+TABLE_LOCK_MAX_WAITERS = int(os.environ.get("TABLE_LOCK_MAX_WAITERS", 2))
+TABLE_LOCK_RETRY_AFTER = int(os.environ.get("TABLE_LOCK_RETRY_AFTER", 10))
+
+# /serve artifacts: seconds browsers reuse a file before revalidating it (ETag/304)
+ARTIFACT_MAX_AGE = int(os.environ.get("ARTIFACT_MAX_AGE", 60))
+# gzip siblings (file.json.gz) are written for text artifacts of at least this size (bytes)
+ARTIFACT_GZIP_MIN_SIZE = int(os.environ.get("ARTIFACT_GZIP_MIN_SIZE", 1024))
+ARTIFACT_GZIP_LEVEL = int(os.environ.get("ARTIFACT_GZIP_LEVEL", 6))
+# offload file transfers to the web server: nginx internal location mapped to RESULT_FOLDER (e.g. /protected-results/)
+ARTIFACT_ACCEL_REDIRECT_PREFIX = os.environ.get("ARTIFACT_ACCEL_REDIRECT_PREFIX")
+# or X-Sendfile header (Apache mod_xsendfile, lighttpd)
+ARTIFACT_USE_X_SENDFILE = os.environ.get("ARTIFACT_USE_X_SENDFILE", "false").lower() == "true"
+
+# per request profiling (?profile=1 or X-Profile: 1 header), disabled by default
+# if PROFILING_TOKEN is set, requests must also send it in the X-Profile-Token header
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN")
+PROFILING_SAMPLE_INTERVAL = float(os.environ.get("PROFILING_SAMPLE_INTERVAL", 0.005))  # seconds
+
+# load validated import batches with the database loader (MySQL LOAD DATA LOCAL INFILE, see bulk_loader.py)
+# also enables local_infile on MySQL connections, the server must allow it (local_infile=ON)
+IMPORT_BULK_LOAD = os.environ.get("IMPORT_BULK_LOAD", "false").lower() == "true"
+
+# write a Chrome trace-event file for each import (spans are always added to the import json log)
+TRACE_IMPORTS_TO_FILE = os.environ.get("TRACE_IMPORTS_TO_FILE", "false").lower() == "true"
+
+# chart rendering options
+CHART_DPI = int(os.environ.get("CHART_DPI", 100))
+CHART_FORMAT = os.environ.get("CHART_FORMAT", "png")  # png or svg
+CHART_RENDER_WORKERS = int(os.environ.get("CHART_RENDER_WORKERS", 1))
+
+# report data loading, read with Arrow backed dtypes (requires pyarrow)
+REPORT_USE_ARROW = os.environ.get("REPORT_USE_ARROW", "false").lower() == "true"
+# read hired_employees in chunks of this size for reports (streaming aggregation), 0 loads the whole table
+REPORT_CHUNK_SIZE = int(os.environ.get("REPORT_CHUNK_SIZE", 0))
+# seconds departments/jobs lookups are cached for reports (also invalidated by imports/restores)
+DIMENSION_CACHE_TTL = int(os.environ.get("DIMENSION_CACHE_TTL", 300))
+# seconds table row counts (dashboard/backups pages) are cached, counts are kept up to date by the writers in table_counts
+TABLE_COUNTS_CACHE_TTL = int(os.environ.get("TABLE_COUNTS_CACHE_TTL", 5))
+
+# report snapshots, regenerated in background after imports/restores and every REPORT_SNAPSHOT_INTERVAL seconds (0 disables the interval)
+REPORT_SCHEDULER_ENABLED = os.environ.get("REPORT_SCHEDULER_ENABLED", "true").lower() == "true"
+REPORT_SNAPSHOT_YEARS = os.environ.get("REPORT_SNAPSHOT_YEARS", "2021")  # e.g. 2020,2021
+REPORT_SNAPSHOT_INTERVAL = int(os.environ.get("REPORT_SNAPSHOT_INTERVAL", 3600))
 
 # TODO: Consider cloud storge options
  
-# create directores if not exist
-# main dir for all files generated by the app
-if not os.path.exists(RESULT_FOLDER):
-    os.makedirs(RESULT_FOLDER)
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-if not os.path.exists(LOGS_FOLDER):
-    os.makedirs(LOGS_FOLDER)
-if not os.path.exists(BACKUPS_FOLDER):
-    os.makedirs(BACKUPS_FOLDER)
+# directories are created by create_result_folders() (manage.py init-db / app startup), not at import time
+RESULT_FOLDERS = [RESULT_FOLDER, UPLOAD_FOLDER, LOGS_FOLDER, BACKUPS_FOLDER, CHARTS_FOLDER, TRACES_FOLDER, PROFILES_FOLDER, LOCKS_FOLDER, ANALYTICS_FOLDER]
+
+
+def create_result_folders():
+    """ Create the directories if not exist: main dir for all files generated by the app and its subfolders """
+    for folder in RESULT_FOLDERS:
+        os.makedirs(folder, exist_ok=True)
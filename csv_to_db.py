@@ -5,11 +5,23 @@ import traceback
 import pandas as pd
 import numpy as np
 import json
-from sqlalchemy import insert, text
+from html import escape
+from urllib.parse import quote
+from sqlalchemy import insert, select, update, delete, text, and_, or_
 import uuid
 
-from config import LOGS_FOLDER, SHOW_CONSOLE_LOGS_IMPORT
+from config import LOGS_FOLDER, SHOW_CONSOLE_LOGS_IMPORT, IMPORT_BULK_LOAD
 from models import engine, Session, Department, Job, HiredEmployee, Transaction, exc
+from report_data import invalidate_dimension_cache
+from table_counts import get_table_counts as get_cached_table_counts, add_table_count, set_table_count, invalidate_table_counts_cache
+from metrics import IMPORT_BATCH_SECONDS, IMPORT_ROWS
+from artifacts import compress_artifact
+from bulk_loader import bulk_insert_batch
+from read_replica import get_read_engine
+from analytics_mirror import append_to_mirror, reset_mirror
+from table_locks import table_lock, acquire_table_lock, release_table_lock
+from quarantine import QUARANTINE_TABLES, REASON_BATCH_REJECTED, REASON_DUPLICATE_ID, get_reason_codes, quarantine_rows
+from tracing import start_trace, end_trace, span, traced, traced_iter, get_current_trace, get_current_spans, get_trace_file_path
 
 # TODO: Make this dynamic from DB models
 columns_names_by_table = {
@@ -19,48 +31,108 @@ columns_names_by_table = {
 }
 
 def get_table_counts():
-    query = """SELECT 
-    (SELECT COUNT(id) FROM hired_employees) AS 'Total Hired Employees',
-    (SELECT COUNT(id) FROM departments) AS 'Total Departments',
-    (SELECT COUNT(id) FROM jobs) AS 'Total Jobs',
-    (SELECT COUNT(id) FROM backups_files) AS 'Total Backups',
-    (SELECT COUNT(id) FROM reports) AS 'Total Reports',
-    (SELECT COUNT(id) FROM transactions) AS 'Total Import Transactions'
-    ;"""
-    result = pd.read_sql_query(query, engine)
+    # counts are maintained by the writers in the table_counts stats table (see table_counts.py), no COUNT(id) scans
+    result = pd.DataFrame([get_cached_table_counts()])
     html = result.to_html(index=False)
     return html
 
-def get_import_logs(number_of_logs=100):
+# max transactions per page of the import history
+MAX_IMPORT_LOGS_PAGE_SIZE = 1000
+# status of an import: all batches inserted, some batches rejected, all batches rejected
+IMPORT_STATUSES = ["success", "partial", "rejected"]
+
+
+def encode_transactions_cursor(transaction):
+    """ Keyset cursor of a transaction: datetime and id (tie-breaker for imports in the same second) """
+    return f"{transaction['datetime'].isoformat()}_{transaction['id']}"
+
+def decode_transactions_cursor(cursor):
+    """ Returns (datetime, id) of a cursor, raises ValueError if the cursor is invalid """
+    cursor_datetime, cursor_id = cursor.rsplit("_", 1)
+    return datetime.fromisoformat(cursor_datetime), int(cursor_id)
+
+def get_import_transactions(limit=100, cursor=None, table_name=None, status=None):
+    """
+    Page of the import history, newest first, using keyset pagination on the (table_name,) datetime indexes:
+    WHERE datetime < :cursor (or same datetime and lower id), so pages are cheap at any depth.
+
+    Args:
+        limit (int): transactions per page (1 to MAX_IMPORT_LOGS_PAGE_SIZE)
+        cursor (str): next_cursor of the previous page, None for the first page
+        table_name (str): only imports of this table
+        status (str): only imports with this status (success, partial, rejected)
+    Returns:
+        dict: {"transactions": [...], "next_cursor": str or None}
+    Raises:
+        ValueError: invalid limit, cursor or status
+    """
+    if not 1 <= limit <= MAX_IMPORT_LOGS_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_IMPORT_LOGS_PAGE_SIZE}")
+    if status is not None and status not in IMPORT_STATUSES:
+        raise ValueError(f"status must be one of {IMPORT_STATUSES}")
+
+    query = select(Transaction)
+    if table_name:
+        query = query.where(Transaction.table_name == table_name)
+    if status:
+        query = query.where(Transaction.status == status)
+    if cursor:
+        cursor_datetime, cursor_id = decode_transactions_cursor(cursor)
+        query = query.where(or_(
+            Transaction.datetime < cursor_datetime,
+            and_(Transaction.datetime == cursor_datetime, Transaction.id < cursor_id),
+        ))
+    # fetch one extra row to know if there is a next page
+    query = query.order_by(Transaction.datetime.desc(), Transaction.id.desc()).limit(limit + 1)
+
+    with Session(bind=get_read_engine()) as session:
+        rows = session.execute(query).scalars().all()
+        transactions = [{
+            "id": row.id,
+            "table_name": row.table_name,
+            "import_id": row.import_id,
+            "parent_import_id": row.parent_import_id,
+            "datetime": row.datetime,
+            "status": row.status,
+            "total_batches": row.total_batches,
+            "total_valid_records": row.total_valid_records,
+            "total_invalid_records": row.total_invalid_records,
+            "total_rejected_records": row.total_rejected_records,
+            "json_log_file": row.json_log_file,
+        } for row in rows[:limit]]
+
+    next_cursor = encode_transactions_cursor(transactions[-1]) if len(rows) > limit else None
+    return {"transactions": transactions, "next_cursor": next_cursor}
+
+def get_import_logs(number_of_logs=100, cursor=None):
     try:
-        query = f"SELECT * FROM transactions ORDER BY datetime DESC LIMIT {number_of_logs};"
-        result = pd.read_sql_query(query, engine)
-        if(result.empty):
+        page = get_import_transactions(limit=number_of_logs, cursor=cursor)
+        if not page["transactions"]:
             return "<p>No records found</p>"
 
-        # # Approach using SQLAlchemy ORM: in general not recommended for large datasets
-        # with Session() as session:
-        #     query = text(f"SELECT * FROM transactions ORDER BY datetime DESC LIMIT {number_of_logs};")
-        #     result_sql = session.execute(query)
-        # # check if result_sql is empty
-        # if result_sql.rowcount == 0:
-        #     return "<p>No records found</p>"
-        # # convert to pandas df
-        # result = pd.DataFrame(result_sql.fetchall(), columns=result_sql.keys())
-
-
-        #remove  RESULTS/ from the path
-        result['json_log_file'] = result['json_log_file'].str.replace(r'RESULTS/', '', regex=True)
-        # create colum with formatted date YYYY-MM-DD HH:MM:SS
-        result['formatted_date'] = result['datetime'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        # create colum with html link to the log file
-        result["log_url"] = result["json_log_file"].apply(lambda x: f"<a href='/serve/{x}' target='logs'>{x}</a>")
-        # remove unnecesary columns
-        result = result.drop(columns=['id', 'datetime', 'json_log_file'])
-        # rename columns
-        result = result.rename(columns={'table_name': 'Table Name', 'formatted_date': 'Date Time', 'log_url': 'Log File'})
-        # convert df to html table
-        html = result.to_html(index=False, escape=False) # convert df to html table
+        # build the html table directly (100 rows, no DataFrame needed)
+        rows = []
+        for transaction in page["transactions"]:
+            # remove RESULTS/ from the path
+            log_file = escape((transaction["json_log_file"] or "").replace("RESULTS/", "", 1))
+            rows.append(
+                "<tr>"
+                f"<td>{escape(transaction['table_name'] or '')}</td>"
+                f"<td>{transaction['datetime'].strftime('%Y-%m-%d %H:%M:%S') if transaction['datetime'] else ''}</td>"
+                f"<td>{escape(transaction['status'] or '')}</td>"
+                f"<td>{'' if transaction['total_valid_records'] is None else transaction['total_valid_records']}</td>"
+                f"<td>{'' if transaction['total_invalid_records'] is None else transaction['total_invalid_records']}</td>"
+                f"<td>{'' if transaction['total_rejected_records'] is None else transaction['total_rejected_records']}</td>"
+                f"<td><a href='/serve/{log_file}' target='logs'>{log_file}</a></td>"
+                "</tr>"
+            )
+        html = (
+            "<table border='1' class='dataframe'><thead><tr>"
+            "<th>Table Name</th><th>Date Time</th><th>Status</th><th>Valid</th><th>Invalid</th><th>Rejected</th><th>Log File</th>"
+            "</tr></thead><tbody>" + "".join(rows) + "</tbody></table>"
+        )
+        if page["next_cursor"]:
+            html += f"<p><a href='/import?cursor={quote(page['next_cursor'])}'>Older transactions</a></p>"
         return html
     except Exception as e:
         error_message = f"\nValidating batch. error: {e}"
@@ -70,14 +142,23 @@ def get_import_logs(number_of_logs=100):
 
 def force_truncate_table(table_name):
     query = f"TRUNCATE TABLE {table_name};"
-    with engine.connect() as connection:
-        connection.execute(text(query))
+    # waits for imports/restores of the table (raises TableBusyError if busy)
+    with table_lock(table_name, "truncate"):
+        with engine.connect() as connection:
+            connection.execute(text(query))
+        with engine.begin() as connection:
+            set_table_count(connection, table_name, 0)
+        if table_name == "hired_employees":
+            reset_mirror()
+    invalidate_dimension_cache(table_name)
+    invalidate_table_counts_cache()
     return f"Table {table_name} truncated successfully"
 
 def load_csv_data(file_name, chunk_size, table_name):
     columns_names = columns_names_by_table[table_name]
-    # optional, Specify columns data types: e.g. dtype={'id': 'int64', }
-    df_chunks = pd.read_csv(file_name, chunksize=chunk_size, names=columns_names)
+    # read all values as strings, so the raw values of invalid rows are kept for the quarantine tables
+    # (validate_* functions convert the types)
+    df_chunks = pd.read_csv(file_name, chunksize=chunk_size, names=columns_names, dtype=str)
     # print("Padas parsers object: ", df_chunks)
     return df_chunks
 
@@ -96,23 +177,27 @@ def separate_valid_invalid_data(df_chunks, table_name):
     # loop over chunks and validate and process data in each chunk
     
     try:
-        for df in df_chunks:
+        # parsing of each chunk is lazy, traced on each iteration
+        for batch_number, df in enumerate(traced_iter(df_chunks, "parse_csv"), start=1):
 
             # before start make a full copy of the df. to be used for logging purposes
             df_copy = df.copy()
             
             """Define validation rules for each table"""
-            if(table_name=="hired_employees"):
-                valid_data, invalid_data = validate_hired_employees(df)               
-            elif(table_name=="departments"):
-                valid_data, invalid_data = validate_departments(df)
-            elif(table_name=="jobs"):
-                valid_data, invalid_data = validate_jobs(df)
-            else:
-                print("table name not found")
-
-            # collect all valid and invalid data in each chunk
-            # TODO: consider collecting also original df to report exact values in logging
+            with IMPORT_BATCH_SECONDS.labels(table_name, "validate").time(), \
+                    span("validate", batch_number=batch_number, rows=len(df)) as span_attrs:
+                if(table_name=="hired_employees"):
+                    valid_data, invalid_data = validate_hired_employees(df)               
+                elif(table_name=="departments"):
+                    valid_data, invalid_data = validate_departments(df)
+                elif(table_name=="jobs"):
+                    valid_data, invalid_data = validate_jobs(df)
+                else:
+                    print("table name not found")
+                span_attrs["valid_rows"] = len(valid_data)
+                span_attrs["invalid_rows"] = len(invalid_data)
+
+            # collect all valid and invalid data in each chunk, with the original df (raw values for the quarantine)
             results.append([valid_data, invalid_data, df_copy])
         
         return results
@@ -243,17 +328,26 @@ def create_data_object(table_name, row):
         print(error_message)
         return None
 
-def insert_data_to_db(batches, table_name):
+def insert_data_to_db(batches, table_name, bulk_load=None, parent_import_id=None, target_table=None):
     """
     Inserts data into the database.
     Args:
         batches (list): A list of batches, where each batch is a tuple containing valid and invalid data.
         table_name (str): The name of the table to insert data into.
+        bulk_load (bool): load valid rows with the database loader (bulk_loader.py), defaults to IMPORT_BULK_LOAD
+        parent_import_id (str): import_id of the archive import this import is part of
+        target_table (str): load the valid rows into this table instead (archive imports load <table>__restore shadow
+            tables, swapped in by the caller), the table counts and analytics mirror are updated by the caller
     Returns:
         json_log_file (str): path to JSON file containing the log of the insertion process.
     """
     if SHOW_CONSOLE_LOGS_IMPORT:
             print("\n\n\t insert_data_to_db()")
+    bulk_load = IMPORT_BULK_LOAD if bulk_load is None else bulk_load
+    # ORM objects are mapped to the live tables, other targets are loaded through the staging table
+    staged_load = bulk_load or target_table is not None
+    # id of the import in the quarantine tables and transactions
+    import_id = str(uuid.uuid4())
     try:
         # create db session
         session = Session()
@@ -274,10 +368,15 @@ def insert_data_to_db(batches, table_name):
             #     print(batch[1])
             #     print("==========")
 
-            # loop Valid data
-            for index, row in batch[0].iterrows():
-                data_object = create_data_object(table_name=table_name, row=row)
-                session.add(data_object)
+            batch_number = i+1
+
+            # loop Valid data (bulk load: rows are loaded in the commit step below)
+            if not staged_load:
+                with IMPORT_BATCH_SECONDS.labels(table_name, "build_objects").time(), \
+                        span("create_data_objects", batch_number=batch_number, rows=len(batch[0])):
+                    for index, row in batch[0].iterrows():
+                        data_object = create_data_object(table_name=table_name, row=row)
+                        session.add(data_object)
             
             # save all invalid data into json log file
             # Replace NaN values with empty strings in invalid df
@@ -289,16 +388,39 @@ def insert_data_to_db(batches, table_name):
                 invallid_df = invallid_df.drop('datetime', axis=1)  # axis=1 specifies column
                 invallid_df = invallid_df.rename(columns={'datetime_str': 'datetime'}) 
 
-            # replace NaN values with 0
-            invallid_df.fillna(0, inplace=True)
+            # replace NaN values with 0 (object dtype: raw csv values are strings, read with dtype=str)
+            invallid_df = invallid_df.astype(object).fillna(0)
 
-            batch_number = i+1
+            # raw values and reason codes of invalid rows, bulk-written to the quarantine table with the batch
+            columns = columns_names_by_table[table_name]
+            invalid_raw_df = batch[2].loc[batch[1].index, columns]
+            invalid_reasons = get_reason_codes(invalid_raw_df, batch[1], columns)
 
             # catch exceptions when committing each batch
             try:
-                # pass
+                if staged_load:
+                    # staging table + INSERT ... SELECT in the session transaction
+                    with IMPORT_BATCH_SECONDS.labels(table_name, "bulk_load").time(), \
+                            span("bulk_load", batch_number=batch_number, rows=len(batch[0])):
+                        bulk_insert_batch(session.connection(), table_name, batch[0], native_loader=bulk_load, target_table=target_table)
+                else:
+                    # the INSERTs of the ORM objects run in the flush, so the commit stage only times the commit
+                    with IMPORT_BATCH_SECONDS.labels(table_name, "insert").time(), \
+                            span("insert", batch_number=batch_number, rows=len(batch[0])):
+                        session.flush()
                 # comit each batch to db
-                session.commit()
+                with IMPORT_BATCH_SECONDS.labels(table_name, "commit").time(), \
+                        span("commit", batch_number=batch_number, rows=len(batch[0])):
+                    quarantine_rows(session, table_name, invalid_raw_df, invalid_reasons, import_id, batch_number)
+                    # row count is committed with the batch (rolled back with it on errors)
+                    if target_table is None:
+                        add_table_count(session, table_name, len(batch[0]))
+                    session.commit()
+                IMPORT_ROWS.labels(table_name, "valid").inc(len(batch[0]))
+                IMPORT_ROWS.labels(table_name, "invalid").inc(len(batch[1]))
+                if table_name == "hired_employees" and target_table is None:
+                    # committed rows are appended to the analytics mirror (if enabled)
+                    append_to_mirror(batch[0])
                 result_log = {
                     "table_name": table_name,
                     "batch_number": batch_number,
@@ -307,13 +429,19 @@ def insert_data_to_db(batches, table_name):
                     "invalid_data": invallid_df.to_dict(orient="records"),
                     "status": "success",
                     "message": "Valid data in batch inserted into database.",
-                    "timestamp": datetime.now().timestamp()
-                    
+                    "timestamp": datetime.now().timestamp(),
+                    "trace": get_current_spans(batch_number)
                 }
                 logs.append(result_log)
 
             except exc.IntegrityError as e:
                 session.rollback()
+                IMPORT_ROWS.labels(table_name, "rejected").inc(len(batch[0]))
+                IMPORT_ROWS.labels(table_name, "invalid").inc(len(batch[1]))
+                # the valid rows of the rejected batch are quarantined too, to be reprocessed
+                quarantine_rows(session, table_name, invalid_raw_df, invalid_reasons, import_id, batch_number)
+                quarantine_rows(session, table_name, batch[2].loc[batch[0].index, columns], REASON_BATCH_REJECTED, import_id, batch_number)
+                session.commit()
                 error_message = f"IntegrityError processing batch."
                 error_message += "Detailed error: " + str(e)
                 # error_message += f"\nTraceback:\n{traceback.format_exc()}" # for dev only
@@ -329,27 +457,61 @@ def insert_data_to_db(batches, table_name):
                     "message": "Data in batch violates existing data integrity constraints",
                     "timestamp": datetime.now().timestamp(),
                     "error_message": str(e._message()), 
-                    "error_params": str(e.params)
+                    "error_params": str(e.params),
+                    "trace": get_current_spans(batch_number)
                 }
                 logs.append(result_log_rejected)
 
+        # add import level spans (batch spans are already in each batch log)
+        trace = get_current_trace()
+        if trace is not None:
+            logs.append({
+                "table_name": table_name,
+                "status": "trace",
+                "trace_id": trace.trace_id,
+                "trace_file": get_trace_file_path(trace),
+                "spans": [s for s in get_current_spans() if "batch_number" not in s],
+            })
+
         # save logs to json file for each request
         json_log_file  = dump_json_to_file(logs, table_name)
 
-        # Add log metadata to database
+        # Add log metadata to database, with the import summary (row counts per batch status)
+        batch_logs = [log for log in logs if log["status"] in ("success", "rejected")]
+        inserted_batches = [log for log in batch_logs if log["status"] == "success"]
+        rejected_batches = [log for log in batch_logs if log["status"] == "rejected"]
+        if not rejected_batches:
+            status = "success"
+        elif not inserted_batches:
+            status = "rejected"
+        else:
+            status = "partial"
         transaction_data = {
             'table_name': table_name,
             'datetime': datetime.now(),
-            'json_log_file': json_log_file
+            'json_log_file': json_log_file,
+            'import_id': import_id,
+            'parent_import_id': parent_import_id,
+            'status': status,
+            'total_batches': len(batch_logs),
+            'total_valid_records': sum(log["total_valid_records"] for log in inserted_batches),
+            'total_invalid_records': sum(log["total_invalid_records"] for log in batch_logs),
+            'total_rejected_records': sum(log["total_valid_records"] for log in rejected_batches),
         }
   
         # Add transaction log event into database
         stmt = insert(Transaction).values(**transaction_data)
-        session.execute(stmt)
-        session.commit()
+        with span("log_transaction"):
+            session.execute(stmt)
+            add_table_count(session, "transactions", 1)
+            session.commit()
 
         # close db session
         session.close()
+
+        # cached department/job names used by reports are stale after an import
+        invalidate_dimension_cache(table_name)
+        invalidate_table_counts_cache()
         
         if SHOW_CONSOLE_LOGS_IMPORT:
             print(f"Logs saved successfuly at path: {json_log_file}")
@@ -363,14 +525,21 @@ def insert_data_to_db(batches, table_name):
         print(error_message)
         return "no_log_file_created"
 
-def process_valid_invalid_results(file_name, chunk_size, table_name):
+def process_valid_invalid_results(file_name, chunk_size, table_name, bulk_load=None, parent_import_id=None, lock_table=True, target_table=None):
     """
     This function processes the data in chunks and separates valid and invalid data for each batch.
     
     Parameters:
-    - file_name: str: The name of the file to be processed.
+    - file_name: str: The name of the file to be processed, or a file object (e.g. a csv streamed from an archive).
     - chunk_size: int: The size of each chunk to be processed.
     - table_name: str: The name of the table to be processed.
+    - bulk_load: bool: use the database bulk loader for valid rows (defaults to IMPORT_BULK_LOAD)
+    - parent_import_id: str: import_id of the archive import this file is part of
+    - lock_table: bool: False if the caller already holds the table lock (archive imports)
+    - target_table: str: load the valid rows into this table (archive imports: <table>__restore shadow table)
+
+    Imports of the same table (and restores/truncates) are serialized with a table lock,
+    raises TableBusyError if the table is busy (too many waiting requests or wait timeout).
     """
     if SHOW_CONSOLE_LOGS_IMPORT:
         print("\n\n\t process_valid_invalid_results")
@@ -378,36 +547,202 @@ def process_valid_invalid_results(file_name, chunk_size, table_name):
         print("Table name: ", table_name)
         print("File name: ", file_name)
     
-    # 1. get data batches
-    df_batches = load_csv_data(file_name, chunk_size, table_name)
-    
-    # 2. separate valid and invalid data for each batch
-    valid_invalid_array = separate_valid_invalid_data(df_batches, table_name)
+    lock = acquire_table_lock(table_name, "import") if lock_table else None
+    trace = start_trace(f"import_{table_name}")
+    try:
+        # 1. get data batches
+        with span("load_csv_data", file_name=getattr(file_name, "name", file_name), chunk_size=chunk_size):
+            df_batches = load_csv_data(file_name, chunk_size, table_name)
+        
+        # 2. separate valid and invalid data for each batch
+        with span("separate_valid_invalid_data"):
+            valid_invalid_array = separate_valid_invalid_data(df_batches, table_name)
 
-    num_of_batches = len(valid_invalid_array)
-    
-    if SHOW_CONSOLE_LOGS_IMPORT:
-        print("Number of batchs: ", num_of_batches)
-    
-    if(num_of_batches == 0):
-        print(f"No data to process. {file_name}, {chunk_size}, {table_name}")
-        # TODO: return error message
-        return None
+        num_of_batches = len(valid_invalid_array)
+        
+        if SHOW_CONSOLE_LOGS_IMPORT:
+            print("Number of batchs: ", num_of_batches)
+        
+        if(num_of_batches == 0):
+            print(f"No data to process. {file_name}, {chunk_size}, {table_name}")
+            # TODO: return error message
+            return None
 
-    # 3. insert valid data into db and generate json log file 
-    import_log_json_file = insert_data_to_db(valid_invalid_array, table_name)
+        # 3. insert valid data into db and generate json log file 
+        with span("insert_data_to_db"):
+            import_log_json_file = insert_data_to_db(
+                valid_invalid_array, table_name, bulk_load=bulk_load, parent_import_id=parent_import_id, target_table=target_table
+            )
 
-    if SHOW_CONSOLE_LOGS_IMPORT:
-        print("\n\nimport_log_json_file: ", import_log_json_file)
-    
-    return import_log_json_file
+        if SHOW_CONSOLE_LOGS_IMPORT:
+            print("\n\nimport_log_json_file: ", import_log_json_file)
+        
+        return import_log_json_file
+    finally:
+        if lock is not None:
+            release_table_lock(lock)
+        trace_file = end_trace(trace)
+        if SHOW_CONSOLE_LOGS_IMPORT and trace_file:
+            print(f"Trace saved at path: {trace_file}")
+
+
+def validate_by_table(df, table_name):
+    """ Validate a df with the validation rules of the table, returns (valid_data, invalid_data) """
+    validators = {
+        "hired_employees": validate_hired_employees,
+        "departments": validate_departments,
+        "jobs": validate_jobs,
+    }
+    return validators[table_name](df)
+
+def reprocess_quarantine(table_name, import_id=None, chunk_size=10000):
+    """
+    Re-validate the pending rows of a quarantine table (e.g. after fixing them with SQL) and insert the valid ones set-wise.
+    Each chunk is validated with the import rules and inserted with one INSERT ... SELECT from a staging table
+    (bulk_loader.py), rows with an id that already exists (or repeated in the chunk) stay pending as duplicate_id,
+    invalid rows stay pending with their new reason codes.
+
+    Args:
+        table_name (str): imported table (departments, jobs, hired_employees)
+        import_id (str): only reprocess the rows of an import (transactions.import_id), all pending rows if None
+        chunk_size (int): rows validated and inserted in each transaction
+    Returns:
+        tuple: (bool, dict) with the reprocessed and still pending rows
+    """
+    if table_name not in QUARANTINE_TABLES:
+        return False, {"action": "reprocess_quarantine", "status": "error", "message": f"Table {table_name} not recognized"}
+
+    model = QUARANTINE_TABLES[table_name]
+    target_model = {"departments": Department, "jobs": Job, "hired_employees": HiredEmployee}[table_name]
+    columns = columns_names_by_table[table_name]
+    result = {"action": "reprocess_quarantine", "table_name": table_name, "import_id": import_id,
+              "reprocessed": 0, "invalid": 0, "duplicated": 0}
+    last_quarantine_id = 0
+
+    # same lock as imports, restores and truncates of the table (raises TableBusyError if busy)
+    with table_lock(table_name, "reprocess"):
+        session = Session()
+        try:
+            while True:
+                # keyset pagination over pending rows (rows left pending are not read again)
+                query = select(model.quarantine_id, *[getattr(model, column) for column in columns]) \
+                    .where(model.status == "pending", model.quarantine_id > last_quarantine_id) \
+                    .order_by(model.quarantine_id).limit(chunk_size)
+                if import_id:
+                    query = query.where(model.import_id == import_id)
+                raw_df = pd.DataFrame(session.execute(query).fetchall(), columns=["quarantine_id"] + columns)
+                if raw_df.empty:
+                    break
+                last_quarantine_id = int(raw_df["quarantine_id"].max())
+
+                valid_data, invalid_data = validate_by_table(raw_df.copy(), table_name)
+                reasons = {}
+                if not invalid_data.empty:
+                    invalid_raw_df = raw_df.loc[invalid_data.index, columns]
+                    reasons.update(zip(invalid_data["quarantine_id"], get_reason_codes(invalid_raw_df, invalid_data, columns)))
+
+                # ids already in the table or repeated in the chunk would reject the whole insert
+                ids = [int(value) for value in valid_data["id"]]
+                existing_ids = set()
+                for start in range(0, len(ids), 1000):
+                    existing_ids.update(session.execute(
+                        select(target_model.id).where(target_model.id.in_(ids[start:start + 1000]))
+                    ).scalars())
+                duplicated = valid_data["id"].isin(existing_ids) | valid_data["id"].duplicated()
+                reasons.update((quarantine_id, REASON_DUPLICATE_ID) for quarantine_id in valid_data.loc[duplicated, "quarantine_id"])
+                valid_data = valid_data[~duplicated]
+
+                if not valid_data.empty:
+                    # LOAD DATA LOCAL INFILE only if the connections allow it (IMPORT_BULK_LOAD), executemany otherwise
+                    bulk_insert_batch(session.connection(), table_name, valid_data, native_loader=IMPORT_BULK_LOAD)
+                    session.execute(
+                        update(model)
+                        .where(model.quarantine_id.in_([int(value) for value in valid_data["quarantine_id"]]))
+                        .values(status="reprocessed", reprocessed_at=datetime.now())
+                    )
+                    add_table_count(session, table_name, len(valid_data))
+                if reasons:
+                    # bulk UPDATE by primary key (one executemany)
+                    session.execute(
+                        update(model),
+                        [{"quarantine_id": int(q_id), "reason": reason} for q_id, reason in reasons.items()],
+                    )
+                session.commit()
+
+                if table_name == "hired_employees" and not valid_data.empty:
+                    append_to_mirror(valid_data)
+                IMPORT_ROWS.labels(table_name, "reprocessed").inc(len(valid_data))
+                result["reprocessed"] += len(valid_data)
+                result["invalid"] += len(invalid_data)
+                result["duplicated"] += int(duplicated.sum())
 
+                if SHOW_CONSOLE_LOGS_IMPORT:
+                    print(f"Quarantine {table_name}: {len(valid_data)} rows reprocessed, {len(reasons)} rows still pending")
+
+        except Exception as e:
+            session.rollback()
+            error_message = f"\nError reprocessing quarantine of table: {table_name}. error: {e}"
+            print(error_message)
+            return False, {**result, "status": "error", "message": str(e)}
+        finally:
+            session.close()
+            if result["reprocessed"]:
+                invalidate_dimension_cache(table_name)
+                invalidate_table_counts_cache()
+
+    return True, {**result, "status": "success"}
+
+
+def insert_parent_transaction(import_id, json_log_file, committed):
+    """
+    Transaction of an archive import (table_name "archive"), with the totals of its table imports
+    (transactions with parent_import_id = import_id).
+    If the archive was not committed (its shadow tables were dropped), the table imports are marked rejected
+    and their quarantined rows are deleted, nothing of the archive was loaded.
+
+    Args:
+        import_id (str): import_id of the archive import
+        json_log_file (str): json log of the archive import (one entry per csv file)
+        committed (bool): the tables of the archive were swapped in
+    Returns:
+        dict: the parent transaction data
+    """
+    with Session() as session:
+        children = session.execute(
+            select(Transaction).where(Transaction.parent_import_id == import_id)
+        ).scalars().all()
+        total_valid_records = sum(child.total_valid_records or 0 for child in children)
+        total_rejected_records = sum(child.total_rejected_records or 0 for child in children)
+        if not committed:
+            child_import_ids = [child.import_id for child in children]
+            session.execute(update(Transaction).where(Transaction.parent_import_id == import_id).values(status="rejected"))
+            for model in QUARANTINE_TABLES.values():
+                session.execute(delete(model).where(model.import_id.in_(child_import_ids)))
+            total_rejected_records += total_valid_records
+            total_valid_records = 0
+        transaction_data = {
+            'table_name': "archive",
+            'datetime': datetime.now(),
+            'json_log_file': json_log_file,
+            'import_id': import_id,
+            'status': "success" if committed else "rejected",
+            'total_batches': sum(child.total_batches or 0 for child in children),
+            'total_valid_records': total_valid_records,
+            'total_invalid_records': sum(child.total_invalid_records or 0 for child in children),
+            'total_rejected_records': total_rejected_records,
+        }
+        session.execute(insert(Transaction).values(**transaction_data))
+        add_table_count(session, "transactions", 1)
+        session.commit()
+    invalidate_table_counts_cache()
+    return transaction_data
 
 def get_datetime_string():
     """Generates a string representing the current time """
     now = datetime.now()
     return now.strftime('%Y-%m-%d_%H_%M_%S')
 
+@traced("write_log")
 def dump_json_to_file(data, table_name):
   """Dumps JSON data to a file with error handling and statistics about import.
 
@@ -424,6 +759,8 @@ def dump_json_to_file(data, table_name):
 
     with open(file_path, 'w') as f:
       json.dump(data, f, indent=4)
+    # logs are multi-MB json, served gzipped by /serve
+    compress_artifact(file_path)
     return file_path
   except IOError as e:
     print(f"An error occurred while writing to the file: {e}")
@@ -0,0 +1,126 @@
+# db_pool.py
+""" Connection pool settings and instrumentation (checkouts, wait time, overflow, invalidations) """
+import time
+import threading
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+def new_pool_stats():
+    return {
+        "connects": 0,           # new DBAPI connections opened
+        "checkouts": 0,          # connections handed to the app
+        "checkins": 0,           # connections returned to the pool
+        "invalidations": 0,      # connections invalidated (e.g. server gone away)
+        "soft_invalidations": 0,
+        "checkout_timeouts": 0,  # checkouts that failed after pool_timeout
+        "wait_time_total": 0.0,  # seconds spent waiting for a free connection (without connect time)
+        "wait_time_max": 0.0,
+        "connect_time_total": 0.0,  # seconds spent opening new DBAPI connections
+    }
+
+# pool counters of each engine ("primary", "read"), updated by pool events. Read with get_pool_stats()
+pool_stats = {"primary": new_pool_stats()}
+pool_stats_lock = threading.Lock()
+# start and duration of the DBAPI connect running in this thread (do_connect/connect events), not counted as wait time
+connect_timing = threading.local()
+
+
+def increment_stat(pool_name, name, value=1):
+    with pool_stats_lock:
+        pool_stats[pool_name][name] += value
+
+
+class InstrumentedQueuePool(QueuePool):
+    """ QueuePool that measures how long each checkout waits for a free connection (Pool.connect minus connect time) """
+
+    # key in pool_stats, set by register_pool_events
+    stats_name = "primary"
+
+    def recreate(self):
+        # engine.dispose() replaces the pool, keep counting into the same stats
+        pool = super().recreate()
+        pool.stats_name = self.stats_name
+        return pool
+
+    def connect(self):
+        connect_timing.seconds = 0.0
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            increment_stat(self.stats_name, "checkout_timeouts")
+            raise
+        finally:
+            wait_time = max(0.0, time.perf_counter() - start - connect_timing.seconds)
+            with pool_stats_lock:
+                stats = pool_stats[self.stats_name]
+                stats["wait_time_total"] += wait_time
+                stats["wait_time_max"] = max(stats["wait_time_max"], wait_time)
+
+
+def register_pool_events(engine, pool_name="primary"):
+    """ Attach pool event listeners to an engine to keep pool_stats[pool_name] up to date """
+    with pool_stats_lock:
+        pool_stats.setdefault(pool_name, new_pool_stats())
+    engine.pool.stats_name = pool_name
+
+    def on_do_connect(dialect, connection_record, cargs, cparams):
+        connect_timing.started = time.perf_counter()
+
+    def on_connect(dbapi_connection, connection_record):
+        seconds = time.perf_counter() - getattr(connect_timing, "started", time.perf_counter())
+        connect_timing.seconds = getattr(connect_timing, "seconds", 0.0) + seconds
+        increment_stat(pool_name, "connects")
+        increment_stat(pool_name, "connect_time_total", seconds)
+
+    event.listen(engine, "do_connect", on_do_connect)
+    event.listen(engine, "connect", on_connect)
+    event.listen(engine, "checkout", lambda dbapi_connection, connection_record, connection_proxy: increment_stat(pool_name, "checkouts"))
+    event.listen(engine, "checkin", lambda dbapi_connection, connection_record: increment_stat(pool_name, "checkins"))
+    event.listen(engine, "invalidate", lambda dbapi_connection, connection_record, exception: increment_stat(pool_name, "invalidations"))
+    event.listen(engine, "soft_invalidate", lambda dbapi_connection, connection_record, exception: increment_stat(pool_name, "soft_invalidations"))
+
+
+def is_sqlite_memory_uri(database_uri):
+    """ sqlite:// and sqlite:///:memory: (or mode=memory) databases only exist in the connection that opened them """
+    url = make_url(database_uri)
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+
+def get_engine_options(db_config, database_uri):
+    """ create_engine() keyword arguments from the pool settings in config.db_config """
+    if is_sqlite_memory_uri(database_uri):
+        # a QueuePool would give each pooled connection its own empty database, keep the dialect default pool
+        return {}
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": db_config["pool_size"],
+        "max_overflow": db_config["max_overflow"],
+        "pool_timeout": db_config["pool_timeout"],
+        "pool_recycle": db_config["pool_recycle"],
+        "pool_pre_ping": db_config["pool_pre_ping"],
+    }
+
+
+def get_pool_stats(engine, pool_name="primary"):
+    """
+    Snapshot of the pool state and counters.
+    Returns:
+        dict: current size/checked out/overflow of the pool plus the event counters
+    """
+    pool = engine.pool
+    with pool_stats_lock:
+        stats = dict(pool_stats[pool_name])
+    # dialect default pools (sqlite memory databases) don't track checkouts/overflow
+    is_queue_pool = isinstance(pool, QueuePool)
+    stats.update({
+        "pool_size": pool.size() if is_queue_pool else 0,
+        "checked_out": pool.checkedout() if is_queue_pool else 0,
+        "checked_in": pool.checkedin() if is_queue_pool else 0,
+        "overflow": pool.overflow() if is_queue_pool else 0,
+        "wait_time_avg": stats["wait_time_total"] / stats["checkouts"] if stats["checkouts"] else 0.0,
+    })
+    return stats
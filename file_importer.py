@@ -0,0 +1,345 @@
+# file_importer.py
+"""
+Import a directory or glob of csv files without the HTTP /import route (python manage.py import data/).
+The table of each file is inferred from its name, dimension tables (departments, jobs) are imported before
+hired_employees, and files of the same stage are imported concurrently sharing the engine connection pool.
+
+Zip/tar archives uploaded to /import are full refreshes (import_archive): csv members are streamed from the archive
+without extracting them into shadow tables, swapped in all together only if every table loaded, and the table imports
+are grouped under one parent transaction (table_name "archive").
+"""
+import os
+import glob
+import json
+import time
+import uuid
+import tarfile
+import zipfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from sqlalchemy import text
+
+from config import ANALYTICS_MIRROR_ENABLED
+from models import engine
+from csv_to_db import process_valid_invalid_results, insert_parent_transaction, dump_json_to_file
+from backups import get_shadow_table_name, create_shadow_table, build_shadow_indexes, swap_shadow_tables, drop_shadow_table, ddl_transaction
+from report_data import invalidate_dimension_cache
+from analytics_mirror import mark_mirror_stale
+from table_counts import set_table_count, invalidate_table_counts_cache
+from table_locks import TableBusyError, acquire_table_lock, release_table_lock
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2")
+# seconds a file waits for its table (busy table retries) before it is reported as an error
+IMPORT_MAX_LOCK_WAIT = 600
+
+# import stages, files of a stage are independent and can run concurrently
+IMPORT_STAGES = [["departments", "jobs"], ["hired_employees"]]
+# longest names first, so e.g. hired_employees_jobs.csv is not taken for jobs
+IMPORT_TABLES = sorted((table for stage in IMPORT_STAGES for table in stage), key=len, reverse=True)
+
+print_lock = threading.Lock()
+
+
+def infer_table_name(file_path):
+    """
+    Table of a file from its name, e.g. data/hired_employees_2021.csv -> hired_employees
+    Returns:
+        str: table name, or None if no table name is part of the file name
+    """
+    file_name = os.path.basename(file_path).lower()
+    for table_name in IMPORT_TABLES:
+        if table_name in file_name:
+            return table_name
+    return None
+
+
+def find_import_files(paths):
+    """
+    csv files of directories and glob patterns (e.g. "data/", "backfill/hired_employees_*.csv"), sorted and without duplicates.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "*.csv")))
+        else:
+            files.extend(glob.glob(path))
+    return sorted(set(files))
+
+
+def plan_imports(files):
+    """
+    Group files by import stage.
+    Returns:
+        list: one list of (file, table_name) per stage
+        list: files without a known table name (skipped)
+    """
+    stages = [[] for _ in IMPORT_STAGES]
+    skipped = []
+    for file_path in files:
+        table_name = infer_table_name(file_path)
+        if table_name is None:
+            skipped.append(file_path)
+            continue
+        for stage_number, stage_tables in enumerate(IMPORT_STAGES):
+            if table_name in stage_tables:
+                stages[stage_number].append((file_path, table_name))
+    return stages, skipped
+
+
+def summarize_import_log(log_file):
+    """ Row counts of an import from its json log (batches, valid, invalid, rejected) """
+    summary = {"batches": 0, "valid": 0, "invalid": 0, "rejected": 0}
+    if not log_file or not os.path.exists(log_file):
+        return summary
+    with open(log_file) as f:
+        for log in json.load(f):
+            if log.get("status") == "success":
+                summary["valid"] += log["total_valid_records"]
+            elif log.get("status") == "rejected":
+                summary["rejected"] += log["total_valid_records"]
+            else:
+                continue
+            summary["batches"] += 1
+            summary["invalid"] += log["total_invalid_records"]
+    return summary
+
+
+def import_file(file_path, table_name, chunk_size, bulk_load, max_lock_wait=IMPORT_MAX_LOCK_WAIT):
+    """
+    Import one file, returns a result dictionary (errors are returned, not raised, so other files continue).
+    A busy table is retried until max_lock_wait seconds have passed.
+    """
+    start = time.perf_counter()
+    deadline = time.monotonic() + max_lock_wait
+    while True:
+        try:
+            log_file = process_valid_invalid_results(file_path, chunk_size, table_name, bulk_load=bulk_load)
+            status = "success" if log_file and log_file != "no_log_file_created" else "error"
+            error = None
+        except TableBusyError as e:
+            if time.monotonic() + e.retry_after > deadline:
+                log_file, status, error = None, "error", f"{e} (gave up after waiting {max_lock_wait}s)"
+                break
+            # files of the same table are imported one at a time (table lock), wait for our turn
+            with print_lock:
+                print(f"Waiting for table {table_name}: {e}", flush=True)
+            time.sleep(e.retry_after)
+            continue
+        except Exception as e:
+            log_file, status, error = None, "error", str(e)
+        break
+    return {
+        "file": file_path,
+        "table_name": table_name,
+        "status": status,
+        "error": error,
+        "log_file": log_file,
+        "seconds": round(time.perf_counter() - start, 2),
+        **summarize_import_log(log_file),
+    }
+
+
+def print_progress(done, total, result):
+    with print_lock:
+        print(
+            f"[{done}/{total}] {result['status']:<7} {result['table_name']:<15} {result['file']} "
+            f"valid={result['valid']} invalid={result['invalid']} rejected={result['rejected']} "
+            f"({result['seconds']}s) {result['error'] or result['log_file'] or ''}",
+            flush=True,
+        )
+
+
+def import_files(paths, chunk_size=1000, workers=4, bulk_load=None, max_lock_wait=IMPORT_MAX_LOCK_WAIT):
+    """
+    Import csv files stage by stage (dimensions first), files of a stage run concurrently.
+
+    Args:
+        paths (list): directories and/or glob patterns
+        chunk_size (int): rows per batch
+        workers (int): files imported at the same time (keep it within the connection pool size)
+        bulk_load (bool): use the database bulk loader (defaults to IMPORT_BULK_LOAD)
+        max_lock_wait (int): seconds a file waits for a busy table before it fails
+    Returns:
+        list: result dictionary of each imported file
+    """
+    stages, skipped = plan_imports(find_import_files(paths))
+    for file_path in skipped:
+        print(f"Skipped {file_path}: table name not found in the file name ({', '.join(IMPORT_TABLES)})")
+
+    total = sum(len(stage) for stage in stages)
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="import") as executor:
+        for stage in stages:
+            # next stage starts when all files of this one are imported (hired_employees after departments and jobs)
+            futures = [
+                executor.submit(import_file, file_path, table_name, chunk_size, bulk_load, max_lock_wait)
+                for file_path, table_name in stage
+            ]
+            for future in as_completed(futures):
+                results.append(future.result())
+                print_progress(len(results), total, results[-1])
+    return results
+
+
+def is_archive(file_name):
+    return file_name.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def list_archive_members(archive_path):
+    """
+    csv members of a zip/tar archive (directories and macOS metadata are ignored).
+    Raises:
+        ValueError: the file is not a zip or tar archive
+    """
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    elif tarfile.is_tarfile(archive_path):
+        with tarfile.open(archive_path, "r:*") as archive:
+            names = [member.name for member in archive.getmembers() if member.isfile()]
+    else:
+        raise ValueError(f"{os.path.basename(archive_path)} is not a zip or tar archive")
+    return sorted(
+        name for name in names
+        if name.lower().endswith(".csv") and "__MACOSX" not in name and not os.path.basename(name).startswith(".")
+    )
+
+
+@contextmanager
+def open_archive_member(archive_path, member_name):
+    """ Binary stream of an archive member (not extracted to disk), each caller opens its own archive handle """
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive, archive.open(member_name) as f:
+            yield f
+    else:
+        with tarfile.open(archive_path, "r:*") as archive, archive.extractfile(member_name) as f:
+            yield f
+
+
+def import_archive_table(archive_path, table_name, member_names, chunk_size, bulk_load, parent_import_id):
+    """ Load the members of a table one after another into its shadow table (the caller holds the table lock) """
+    results = []
+    for member_name in member_names:
+        start = time.perf_counter()
+        try:
+            with open_archive_member(archive_path, member_name) as f:
+                log_file = process_valid_invalid_results(
+                    f, chunk_size, table_name, bulk_load=bulk_load, parent_import_id=parent_import_id, lock_table=False,
+                    target_table=get_shadow_table_name(table_name),
+                )
+            status = "success" if log_file and log_file != "no_log_file_created" else "error"
+            error = None
+        except Exception as e:
+            log_file, status, error = None, "error", str(e)
+        results.append({
+            "file": member_name,
+            "table_name": table_name,
+            "status": status,
+            "error": error,
+            "log_file": log_file,
+            "seconds": round(time.perf_counter() - start, 2),
+            **summarize_import_log(log_file),
+        })
+    return results
+
+
+def is_archive_file_loaded(result):
+    """ A file of an archive is loaded if it was imported without errors or rejected batches (invalid rows are quarantined) """
+    return result["status"] == "success" and result["rejected"] == 0
+
+
+def import_archive(archive_path, chunk_size=1000, bulk_load=None):
+    """
+    Full refresh of the tables of a zip/tar archive (e.g. departments.csv, jobs.csv and hired_employees.csv), all or nothing:
+    each table is loaded into its <table>__restore shadow table (departments and jobs in parallel, then hired_employees,
+    files streamed from the archive) and the shadow tables replace the live tables in one swap only if every file loaded.
+    hired_employees is not loaded when a dimension table failed. All imports are logged under one parent transaction.
+
+    The locks of all tables are taken before loading anything, so a busy table rejects the whole archive.
+
+    Args:
+        archive_path (str): uploaded archive
+        chunk_size (int): rows per batch
+        bulk_load (bool): use the database bulk loader (defaults to IMPORT_BULK_LOAD)
+    Returns:
+        dict: import_id, status (success or rejected) and row counts of the parent transaction, with the result of each file
+    Raises:
+        ValueError: not an archive, or no csv file with a known table name
+        TableBusyError: a table of the archive is busy
+    """
+    members = list_archive_members(archive_path)
+    stages, skipped = plan_imports(members)
+    # members of the same table are imported in order by the same worker
+    stage_tables = [{} for _ in stages]
+    for stage_number, stage in enumerate(stages):
+        for member_name, table_name in stage:
+            stage_tables[stage_number].setdefault(table_name, []).append(member_name)
+    tables = sorted(table_name for stage in stage_tables for table_name in stage)
+    if not tables:
+        raise ValueError(f"No csv files of known tables ({', '.join(IMPORT_TABLES)}) in the archive")
+
+    # all locks or none (same order in every archive import)
+    locks = []
+    try:
+        for table_name in tables:
+            locks.append(acquire_table_lock(table_name, "import"))
+    except TableBusyError:
+        for lock in locks:
+            release_table_lock(lock)
+        raise
+
+    import_id = str(uuid.uuid4())
+    results = []
+    committed = False
+    shadow_tables = []
+    try:
+        for table_name in tables:
+            shadow_tables.append(create_shadow_table(table_name))
+        with ThreadPoolExecutor(max_workers=max(len(stage) for stage in stage_tables), thread_name_prefix="archive") as executor:
+            for stage in stage_tables:
+                # hired_employees starts when departments and jobs are loaded, and only if they loaded
+                if not all(is_archive_file_loaded(result) for result in results):
+                    for table_name, member_names in stage.items():
+                        results.extend({
+                            "file": member_name, "table_name": table_name, "status": "skipped",
+                            "error": "not loaded, a table of a previous stage failed", "log_file": None, "seconds": 0,
+                            **summarize_import_log(None),
+                        } for member_name in member_names)
+                    continue
+                futures = [
+                    executor.submit(import_archive_table, archive_path, table_name, member_names, chunk_size, bulk_load, import_id)
+                    for table_name, member_names in stage.items()
+                ]
+                for future in as_completed(futures):
+                    results.extend(future.result())
+
+        if all(is_archive_file_loaded(result) for result in results):
+            with engine.begin() as connection:
+                for table_name in tables:
+                    build_shadow_indexes(connection, table_name)
+            # one transaction for all the renames (and counts): all tables are replaced or none
+            with ddl_transaction() as connection:
+                swap_shadow_tables(connection, tables)
+                for table_name in tables:
+                    set_table_count(connection, table_name, connection.execute(text(f"SELECT COUNT(id) FROM {table_name}")).scalar())
+            committed = True
+    finally:
+        if not committed:
+            for shadow_table in shadow_tables:
+                drop_shadow_table(shadow_table)
+        for lock in locks:
+            release_table_lock(lock)
+
+    if committed:
+        for table_name in tables:
+            invalidate_dimension_cache(table_name)
+        invalidate_table_counts_cache()
+        if "hired_employees" in tables and ANALYTICS_MIRROR_ENABLED:
+            mark_mirror_stale("hired_employees replaced by an archive import")
+
+    json_log_file = dump_json_to_file({"import_id": import_id, "committed": committed, "files": results, "skipped": skipped}, "archive")
+    transaction = insert_parent_transaction(import_id, json_log_file, committed)
+    transaction["datetime"] = transaction["datetime"].isoformat()
+    return {**transaction, "files": results, "skipped": skipped}
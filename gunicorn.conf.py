@@ -0,0 +1,24 @@
+# gunicorn.conf.py
+""" gunicorn settings: gunicorn -c gunicorn.conf.py app:app """
+import os
+
+bind = f":{os.environ.get('PORT', 8080)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+timeout = 0
+
+# import the app once in the master and fork the workers from it (faster worker boot, shared memory pages)
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+
+
+def post_fork(server, worker):
+    """ Reset state inherited from the preloaded master that can't be shared between processes """
+    from models import engine, read_engine
+    from report_scheduler import start_report_scheduler
+
+    # connections opened in the master must not be reused by the workers
+    engine.dispose(close=False)
+    if read_engine is not engine:
+        read_engine.dispose(close=False)
+    # threads don't survive the fork, start the scheduler in the worker
+    start_report_scheduler()
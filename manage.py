@@ -0,0 +1,99 @@
+# manage.py
+"""
+Management commands, run outside the web app:
+    python manage.py init-db          one-time setup (e.g. in the Dockerfile CMD) instead of on every worker boot
+    python manage.py rebuild-counts   recount the table_counts stats
+    python manage.py rebuild-mirror   rebuild the Parquet analytics mirror from an Avro backup
+    python manage.py import data/     bulk import of csv files without HTTP uploads
+"""
+import argparse
+import sys
+import time
+
+from config import create_result_folders
+
+
+def init_db():
+    """
+    Create the result folders and the database tables (CREATE TABLE IF NOT EXISTS).
+    Returns:
+        bool: True if the tables were created or already exist
+    """
+    from models import initialize_db
+
+    create_result_folders()
+    valid_connection, error_msg = initialize_db()
+    if not valid_connection:
+        print("Database connection failed")
+        return False
+    print("Database connection Successful")
+    return True
+
+
+def rebuild_counts():
+    """ Recount all tables into the table_counts stats table (after manual changes to the database) """
+    from table_counts import rebuild_table_counts
+
+    print(rebuild_table_counts())
+    return True
+
+
+def rebuild_mirror(backup_file):
+    """ Rebuild the hired_employees analytics mirror from an Avro backup (default: newest hired_employees backup) """
+    from analytics_mirror import rebuild_mirror_from_backup
+    from table_locks import table_lock
+
+    create_result_folders()
+    # no restore/truncate of hired_employees while the mirror is rebuilt
+    with table_lock("hired_employees", "rebuild_mirror"):
+        result = rebuild_mirror_from_backup(backup_file)
+    print(result)
+    if not result["ready"]:
+        print("The backup doesn't match the live table, create a new hired_employees backup and rebuild again")
+    return result["ready"]
+
+
+def import_files(paths, chunk_size, workers, bulk_load, max_lock_wait):
+    """ Import csv files of directories/globs, dimension tables first (see file_importer.py) """
+    from file_importer import import_files as run_import
+
+    create_result_folders()
+    start = time.perf_counter()
+    results = run_import(paths, chunk_size=chunk_size, workers=workers, bulk_load=bulk_load, max_lock_wait=max_lock_wait)
+    failed = [result for result in results if result["status"] != "success"]
+    print(
+        f"Imported {len(results) - len(failed)}/{len(results)} files in {time.perf_counter() - start:.1f}s: "
+        f"valid={sum(r['valid'] for r in results)} invalid={sum(r['invalid'] for r in results)} "
+        f"rejected={sum(r['rejected'] for r in results)}"
+    )
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="App management commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init-db", help="create the result folders and database tables")
+    commands.add_parser("rebuild-counts", help="recount all tables into table_counts")
+    mirror_parser = commands.add_parser("rebuild-mirror", help="rebuild the hired_employees analytics mirror from an Avro backup")
+    mirror_parser.add_argument("--backup-file", help="path of the backup, default: newest RESULTS/BACKUPS/hired_employees___*.avro")
+    import_parser = commands.add_parser("import", help="import csv files of directories or glob patterns")
+    import_parser.add_argument("paths", nargs="+", help='e.g. data/ or "backfill/hired_employees_*.csv"')
+    import_parser.add_argument("--chunk-size", type=int, default=1000, help="rows per batch")
+    import_parser.add_argument("--workers", type=int, default=4, help="files imported concurrently")
+    import_parser.add_argument("--bulk-load", action="store_true", default=None, help="use the database bulk loader")
+    import_parser.add_argument("--max-lock-wait", type=int, default=600, help="seconds a file waits for a busy table")
+    args = parser.parse_args()
+
+    if args.command == "init-db":
+        ok = init_db()
+    elif args.command == "rebuild-counts":
+        ok = rebuild_counts()
+    elif args.command == "rebuild-mirror":
+        ok = rebuild_mirror(args.backup_file)
+    else:
+        ok = import_files(args.paths, args.chunk_size, args.workers, args.bulk_load, args.max_lock_wait)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
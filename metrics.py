@@ -0,0 +1,152 @@
+# metrics.py
+"""
+Minimal in-process metrics (counters and histograms) rendered in the Prometheus text format at /metrics.
+Metrics are updated once per batch/request/phase (never per row), so they can stay on in production.
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+# default histogram buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+# all registered metrics, rendered in registration order
+registry = []
+
+
+def format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = [(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in pairs]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def format_bucket(bucket):
+    return "+Inf" if bucket == float("inf") else repr(bucket)
+
+
+class Counter:
+    """ Monotonic counter with labels, e.g. IMPORT_ROWS.labels("jobs", "valid").inc(100) """
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def labels(self, *label_values):
+        return BoundCounter(self, tuple(str(value) for value in label_values))
+
+    def inc(self, label_values=(), amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for label_values, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class BoundCounter:
+    def __init__(self, counter, label_values):
+        self.counter = counter
+        self.label_values = label_values
+
+    def inc(self, amount=1):
+        self.counter.inc(self.label_values, amount)
+
+
+class Histogram:
+    """ Histogram with labels, e.g. REPORT_PHASE_SECONDS.labels("req_01", "load").observe(0.2) """
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self.values = {}  # {label_values: [bucket counts, sum, count]}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def labels(self, *label_values):
+        return BoundHistogram(self, tuple(str(value) for value in label_values))
+
+    def observe(self, label_values, value):
+        with self.lock:
+            bucket_counts, total, count = self.values.get(label_values, ([0] * len(self.buckets), 0.0, 0))
+            for i, bucket in enumerate(self.buckets):
+                if value <= bucket:
+                    bucket_counts[i] += 1
+            self.values[label_values] = (bucket_counts, total + value, count + 1)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for label_values, (bucket_counts, total, count) in sorted(self.values.items()):
+                for bucket, bucket_count in zip(self.buckets, bucket_counts):
+                    labels = format_labels(self.label_names, label_values, [("le", format_bucket(bucket))])
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                labels = format_labels(self.label_names, label_values)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class BoundHistogram:
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def observe(self, value):
+        self.histogram.observe(self.label_values, value)
+
+    @contextmanager
+    def time(self):
+        """ Observe the duration of a with block """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+def render_metrics(extra_gauges=None):
+    """
+    Render all metrics in the Prometheus text exposition format.
+
+    Args:
+        extra_gauges (dict): optional {name: value} gauges computed at scrape time (e.g. db pool state)
+    Returns:
+        str: metrics text
+    """
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    for name, value in (extra_gauges or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# IMPORT
+IMPORT_BATCH_SECONDS = Histogram("import_batch_seconds", "Import time per batch and stage (validate, build_objects, insert, bulk_load, commit)", ["table_name", "stage"])
+IMPORT_ROWS = Counter("import_rows_total", "Imported rows by status (valid, invalid, rejected, reprocessed)", ["table_name", "status"])
+
+# BACKUPS
+BACKUP_SECONDS = Histogram("backup_seconds", "Backup create/restore duration", ["table_name", "action"])
+BACKUP_ROWS = Counter("backup_rows_total", "Rows written by backups or loaded by restores", ["table_name", "action"])
+
+# TABLE LOCKS
+TABLE_LOCK_WAIT_SECONDS = Histogram("table_lock_wait_seconds", "Time waiting for a table lock (import, restore, truncate)", ["table_name", "operation"])
+TABLE_LOCK_REJECTED = Counter("table_lock_rejected_total", "Table lock requests rejected (queue_full, timeout)", ["table_name", "reason"])
+
+# REPORTS
+REPORT_PHASE_SECONDS = Histogram("report_phase_seconds", "Report generation time per phase (load, aggregate, render)", ["report_name", "phase"])
+
+# HTTP
+HTTP_REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency per route", ["route", "method", "status"])
@@ -1,8 +1,9 @@
 # models.py
 import os
-from sqlalchemy import create_engine, MetaData, Column, Integer, String, DateTime, Text, text, exc
+from sqlalchemy import create_engine, MetaData, Column, Index, Integer, BigInteger, String, DateTime, Text, text, inspect, exc
 from sqlalchemy.orm import sessionmaker, declarative_base
-from config import DATABASE_URI
+from config import DATABASE_URI, db_config, IMPORT_BULK_LOAD, READ_DATABASE_URI, read_db_config
+from db_pool import get_engine_options, register_pool_events
 
 # create base class
 Base = declarative_base()
@@ -24,7 +25,8 @@ class HiredEmployee(Base):
     __tablename__ = 'hired_employees'
     id = Column(Integer, primary_key=True, autoincrement=False)
     name = Column(String(255))  
-    datetime = Column(DateTime)
+    # report period filters are datetime ranges (periods.get_period_ranges), added to existing databases by init-db
+    datetime = Column(DateTime, index=True)
     datetime_str = Column(String(255))  # added to store the raw datetime string
     department_id = Column(Integer)
     job_id = Column(Integer)
@@ -40,8 +42,22 @@ class Transaction(Base):
     __tablename__ = 'transactions'
     id = Column(Integer, primary_key=True, autoincrement=True)
     table_name = Column(String(255))
-    datetime = Column(DateTime)
+    datetime = Column(DateTime, index=True)
     json_log_file = Column(String(255))
+    # id of the import, also stored in the quarantine rows of the import
+    import_id = Column(String(36), index=True)
+    # import_id of the archive import (table_name "archive") the import is part of
+    parent_import_id = Column(String(36), index=True)
+    # import summary, so the history can be listed/filtered without reading the json logs
+    status = Column(String(32))  # success, partial (some batches rejected) or rejected
+    total_batches = Column(Integer)
+    total_valid_records = Column(Integer)
+    total_invalid_records = Column(Integer)
+    total_rejected_records = Column(Integer)
+    # keyset pagination of the import history filtered by table (ORDER BY datetime DESC, id DESC)
+    __table_args__ = (
+        Index('ix_transactions_table_name_datetime', 'table_name', 'datetime'),
+    )
 
 class Report(Base):
     __tablename__ = 'reports'
@@ -53,6 +69,41 @@ class Report(Base):
     csv = Column(String(255))
     images = Column(String(255))
 
+# Quarantine of rows that failed validation or were in a rejected batch, one table per imported table.
+# Raw csv values are kept as strings (NULL for empty fields), rows can be fixed with SQL and reprocessed.
+class QuarantineMixin:
+    quarantine_id = Column(Integer, primary_key=True, autoincrement=True)
+    import_id = Column(String(36), index=True)
+    batch_number = Column(Integer)
+    reason = Column(String(255))  # comma separated codes, e.g. missing_name,invalid_datetime or batch_rejected
+    status = Column(String(32), index=True)  # pending or reprocessed
+    created_at = Column(DateTime)
+    reprocessed_at = Column(DateTime)
+
+class DepartmentQuarantine(QuarantineMixin, Base):
+    __tablename__ = 'departments_quarantine'
+    id = Column(String(255))
+    department = Column(String(255))
+
+class JobQuarantine(QuarantineMixin, Base):
+    __tablename__ = 'jobs_quarantine'
+    id = Column(String(255))
+    job = Column(String(255))
+
+class HiredEmployeeQuarantine(QuarantineMixin, Base):
+    __tablename__ = 'hired_employees_quarantine'
+    id = Column(String(255))
+    name = Column(String(255))
+    datetime = Column(String(255))
+    department_id = Column(String(255))
+    job_id = Column(String(255))
+
+class TableCount(Base):
+    __tablename__ = 'table_counts'
+    table_name = Column(String(255), primary_key=True)
+    row_count = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime)
+
 def delete_all_tables():
     Base.metadata.drop_all(engine)
 
@@ -61,7 +112,18 @@ def delete_table(table_name):
     table.drop(engine)
 
 # Create a database engine and session
-engine = create_engine(DATABASE_URI)
+engine_options = get_engine_options(db_config, DATABASE_URI)
+if IMPORT_BULK_LOAD and DATABASE_URI.startswith("mysql"):
+    # LOAD DATA LOCAL INFILE (bulk_loader.py)
+    engine_options["connect_args"] = {"local_infile": True}
+engine = create_engine(DATABASE_URI, **engine_options)
+register_pool_events(engine)
+
+# read-only engine with its own pool (same engine if READ_DATABASE_URI is not set), use read_replica.get_read_engine()
+read_engine = engine
+if READ_DATABASE_URI:
+    read_engine = create_engine(READ_DATABASE_URI, **get_engine_options(read_db_config, READ_DATABASE_URI))
+    register_pool_events(read_engine, "read")
 Session = sessionmaker(bind=engine)
 metadata = MetaData()
 # session = Session()
@@ -70,7 +132,43 @@ metadata = MetaData()
 def initialize_db():
     try:
         Base.metadata.create_all(engine)
+        upgrade_db()
+        # stats rows of the counted tables, so concurrent writers only UPDATE them (imported here, table_counts imports models)
+        from table_counts import seed_table_counts
+        seed_table_counts()
         return True, ""
     except Exception as e:
         print(f"\nError Initializing database: {e}\n")
         return False, str(e)
+
+def upgrade_db():
+    """
+    Add columns and indexes of the models missing in tables created by older versions
+    (create_all only creates missing tables). Only nullable columns are added.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                    print(f"Added column {table.name}.{column.name}")
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    print(f"Created index {index.name}")
+
+def check_db_connection():
+    """ Cheap connectivity check (SELECT 1), used by the home page instead of creating the tables on startup """
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        return True, ""
+    except Exception as e:
+        print(f"\nError connecting to database: {e}\n")
+        return False, str(e)
@@ -0,0 +1,83 @@
+# periods.py
+""" Report periods: a list of years and/or a date range, shared by pandas reports and the SQL report API """
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+
+
+def parse_periods(year=None, start_date=None, end_date=None):
+    """
+    Normalize report period parameters.
+
+    Args:
+        year (int | str | list): a year, a list of years or a comma separated string, e.g. "2020,2021"
+        start_date (str | datetime): first day of the date range (inclusive), e.g. "2021-01-01"
+        end_date (str | datetime): last day of the date range (inclusive), e.g. "2021-06-30"
+    Returns:
+        dict: {"years": sorted list of ints or None, "start_date": datetime or None, "end_date": datetime or None}
+    Raises:
+        ValueError: if a year or date can not be parsed or no period is given
+    """
+    years = None
+    if year is not None and year != "":
+        if isinstance(year, str):
+            year = year.split(",")
+        if not isinstance(year, (list, tuple, set)):
+            year = [year]
+        years = sorted({int(str(y).strip()) for y in year if str(y).strip() != ""}) or None
+
+    if isinstance(start_date, str):
+        start_date = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+    if isinstance(end_date, str):
+        end_date = datetime.strptime(end_date, "%Y-%m-%d") if end_date else None
+
+    if years is None and start_date is None and end_date is None:
+        raise ValueError("At least one year or a date range is required")
+
+    return {"years": years, "start_date": start_date, "end_date": end_date}
+
+
+def get_period_ranges(periods):
+    """
+    Convert periods into [start, end) datetime ranges, so filters can use an index on datetime.
+    Consecutive years are merged into a single range.
+    """
+    ranges = []
+    for year in periods["years"] or []:
+        start, end = datetime(year, 1, 1), datetime(year + 1, 1, 1)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def get_date_range_end(periods):
+    """ end_date is inclusive, returns the exclusive upper bound """
+    if periods["end_date"] is None:
+        return None
+    return periods["end_date"] + timedelta(days=1)
+
+
+def sql_period_filter(column, periods):
+    """ SQLAlchemy filter expression for a datetime column """
+    conditions = []
+    ranges = get_period_ranges(periods)
+    if ranges:
+        conditions.append(or_(*[and_(column >= start, column < end) for start, end in ranges]))
+    if periods["start_date"] is not None:
+        conditions.append(column >= periods["start_date"])
+    if periods["end_date"] is not None:
+        conditions.append(column < get_date_range_end(periods))
+    return and_(*conditions)
+
+
+def df_period_filter(datetime_series, periods):
+    """ Boolean mask of the rows of a pandas datetime Series within the periods """
+    mask = datetime_series.notnull()
+    if periods["years"]:
+        mask &= datetime_series.dt.year.isin(periods["years"])
+    if periods["start_date"] is not None:
+        mask &= datetime_series >= periods["start_date"]
+    if periods["end_date"] is not None:
+        mask &= datetime_series < get_date_range_end(periods)
+    return mask
@@ -0,0 +1,123 @@
+# profiling.py
+"""
+Per-request profiling, enabled with ?profile=1 or the X-Profile: 1 header (only if PROFILING_ENABLED).
+Each profiled request writes into PROFILES_FOLDER:
+    - <name>.pstats: cProfile stats (python -m pstats, snakeviz)
+    - <name>.collapsed: sampled stacks in collapsed format (flamegraph.pl, speedscope)
+"""
+import sys
+import time
+import uuid
+import cProfile
+import threading
+from collections import Counter
+
+from config import PROFILES_FOLDER, PROFILING_ENABLED, PROFILING_TOKEN, PROFILING_SAMPLE_INTERVAL
+from artifacts import compress_artifact
+
+# cProfile can only profile one request at a time (global profiler hook on recent python versions)
+profiling_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread every `interval` seconds from a background thread.
+    Low overhead: the profiled thread is never instrumented, only its current frame is read.
+    """
+
+    def __init__(self, thread_id, interval=PROFILING_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """ Stacks in collapsed format: 'root;caller;callee count' per line """
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+
+class RequestProfiler:
+    """ cProfile + sampling profiler for the current thread """
+
+    def __init__(self, name):
+        self.name = f"{name}___{uuid.uuid4()}"
+        self.profile = cProfile.Profile()
+        self.sampler = SamplingProfiler(threading.get_ident())
+        self.start_time = None
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.sampler.start()
+        self.profile.enable()
+
+    def stop(self):
+        """
+        Stop profiling and write the profile artifacts.
+        Returns:
+            dict: paths of the pstats and collapsed stacks files and the elapsed time
+        """
+        self.profile.disable()
+        self.sampler.stop()
+        pstats_file = f"{PROFILES_FOLDER}/{self.name}.pstats"
+        collapsed_file = f"{PROFILES_FOLDER}/{self.name}.collapsed"
+        self.profile.dump_stats(pstats_file)
+        with open(collapsed_file, "w") as f:
+            f.write(self.sampler.collapsed())
+        compress_artifact(collapsed_file)
+        return {
+            "pstats": pstats_file,
+            "collapsed": collapsed_file,
+            "elapsed_seconds": round(time.perf_counter() - self.start_time, 3),
+        }
+
+
+def should_profile(request):
+    """ True if profiling is enabled in config and requested (and authorized) by the client """
+    if not PROFILING_ENABLED:
+        return False
+    requested = request.args.get("profile") == "1" or request.headers.get("X-Profile") == "1"
+    if not requested:
+        return False
+    if PROFILING_TOKEN and request.headers.get("X-Profile-Token") != PROFILING_TOKEN:
+        return False
+    return True
+
+
+def start_request_profiler(name):
+    """ Start profiling the current request, returns None if another request is being profiled """
+    if not profiling_lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = RequestProfiler(name)
+        profiler.start()
+        return profiler
+    except Exception:
+        profiling_lock.release()
+        raise
+
+
+def stop_request_profiler(profiler):
+    try:
+        return profiler.stop()
+    finally:
+        profiling_lock.release()
@@ -0,0 +1,97 @@
+# quarantine.py
+"""
+Quarantine of invalid import rows: rows that fail validation or belong to a rejected batch are bulk-written with their
+raw csv values, import id, batch number and reason codes to <table>_quarantine, instead of only to the json logs.
+Rows can be fixed with SQL (UPDATE hired_employees_quarantine SET datetime = ... WHERE quarantine_id = ...)
+and reprocessed with csv_to_db.reprocess_quarantine().
+"""
+from datetime import datetime
+from sqlalchemy import insert, select, func
+
+from models import DepartmentQuarantine, JobQuarantine, HiredEmployeeQuarantine
+
+QUARANTINE_TABLES = {
+    "departments": DepartmentQuarantine,
+    "jobs": JobQuarantine,
+    "hired_employees": HiredEmployeeQuarantine,
+}
+
+# reason of the valid rows of a batch rejected by the database (e.g. duplicated ids)
+REASON_BATCH_REJECTED = "batch_rejected"
+# reason of reprocessed rows whose id already exists in the table
+REASON_DUPLICATE_ID = "duplicate_id"
+
+
+def get_reason_codes(raw_df, checked_df, columns):
+    """
+    Reason codes of invalid rows: missing_<column> if the raw value is empty, invalid_<column> if it could not be converted.
+
+    Args:
+        raw_df (DataFrame): raw csv values
+        checked_df (DataFrame): the same rows after validation (converted values, NaN if invalid)
+        columns (list): required columns
+    Returns:
+        Series: comma separated codes by row
+    """
+    codes = [[] for _ in range(len(raw_df))]
+    for column in columns:
+        missing = raw_df[column].isnull().to_numpy()
+        invalid = (~raw_df[column].isnull() & checked_df[column].isnull()).to_numpy()
+        for position in missing.nonzero()[0]:
+            codes[position].append(f"missing_{column}")
+        for position in invalid.nonzero()[0]:
+            codes[position].append(f"invalid_{column}")
+    return [",".join(row_codes) or "invalid" for row_codes in codes]
+
+
+def quarantine_rows(connection, table_name, raw_df, reasons, import_id, batch_number):
+    """
+    Bulk-insert rows into the quarantine table of an imported table (one executemany), in the caller's transaction.
+
+    Args:
+        connection: SQLAlchemy connection or session
+        table_name (str): imported table
+        raw_df (DataFrame): raw csv values of the rows (columns of the csv)
+        reasons (list | str): reason codes of each row, or one reason for all rows
+        import_id (str): id of the import (transactions.import_id)
+        batch_number (int): batch of the rows
+    Returns:
+        int: rows quarantined
+    """
+    if raw_df.empty:
+        return 0
+    model = QUARANTINE_TABLES[table_name]
+    if isinstance(reasons, str):
+        reasons = [reasons] * len(raw_df)
+    now = datetime.now()
+    # raw values as strings, NaN as NULL
+    raw_values = raw_df.astype(object).where(raw_df.notnull(), None)
+    rows = []
+    for raw_row, reason in zip(raw_values.to_dict(orient="records"), reasons):
+        row = {column: None if value is None else str(value) for column, value in raw_row.items()}
+        row.update({
+            "import_id": import_id,
+            "batch_number": batch_number,
+            "reason": reason,
+            "status": "pending",
+            "created_at": now,
+        })
+        rows.append(row)
+    connection.execute(insert(model), rows)
+    return len(rows)
+
+
+def get_quarantine_summary(connection, table_name=None):
+    """
+    Quarantined rows by table, status and reason.
+    Returns:
+        list: [{"table_name", "status", "reason", "rows"}]
+    """
+    summary = []
+    for quarantined_table, model in QUARANTINE_TABLES.items():
+        if table_name and quarantined_table != table_name:
+            continue
+        query = select(model.status, model.reason, func.count()).group_by(model.status, model.reason)
+        for status, reason, rows in connection.execute(query):
+            summary.append({"table_name": quarantined_table, "status": status, "reason": reason, "rows": rows})
+    return summary
@@ -0,0 +1,86 @@
+# read_replica.py
+"""
+Routing of read-only queries (reports, table counts, import history, backups) to the read engine (READ_DATABASE_URI).
+Reads go to the primary when no read engine is configured, the replica can't be reached,
+or its replication lag is over REPLICA_MAX_LAG seconds.
+Reads that must see a write that just committed (caches and report snapshots refreshed after an import, restore or
+truncate) use get_read_engine(fresh=True) or run inside primary_reads().
+"""
+import time
+import threading
+from contextlib import contextmanager
+from sqlalchemy import text
+
+from config import REPLICA_MAX_LAG, REPLICA_LAG_CHECK_INTERVAL
+from models import engine, read_engine
+
+# last measured lag, shared by request threads
+replica_lag = {"seconds": None, "checked_at": None}
+replica_lag_lock = threading.Lock()
+# threads whose reads are routed to the primary, see primary_reads()
+primary_reads_state = threading.local()
+
+
+def measure_replica_lag():
+    """
+    Replication lag of the read engine in seconds.
+    MySQL: Seconds_Behind_Source of SHOW REPLICA STATUS (SHOW SLAVE STATUS before 8.0.22), 0 if the server is not a replica.
+    Other databases (e.g. a SQLite file as stand-in) have no replication: 0.
+    Returns:
+        float: lag in seconds, None if unknown (replication stopped or replica unreachable)
+    """
+    if read_engine.dialect.name != "mysql":
+        return 0.0
+    try:
+        with read_engine.connect() as connection:
+            try:
+                status = connection.execute(text("SHOW REPLICA STATUS")).mappings().first()
+            except Exception:
+                status = connection.execute(text("SHOW SLAVE STATUS")).mappings().first()
+    except Exception as e:
+        print(f"Error checking read replica lag: {e}")
+        return None
+    if status is None:
+        return 0.0
+    lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+    return None if lag is None else float(lag)
+
+
+def get_replica_lag():
+    """ Replica lag, measured at most every REPLICA_LAG_CHECK_INTERVAL seconds """
+    with replica_lag_lock:
+        checked_at = replica_lag["checked_at"]
+        if checked_at is not None and time.monotonic() - checked_at < REPLICA_LAG_CHECK_INTERVAL:
+            return replica_lag["seconds"]
+    seconds = measure_replica_lag()
+    with replica_lag_lock:
+        replica_lag["seconds"] = seconds
+        replica_lag["checked_at"] = time.monotonic()
+    return seconds
+
+
+@contextmanager
+def primary_reads():
+    """ Route get_read_engine() calls of this thread to the primary, e.g. a report refresh requested by an import """
+    previous = getattr(primary_reads_state, "active", False)
+    primary_reads_state.active = True
+    try:
+        yield
+    finally:
+        primary_reads_state.active = previous
+
+
+def get_read_engine(fresh=False):
+    """
+    Engine for read-only queries: the read engine if it's within the lag tolerance, the primary otherwise.
+    Never use it for writes.
+
+    Args:
+        fresh (bool): the read must see the latest writes (a replica within the lag tolerance may still miss them)
+    """
+    if read_engine is engine or fresh or getattr(primary_reads_state, "active", False):
+        return engine
+    lag = get_replica_lag()
+    if lag is None or lag > REPLICA_MAX_LAG:
+        return engine
+    return read_engine
@@ -0,0 +1,117 @@
+# report_api.py
+""" Compact aggregated report data for the JSON report API (charts are rendered client side) """
+import pandas as pd
+from sqlalchemy import select, func, extract
+
+from models import Department, Job, HiredEmployee
+from read_replica import get_read_engine
+from periods import parse_periods, sql_period_filter
+
+
+def query_hires_by_quarter(year=2021, start_date=None, end_date=None):
+    """
+    Number of employees hired per department and job for each quarter of the requested periods.
+    Aggregation runs in the database in a single grouped query (year and month together),
+    so any number of years costs one table scan.
+
+    Args:
+        year (int | list): Year or list of years to filter the data. Default is 2021.
+        start_date (str): optional first day of a date range, e.g. "2021-01-01"
+        end_date (str): optional last day of a date range, e.g. "2021-06-30"
+    Returns:
+        pd.DataFrame: 'year', 'department', 'job', 'Q1', 'Q2', 'Q3', 'Q4' columns,
+                      sorted by year, department_id and job_id.
+    """
+    periods = parse_periods(year, start_date, end_date)
+    year_col = extract('year', HiredEmployee.datetime)
+    month_col = extract('month', HiredEmployee.datetime)
+    stmt = (
+        select(
+            year_col.label('year'),
+            HiredEmployee.department_id,
+            HiredEmployee.job_id,
+            Department.department,
+            Job.job,
+            month_col.label('month'),
+            func.count(HiredEmployee.id).label('hires'),
+        )
+        .select_from(HiredEmployee)
+        .outerjoin(Department, Department.id == HiredEmployee.department_id)
+        .outerjoin(Job, Job.id == HiredEmployee.job_id)
+        .where(sql_period_filter(HiredEmployee.datetime, periods))
+        .group_by(year_col, HiredEmployee.department_id, HiredEmployee.job_id, Department.department, Job.job, month_col)
+    )
+    df = pd.read_sql(stmt, get_read_engine())
+
+    quarter_cols = ['Q1', 'Q2', 'Q3', 'Q4']
+    if df.empty:
+        return pd.DataFrame(columns=['year', 'department', 'job'] + quarter_cols)
+
+    # fold months into quarters
+    df['year'] = df['year'].astype(int)
+    df['quarter'] = 'Q' + ((df['month'].astype(int) - 1) // 3 + 1).astype(str)
+    hires_df = df.pivot_table(index=['year', 'department_id', 'job_id'], columns='quarter',
+                              values='hires', aggfunc='sum', fill_value=0).reset_index()
+    hires_df.columns.name = None
+
+    # attach names after pivoting (ids without a matching department/job keep empty names)
+    names_df = df[['department_id', 'job_id', 'department', 'job']].drop_duplicates(['department_id', 'job_id'])
+    hires_df = hires_df.merge(names_df, on=['department_id', 'job_id'], how='left')
+
+    # Ensure all four quarters are present
+    for quarter in quarter_cols:
+        if quarter not in hires_df.columns:
+            hires_df[quarter] = 0
+
+    hires_df = hires_df.sort_values(['year', 'department_id', 'job_id'])
+    hires_df[quarter_cols] = hires_df[quarter_cols].astype(int)
+    return hires_df[['year', 'department', 'job'] + quarter_cols]
+
+
+def query_top_departments(year=2021, start_date=None, end_date=None):
+    """
+    Departments that hired more employees than the mean of all departments, for each requested year.
+    All years are computed in a single grouped query.
+
+    Args:
+        year (int | list): Year or list of years to filter the data. Default is 2021.
+        start_date (str): optional first day of a date range, e.g. "2021-01-01"
+        end_date (str): optional last day of a date range, e.g. "2021-06-30"
+    Returns:
+        pd.DataFrame: 'year', 'id', 'department' and 'hired' columns sorted by year and 'hired' in descending order.
+    """
+    periods = parse_periods(year, start_date, end_date)
+    year_col = extract('year', HiredEmployee.datetime)
+    stmt = (
+        select(
+            year_col.label('year'),
+            HiredEmployee.department_id.label('id'),
+            Department.department,
+            func.count(HiredEmployee.id).label('hired'),
+        )
+        .select_from(HiredEmployee)
+        .outerjoin(Department, Department.id == HiredEmployee.department_id)
+        .where(sql_period_filter(HiredEmployee.datetime, periods))
+        .group_by(year_col, HiredEmployee.department_id, Department.department)
+    )
+    df = pd.read_sql(stmt, get_read_engine())
+    if df.empty:
+        return df
+
+    # Filter departments that hired above the mean of their year
+    df['year'] = df['year'].astype(int)
+    mean_hires = df.groupby('year')['hired'].transform('mean')
+    result = df[df['hired'] > mean_hires]
+    return result.sort_values(['year', 'hired'], ascending=[True, False])
+
+
+def to_report_payload(report_name, periods, df):
+    """ Compact JSON payload of a report: period parameters, column names and rows as lists """
+    return {
+        "report_name": report_name,
+        "years": periods["years"],
+        "start_date": periods["start_date"].strftime('%Y-%m-%d') if periods["start_date"] else None,
+        "end_date": periods["end_date"].strftime('%Y-%m-%d') if periods["end_date"] else None,
+        "columns": list(df.columns),
+        "data": df.astype(object).where(df.notnull(), None).values.tolist(),
+    }
@@ -0,0 +1,168 @@
+# report_data.py
+""" Typed, compact DataFrame loading for reports: only required columns, downcasted ids and categorical names """
+import time
+import threading
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from config import REPORT_USE_ARROW, DIMENSION_CACHE_TTL
+from read_replica import get_read_engine
+
+# columns needed by the reports (name and datetime_str are never used)
+HIRED_EMPLOYEES_REPORT_COLUMNS = ['id', 'datetime', 'department_id', 'job_id']
+
+# name column of each dimension table
+DIMENSION_NAME_COLUMNS = {
+    'departments': 'department',
+    'jobs': 'job',
+}
+
+# candidate integer types for ids, smallest first
+ID_DTYPES = [np.int16, np.int32, np.int64]
+
+
+def downcast_id(series):
+    """
+    Cast an id column to the smallest integer type that can hold its values.
+    Columns with missing values use the pandas nullable integer types (Int16, Int32, Int64),
+    Arrow backed columns stay Arrow backed (e.g. int16[pyarrow]).
+    """
+    has_nulls = series.isnull().any()
+    values = series.dropna()
+    for dtype in ID_DTYPES:
+        info = np.iinfo(dtype)
+        if values.empty or (values.min() >= info.min and values.max() <= info.max):
+            if isinstance(series.dtype, pd.ArrowDtype):
+                return series.astype(f"{np.dtype(dtype).name}[pyarrow]")
+            if has_nulls:
+                return series.astype(np.dtype(dtype).name.capitalize())  # e.g. int16 -> Int16
+            return series.astype(dtype)
+    return series
+
+
+def compact_hired_employees(df):
+    """ Downcast the id columns of a hired_employees DataFrame (in place) """
+    for column in ['id', 'department_id', 'job_id']:
+        if column in df.columns:
+            df[column] = downcast_id(df[column])
+    return df
+
+
+def read_table(sql_query, use_arrow=None, con=None, **kwargs):
+    """ pd.read_sql with optional Arrow backed dtypes (pandas >= 2.0), on the read engine by default """
+    use_arrow = REPORT_USE_ARROW if use_arrow is None else use_arrow
+    con = get_read_engine() if con is None else con
+    if use_arrow:
+        return pd.read_sql(sql_query, con, dtype_backend="pyarrow", **kwargs)
+    return pd.read_sql(sql_query, con, **kwargs)
+
+
+def load_hired_employees(columns=None, use_arrow=None):
+    """
+    Load hired_employees with only the columns needed by the reports.
+
+    Args:
+        columns (list): columns to select, default HIRED_EMPLOYEES_REPORT_COLUMNS
+        use_arrow (bool): read using Arrow backed dtypes, default REPORT_USE_ARROW
+    Returns:
+        pd.DataFrame: ids downcasted to the smallest integer type, datetime as datetime64
+    """
+    columns = columns or HIRED_EMPLOYEES_REPORT_COLUMNS
+    sql_query = f"SELECT {', '.join(columns)} FROM hired_employees"
+    df = read_table(sql_query, use_arrow, parse_dates=['datetime'] if 'datetime' in columns else None)
+    return compact_hired_employees(df)
+
+
+def iter_hired_employees(chunk_size, columns=None, use_arrow=None):
+    """
+    Stream hired_employees in chunks using a server-side cursor, so only one chunk is held in memory.
+
+    Args:
+        chunk_size (int): number of rows per chunk
+        columns (list): columns to select, default HIRED_EMPLOYEES_REPORT_COLUMNS
+        use_arrow (bool): read using Arrow backed dtypes, default REPORT_USE_ARROW
+    Yields:
+        pd.DataFrame: chunks with the same dtypes as load_hired_employees()
+    """
+    columns = columns or HIRED_EMPLOYEES_REPORT_COLUMNS
+    sql_query = text(f"SELECT {', '.join(columns)} FROM hired_employees")
+    with get_read_engine().connect().execution_options(stream_results=True) as connection:
+        df_chunks = read_table(sql_query, use_arrow, con=connection, chunksize=chunk_size,
+                               parse_dates=['datetime'] if 'datetime' in columns else None)
+        for df in df_chunks:
+            yield compact_hired_employees(df)
+
+
+def load_dimension(table_name, name_column, use_arrow=None, fresh=False):
+    """
+    Load a dimension table (departments or jobs) with a downcasted id and a categorical name column.
+    fresh=True reads the primary (e.g. right after an import of the table).
+    """
+    df = read_table(f"SELECT id, {name_column} FROM {table_name}", use_arrow, con=get_read_engine(fresh=fresh))
+    df['id'] = downcast_id(df['id'])
+    df[name_column] = df[name_column].astype('category')
+    return df
+
+
+def load_departments(use_arrow=None):
+    return load_dimension('departments', 'department', use_arrow)
+
+
+def load_jobs(use_arrow=None):
+    return load_dimension('jobs', 'job', use_arrow)
+
+
+# Dimension cache: departments and jobs as {id: name} lookups, shared by all reports.
+# Invalidated by imports, restores and truncates of the dimension tables, and refreshed after DIMENSION_CACHE_TTL seconds.
+dimension_cache = {}
+dimension_cache_lock = threading.Lock()
+# tables written since they were cached, reloaded from the primary (a lagging replica would be cached for the TTL)
+dimension_fresh_tables = set()
+
+
+def get_dimension_lookup(table_name):
+    """
+    Returns the {id: name} lookup of a dimension table ('departments' or 'jobs'), loading it on first use.
+    """
+    with dimension_cache_lock:
+        cached = dimension_cache.get(table_name)
+        if cached is not None and time.monotonic() - cached["loaded_at"] < DIMENSION_CACHE_TTL:
+            return cached["lookup"]
+        fresh = table_name in dimension_fresh_tables
+        dimension_fresh_tables.discard(table_name)
+
+    name_column = DIMENSION_NAME_COLUMNS[table_name]
+    try:
+        df = load_dimension(table_name, name_column, fresh=fresh)
+    except Exception:
+        if fresh:
+            with dimension_cache_lock:
+                dimension_fresh_tables.add(table_name)
+        raise
+    lookup = dict(zip(df['id'].tolist(), df[name_column].astype(object).tolist()))
+
+    with dimension_cache_lock:
+        dimension_cache[table_name] = {"lookup": lookup, "loaded_at": time.monotonic()}
+    return lookup
+
+
+def invalidate_dimension_cache(table_name=None):
+    """ Drop cached lookups of a dimension table (or all of them), e.g. after an import or restore """
+    with dimension_cache_lock:
+        if table_name is None:
+            dimension_cache.clear()
+            dimension_fresh_tables.update(DIMENSION_NAME_COLUMNS)
+        elif table_name in DIMENSION_NAME_COLUMNS:
+            dimension_cache.pop(table_name, None)
+            dimension_fresh_tables.add(table_name)
+
+
+def dimension_frame(table_name, id_column='id'):
+    """ Cached dimension table as a DataFrame (id, name), e.g. for callers expecting departments_df/jobs_df """
+    name_column = DIMENSION_NAME_COLUMNS[table_name]
+    lookup = get_dimension_lookup(table_name)
+    df = pd.DataFrame({id_column: list(lookup.keys()), name_column: pd.Categorical(list(lookup.values()))})
+    df[id_column] = downcast_id(df[id_column])
+    return df
+
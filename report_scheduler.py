@@ -0,0 +1,104 @@
+# report_scheduler.py
+""" Background generation of report snapshots (req001/req002) after imports/restores or on an interval """
+import threading
+import traceback
+
+from config import REPORT_SNAPSHOT_YEARS, REPORT_SNAPSHOT_INTERVAL, REPORT_SCHEDULER_ENABLED, SHOW_CONSOLE_LOGS_REPORTS
+from models import Session, Report
+from read_replica import primary_reads
+
+# reports generated for each snapshot
+SNAPSHOT_REPORTS = ["req_01_hires_dep_job_quarter", "req_02_hires_dep_top"]
+
+# set when a refresh is requested, the worker regenerates the snapshots once for any number of requests
+refresh_requested = threading.Event()
+scheduler_thread = None
+scheduler_lock = threading.Lock()
+
+
+def generate_report_snapshots():
+    """
+    Generate the standard reports for the configured years and store them as Report rows.
+    Charts are rendered before returning, so snapshots never point to placeholder images.
+    Returns:
+        list: result dictionaries of the generated reports
+    """
+    # imported on first use, req001/req002 pull in pandas, matplotlib and seaborn (slow worker startup)
+    from req001 import process_requirement1
+    from req002 import process_requirement2
+
+    results = []
+    for process_requirement in (process_requirement1, process_requirement2):
+        result = process_requirement(year=REPORT_SNAPSHOT_YEARS, wait_for_charts=True)
+        if result is not None:
+            results.append(result)
+    if SHOW_CONSOLE_LOGS_REPORTS:
+        print(f"Report snapshots generated: {[result['session_id'] for result in results]}")
+    return results
+
+
+def request_report_refresh(reason=""):
+    """ Ask the scheduler to regenerate the report snapshots, e.g. after an import or restore finishes """
+    if SHOW_CONSOLE_LOGS_REPORTS:
+        print(f"Report snapshots refresh requested: {reason}")
+    refresh_requested.set()
+
+
+def run_scheduler():
+    """ Worker loop: regenerate snapshots when requested or every REPORT_SNAPSHOT_INTERVAL seconds """
+    while True:
+        # wait() returns False on timeout (interval elapsed), None timeout waits for a request only
+        requested = refresh_requested.wait(timeout=REPORT_SNAPSHOT_INTERVAL or None)
+        refresh_requested.clear()
+        try:
+            if requested:
+                # refreshes are requested after imports, restores and truncates: read the primary, a replica may lag
+                with primary_reads():
+                    generate_report_snapshots()
+            else:
+                generate_report_snapshots()
+        except Exception as e:
+            error_message = f"\nError generating report snapshots: {e}"
+            error_message += f"\nTraceback:\n{traceback.format_exc()}"
+            print(error_message)
+
+
+def start_report_scheduler(warm_up=True):
+    """
+    Start the scheduler thread (once per process).
+    NOTE: with several gunicorn workers each worker runs its own scheduler, set REPORT_SCHEDULER_ENABLED=false
+    on all but one process (or use --workers 1 as in the Dockerfile).
+
+    Args:
+        warm_up (bool): generate snapshots right away if there are none yet
+    """
+    global scheduler_thread
+    if not REPORT_SCHEDULER_ENABLED:
+        return
+    with scheduler_lock:
+        if scheduler_thread is not None:
+            return
+        scheduler_thread = threading.Thread(target=run_scheduler, name="report-scheduler", daemon=True)
+        scheduler_thread.start()
+    if warm_up and get_latest_snapshot(SNAPSHOT_REPORTS[0]) is None:
+        request_report_refresh("warm up")
+
+
+def get_latest_snapshot(report_name):
+    """
+    Latest generated report of a type.
+    Returns:
+        dict: Report row as a dictionary, or None if the report was never generated
+    """
+    with Session() as session:
+        report = session.query(Report).filter(Report.report_name == report_name).order_by(Report.datetime.desc()).first()
+        if report is None:
+            return None
+        return {
+            "report_name": report.report_name,
+            "session_id": report.session_id,
+            "datetime": report.datetime,
+            "html": report.html,
+            "csv": report.csv,
+            "images": report.images,
+        }
@@ -1,11 +1,13 @@
 # reports.py
 
+from config import create_result_folders
 # for clarity, separated functions for each requirement
 from req001 import process_requirement1
 from req002 import process_requirement2
 
 # TODO: remove this file and call this directory into Flask app
 # create a new session
+create_result_folders()
 """
 Challenge 2
 Requiment 1
@@ -3,164 +3,240 @@
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import seaborn as sns
 import uuid
 from sqlalchemy import insert
 from datetime import datetime, timezone
 
-from config import RESULT_FOLDER
+from config import RESULT_FOLDER, REPORT_CHUNK_SIZE
 # load models and engine from models.py
 from models import engine, Session, Report
+from charts import request_chart
+from periods import parse_periods, df_period_filter
+from metrics import REPORT_PHASE_SECONDS
+from artifacts import compress_artifact
+from analytics_mirror import is_mirror_ready, load_mirror_hired_employees
+from table_counts import add_table_count, invalidate_table_counts_cache
+from report_data import load_hired_employees, iter_hired_employees, dimension_frame, get_dimension_lookup
 
-def load_data():
-    # load data from database
-    sql_query = f"SELECT * FROM hired_employees"
-    df = pd.read_sql(sql_query, engine)
-    df.rename(columns={'id': 'employee_id'}, inplace=True)   # rename id to avoid conflicts
+REPORT_NAME = "req_01_hires_dep_job_quarter"
 
-    sql_query = f"SELECT * FROM departments"
-    departments_df = pd.read_sql(sql_query, engine)
-    departments_df.rename(columns={'id': 'department_id'}, inplace=True)  # rename id to enable inner join 
+def load_data(with_names=True, periods=None):
+    """
+    Load report data from database (only required columns, compact dtypes).
+    Departments and jobs come from the dimension cache, names are joined lazily on the aggregated rows.
 
-    sql_query = f"SELECT * FROM jobs"
-    jobs_df = pd.read_sql(sql_query, engine)
-    jobs_df.rename(columns={'id': 'job_id'}, inplace=True)  # rename id to enable inner join 
+    Args:
+        with_names (bool): also add 'department' and 'job' name columns to the employees frame (reports aggregate on ids and pass False)
+        periods (dict): parse_periods() result, read only these periods from the analytics mirror when it's ready
+    Returns:
+        tuple: (hired employees df, departments_df, jobs_df)
+    """
+    if periods is not None and is_mirror_ready():
+        df = load_mirror_hired_employees(periods)
+    else:
+        df = load_hired_employees()
+    df.rename(columns={'id': 'employee_id'}, inplace=True)   # rename id to avoid conflicts
 
-    # Join departments and jobs to validate foreign keys
-    df = pd.merge(df, departments_df, on='department_id', how='left')
-    df = pd.merge(df, jobs_df, on='job_id', how='left')
+    departments_df = dimension_frame('departments', id_column='department_id')
+    jobs_df = dimension_frame('jobs', id_column='job_id')
 
-    return df, departments_df, jobs_df
+    if with_names:
+        # id lookups instead of merging the full employee frame
+        df['department'] = df['department_id'].map(get_dimension_lookup('departments'))
+        df['job'] = df['job_id'].map(get_dimension_lookup('jobs'))
 
+    return df, departments_df, jobs_df
 
-def hires_quarter(df, departments_df, jobs_df, year=2021):
+def count_hires_quarter(df, periods):
     """
-    Calculates the number of employees hired per department and job for each quarter in a year.
-    Ensures all four quarters are present in the output, even if no hires occurred.
+    Partial aggregation: number of unique employees hired per year, department, job and quarter.
+    Counts of different chunks of hired_employees can be added up since employee ids are unique (primary key).
 
     Args:
         df (pd.DataFrame): DataFrame with 'datetime', 'department_id', 'job_id', and 'employee_id' columns.
-        year (int): Year to filter the data. Default is 2021.
+        periods (dict): report periods, see periods.parse_periods()
+    Returns:
+        pd.Series: counts indexed by year, department_id, job_id and quarter
+    """
+    # Create filter and filter data for the periods
+    filt = df_period_filter(df['datetime'], periods)
+    df_filtered_by_year = df[filt]
+
+    # Add year and quarter columns to filtered slice
+    df_filtered_by_year = df_filtered_by_year.assign(
+        year=df_filtered_by_year['datetime'].dt.year,
+        quarter=df_filtered_by_year['datetime'].dt.quarter,
+    )
+
+    # Group by (on filter slice) year, department, job, and quarter and count unique employee IDs:
+    return df_filtered_by_year.groupby(['year', 'department_id', 'job_id', 'quarter'])['employee_id'].nunique()
+
+def format_hires_quarter(hires_counts, departments_df, jobs_df):
+    """
+    Pivot the hires counts to have quarters as columns and join department and job names.
 
+    Args:
+        hires_counts (pd.Series): counts from count_hires_quarter()
     Returns:
-        pd.DataFrame: Number of hires by department, job, and quarter, 
-                      sorted ascending by department_id and job_id.  All four quarters
+        pd.DataFrame: Number of hires by year, department, job, and quarter, 
+                      sorted ascending by year, department_id and job_id.  All four quarters
                       are included as columns.
-    """ 
-    try:
-            # Add quarter column to df
-        df['quarter'] = df['datetime'].dt.quarter
+    """
+    hires_group_dep_job_quarter = hires_counts.astype('int64').rename('employee_id').reset_index()
+
+    # Pivot the table to have quarters as columns:
+    hires_df = hires_group_dep_job_quarter.pivot_table(index=['year', 'department_id', 'job_id'], columns='quarter', values='employee_id', fill_value=0).reset_index()
 
-        # Create filter and filter data for year
-        filt = (df['datetime'].dt.year == year)
-        df_filtered_by_year = df[filt]
+    ################ fixed
+    # Ensure all four quarters are present:
+    for quarter in range(1, 5):  # Check for quarters 1 through 4
+        if quarter not in hires_df.columns:
+            hires_df[quarter] = 0  # Add missing quarter and fill with 0
 
-        # Group by (on filter slice) department, job, and quarter and count unique employee IDs:
-        hires_group_dep_job_quarter  = df_filtered_by_year.groupby(['department_id', 'job_id', 'quarter'])['employee_id'].nunique().reset_index()
+    # Reorder columns to ensure Q1, Q2, Q3, Q4 order (if needed):
+    quarter_cols = [col for col in hires_df.columns if isinstance(col, (int, np.integer)) and 1 <= col <=4]
+    other_cols = [col for col in hires_df.columns if col not in quarter_cols]
+    hires_df = hires_df[other_cols + sorted(quarter_cols)]
+    ################
 
-        # Pivot the table to have quarters as columns:
-        hires_df = hires_group_dep_job_quarter.pivot_table(index=['department_id', 'job_id'], columns='quarter', values='employee_id', fill_value=0).reset_index()
+    # TODO: doube check required order
+    hires_df = hires_df.sort_values(['year', 'department_id', 'job_id'])
 
-        ################ fixed
-        # Ensure all four quarters are present:
-        for quarter in range(1, 5):  # Check for quarters 1 through 4
-            if quarter not in hires_df.columns:
-                hires_df[quarter] = 0  # Add missing quarter and fill with 0
+    # Adjust data frame to requirement
 
-        # Reorder columns to ensure Q1, Q2, Q3, Q4 order (if needed):
-        quarter_cols = [col for col in hires_df.columns if isinstance(col, (int, np.integer)) and 1 <= col <=4]
-        other_cols = [col for col in hires_df.columns if col not in quarter_cols]
-        hires_df = hires_df[other_cols + sorted(quarter_cols)]
-        ################
+    # rename quarter columns to string values
+    hires_df.rename(columns={1: 'Q1', 2: 'Q2', 3: 'Q3', 4: 'Q4'}, inplace=True)
 
-        # TODO: doube check required order
-        hires_df = hires_df.sort_values(['department_id', 'job_id'])
+    # join department and job names on the aggregated rows only (id lookups, no merge)
+    hires_df_dept_jobs = hires_df.assign(
+        department=hires_df['department_id'].map(departments_df.set_index('department_id')['department']),
+        job=hires_df['job_id'].map(jobs_df.set_index('job_id')['job']),
+    )
 
-        # Adjust data frame to requirement
+    # Set a new column order
+    new_order = ['year', 'department', 'job', 'department_id', 'job_id', 'Q1', 'Q2', 'Q3', 'Q4']
 
-        # rename quarter columns to string values
-        hires_df.rename(columns={1: 'Q1', 2: 'Q2', 3: 'Q3', 4: 'Q4'}, inplace=True)
+    # Reorder the DataFrame
+    hires_df_dept_jobs = hires_df_dept_jobs[new_order]
 
-        # join with departments and jobs to get the names
-        hires_df_dept_jobs = hires_df.merge(departments_df, on='department_id', how='left').merge(jobs_df, on='job_id', how='left')
+    # drop department_id and job_id columns
+    hires_df_dept_jobs.drop(['department_id', 'job_id'], axis=1, inplace=True)
 
-        # Set a new column order
-        new_order = ['department', 'job', 'department_id', 'job_id', 'Q1', 'Q2', 'Q3', 'Q4']
+    return hires_df_dept_jobs
 
-        # Reorder the DataFrame
-        hires_df_dept_jobs = hires_df_dept_jobs[new_order]
+def hires_quarter(df, departments_df, jobs_df, year=2021, start_date=None, end_date=None):
+    """
+    Calculates the number of employees hired per department and job for each quarter in the requested periods.
+    Ensures all four quarters are present in the output, even if no hires occurred.
+    All periods are computed in a single grouped pass (year and quarter together).
 
-        # drop department_id and job_id columns
-        hires_df_dept_jobs.drop(['department_id', 'job_id'], axis=1, inplace=True)
+    Args:
+        df (pd.DataFrame): DataFrame with 'datetime', 'department_id', 'job_id', and 'employee_id' columns.
+        year (int | list): Year or list of years to filter the data. Default is 2021.
+        start_date (str): optional first day of a date range, e.g. "2021-01-01"
+        end_date (str): optional last day of a date range, e.g. "2021-06-30"
 
-        return hires_df_dept_jobs
+    Returns:
+        pd.DataFrame: Number of hires by year, department, job, and quarter, 
+                      sorted ascending by year, department_id and job_id.  All four quarters
+                      are included as columns.
+    """ 
+    try:
+        periods = parse_periods(year, start_date, end_date)
+        hires_counts = count_hires_quarter(df, periods)
+        return format_hires_quarter(hires_counts, departments_df, jobs_df)
 
     except Exception as e:
         print(f"Error: {e}")
         return None
 
-def generate_visualizations(df, uuid_sess):
-    """ 
-    Geneate a plot for the report using seaborn
-    can be computationally expensive for large datasets. 
-    TODO: consider other options. e.g, chart.js for web reports
-    TODO: add try except to handle errors
+def hires_quarter_streaming(df_chunks, departments_df, jobs_df, year=2021, start_date=None, end_date=None):
+    """
+    Same as hires_quarter() but reading hired_employees in chunks.
+    Partial counts of each chunk are merged, so memory is bounded by the number of groups, not by the table size.
+
     Args:
-        df (pd.DataFrame): DataFrame with the data to plot
+        df_chunks (iterable): DataFrame chunks with 'datetime', 'department_id', 'job_id', and 'employee_id' columns.
     Returns:
+        pd.DataFrame: same output as hires_quarter()
     """
-    # Initialize lists to store generated plot images
-    images = []
+    try:
+        periods = parse_periods(year, start_date, end_date)
+        hires_counts = None
+        for df in df_chunks:
+            df = df.rename(columns={'id': 'employee_id'})
+            chunk_counts = count_hires_quarter(df, periods)
+            hires_counts = chunk_counts if hires_counts is None else hires_counts.add(chunk_counts, fill_value=0)
+
+        if hires_counts is None:  # empty table
+            index = pd.MultiIndex.from_arrays([[], [], [], []], names=['year', 'department_id', 'job_id', 'quarter'])
+            hires_counts = pd.Series([], index=index, dtype='int64')
+        return format_hires_quarter(hires_counts, departments_df, jobs_df)
 
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
+
+def plot_heatmap(df, ax):
+    """ Heatmap (Good for overview) """
+    sns.heatmap(df.set_index(['year', 'department', 'job']), annot=True, cmap="YlGnBu", fmt=".0f", cbar_kws={'label': 'Number of Hires'}, ax=ax)
+    ax.set_title('Hires by Department, Job, and Quarter')
+    # fixing saved image cropped
+    ax.tick_params(axis='x', labelrotation=45)  # Rotate x-axis labels if needed
+
+def plot_barchart(df, ax):
+    """ Grouped bar chart (comparing quarters and departments) """
     # Melt the DataFrame to make it suitable for seaborn
-    df_melted = df.melt(id_vars=['department', 'job'], var_name='quarter', value_name='hires')
+    df_melted = df.melt(id_vars=['year', 'department', 'job'], var_name='quarter', value_name='hires')
 
     # Convert quarter to string (for categorical plotting)
     df_melted['quarter'] = df_melted['quarter'].astype(str)
+    # compare the same quarter across years when the report covers several years
+    if df_melted['year'].nunique() > 1:
+        df_melted['quarter'] = df_melted['year'].astype(str) + ' ' + df_melted['quarter']
+
+    sns.barplot(x='department', y='hires', hue='quarter', data=df_melted, ax=ax)
+    ax.set_title('Hires by Department and Quarter')
+    # fixing saved image cropped
+    ax.tick_params(axis='x', labelrotation=45) # rotate x-axis labels if needed
+    ax.set_xlabel('Department')
+    ax.set_ylabel('Number of Hires')
+
+def generate_visualizations(df, wait=False):
+    """ 
+    Geneate the plots for the report using seaborn.
+    Rendering runs in the charts renderer pool and images are cached by content,
+    so a placeholder image is returned while a chart is being rendered.
+    Args:
+        df (pd.DataFrame): DataFrame with the data to plot
+        wait (bool): block until the charts are rendered
+    Returns:
+        list: image paths relative to RESULT_FOLDER
+    """
+    # Initialize lists to store generated plot images
+    images = []
 
     print("Generating plot images ...")
     # Option 1: 
-    # Heatmap (Good for overview)
-    ##################
-    # generte image file name
-    image_name1 = f'{uuid_sess}___req_01_hires_dep_job_quarter_heatmap.png'
-    plt.figure(figsize=(15, 8))
-    sns.heatmap(df.set_index(['department', 'job']), annot=True, cmap="YlGnBu", fmt=".0f", cbar_kws={'label': 'Number of Hires'})
-    plt.title('Hires by Department, Job, and Quarter')
-    # fixing saved image cropped
-    plt.xticks(rotation=45, ha='right')  # Rotate x-axis labels if needed
-    plt.tight_layout()  # Adjust subplot parameters for padding
-    plt.savefig(f"{RESULT_FOLDER}/{image_name1}", bbox_inches='tight', dpi=300) 
-    # plt.show() # Display the plot
+    image_name1, _ = request_chart('req_01_hires_dep_job_quarter_heatmap', df, plot_heatmap, figsize=(15, 8), wait=wait)
     images.append(image_name1) # add image to list
 
     # Option 2
-    # Grouped bar chart (comparing quarters and departments)
-    ##################
-    # generte image file name
-    image_name2 = f'{uuid_sess}___req_01_hires_dep_quarter_barchar.png'
-    plt.figure(figsize=(12, 10))
-    sns.barplot(x='department', y='hires', hue='quarter', data=df_melted)
-    plt.title('Hires by Department and Quarter')
-    # fixing saved image cropped
-    plt.xticks(rotation=45, ha='right') # rotate x-axis labels if needed
-    plt.tight_layout()  # Adjust subplot parameters for padding
-    plt.xlabel('Department')
-    plt.ylabel('Number of Hires')
-    plt.savefig(f"{RESULT_FOLDER}/{image_name2}", bbox_inches='tight', dpi=300)
-    # plt.show()
+    image_name2, _ = request_chart('req_01_hires_dep_quarter_barchar', df, plot_barchart, figsize=(12, 10), wait=wait)
     images.append(image_name2) # add image to list
 
-    print("Plot images geenrated !")
-
     return images
 
-def process_requirement1(year=2021):
+def process_requirement1(year=2021, start_date=None, end_date=None, chunk_size=None, wait_for_charts=False):
     """ 
     Process the requirement 1
     Arguements:
-        year (int): year to process
+        year (int | list): year or list of years to process
+        start_date (str): optional first day of a date range, e.g. "2021-01-01"
+        end_date (str): optional last day of a date range, e.g. "2021-06-30"
+        chunk_size (int): read hired_employees in chunks of this size (streaming mode), default REPORT_CHUNK_SIZE. 0 loads the whole table.
+        wait_for_charts (bool): block until plot images are rendered (otherwise placeholders may be returned)
     Returns:
         result_dic (dic): Dictionary with the results
     """
@@ -168,20 +244,36 @@ def process_requirement1(year=2021):
     # create unique id for session
     uuid_sess = "" + str(uuid.uuid4())
 
-    # loading data
-    df, departments_df, jobs_df = load_data()
-
-    # check if data is loaded
-    if df is None or departments_df is None or jobs_df is None:
-        return None
+    chunk_size = REPORT_CHUNK_SIZE if chunk_size is None else chunk_size
+    if is_mirror_ready():
+        # analytics mirror: only the partitions of the requested periods are read (no streaming needed)
+        chunk_size = 0
+    if chunk_size:
+        # streaming mode: aggregate hired_employees chunk by chunk
+        departments_df = dimension_frame('departments', id_column='department_id')
+        jobs_df = dimension_frame('jobs', id_column='job_id')
+        df_chunks = iter_hired_employees(chunk_size)
+        with REPORT_PHASE_SECONDS.labels(REPORT_NAME, "load_aggregate").time():
+            hires_df_dept_jobs = hires_quarter_streaming(df_chunks, departments_df, jobs_df, year, start_date, end_date)
+    else:
+        # loading data
+        with REPORT_PHASE_SECONDS.labels(REPORT_NAME, "load").time():
+            df, departments_df, jobs_df = load_data(with_names=False, periods=parse_periods(year, start_date, end_date))
+
+        # check if data is loaded
+        if df is None or departments_df is None or jobs_df is None:
+            return None
+
+        # test hires_quarter
+        with REPORT_PHASE_SECONDS.labels(REPORT_NAME, "aggregate").time():
+            hires_df_dept_jobs = hires_quarter(df, departments_df, jobs_df, year, start_date, end_date)
 
-    # test hires_quarter
-    hires_df_dept_jobs = hires_quarter(df, departments_df, jobs_df, year)
     if hires_df_dept_jobs is None:
         return None
 
     # generate plot images
-    images = generate_visualizations(hires_df_dept_jobs, uuid_sess)
+    with REPORT_PHASE_SECONDS.labels(REPORT_NAME, "render").time():
+        images = generate_visualizations(hires_df_dept_jobs, wait=wait_for_charts)
 
     # save results to csv
     report_csv_file = f'{uuid_sess}___req_01_hires_dep_job_quarter.csv'
@@ -192,9 +284,11 @@ def process_requirement1(year=2021):
     report_html_file = f'{uuid_sess}___req_01_hires_dep_job_quarter.html'
     with open(f"{RESULT_FOLDER}/{report_html_file}", 'w') as f:
         f.write(result_html)
+    compress_artifact(f"{RESULT_FOLDER}/{report_csv_file}")
+    compress_artifact(f"{RESULT_FOLDER}/{report_html_file}")
 
     result_dic = {
-        "report_name": "req_01_hires_dep_job_quarter",
+        "report_name": REPORT_NAME,
         "session_id": uuid_sess,
         "datetime": datetime.now(),
         "html": report_html_file,
@@ -208,7 +302,9 @@ def process_requirement1(year=2021):
     # Execute the insert statement within a unique session
     with Session() as session:
         session.execute(stmt)
+        add_table_count(session, "reports", 1)
         session.commit()
         session.close()
+    invalidate_table_counts_cache()
 
     return result_dic
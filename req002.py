@@ -3,73 +3,119 @@
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import seaborn as sns
 import uuid
 from sqlalchemy import insert
 from datetime import datetime, timezone
 
-from config import RESULT_FOLDER
+from config import RESULT_FOLDER, REPORT_CHUNK_SIZE
 # load models and engine from models.py
 from models import engine, Session, Report
+from charts import request_chart
+from periods import parse_periods, df_period_filter
+from metrics import REPORT_PHASE_SECONDS
+from artifacts import compress_artifact
+from analytics_mirror import is_mirror_ready, load_mirror_hired_employees
+from table_counts import add_table_count, invalidate_table_counts_cache
+from report_data import load_hired_employees, iter_hired_employees, dimension_frame, get_dimension_lookup
 
-def load_data():
-    # load data from database
-    sql_query = f"SELECT * FROM hired_employees"
-    df = pd.read_sql(sql_query, engine)
-    df.rename(columns={'id': 'employee_id'}, inplace=True)   # rename id to avoid conflicts
+REPORT_NAME = "req_02_hires_dep_top"
+
+def load_data(with_names=True):
+    """
+    Load report data from database (only required columns, compact dtypes).
+    Departments and jobs come from the dimension cache, names are joined lazily on the aggregated rows.
 
-    sql_query = f"SELECT * FROM departments"
-    departments_df = pd.read_sql(sql_query, engine)
-    departments_df.rename(columns={'id': 'department_id'}, inplace=True)  # rename id to enable inner join 
+    Args:
+        with_names (bool): also add 'department' and 'job' name columns to the employees frame (reports aggregate on ids and pass False)
+    Returns:
+        tuple: (hired employees df, departments_df, jobs_df)
+    """
+    df = load_hired_employees()
+    df.rename(columns={'id': 'employee_id'}, inplace=True)   # rename id to avoid conflicts
 
-    sql_query = f"SELECT * FROM jobs"
-    jobs_df = pd.read_sql(sql_query, engine)
-    jobs_df.rename(columns={'id': 'job_id'}, inplace=True)  # rename id to enable inner join 
+    departments_df = dimension_frame('departments', id_column='department_id')
+    jobs_df = dimension_frame('jobs', id_column='job_id')
 
-    # Join departments and jobs to validate foreign keys
-    df = pd.merge(df, departments_df, on='department_id', how='left')
-    df = pd.merge(df, jobs_df, on='job_id', how='left')
+    if with_names:
+        # id lookups instead of merging the full employee frame
+        df['department'] = df['department_id'].map(get_dimension_lookup('departments'))
+        df['job'] = df['job_id'].map(get_dimension_lookup('jobs'))
 
     return df, departments_df, jobs_df
 
-def high_performing_departments(hired_employees_df, departments_df, year=2021):
+def count_hires_per_department(hired_employees_df, periods):
     """
-    Identifies departments that hired more employees than the 2021 average.
+    Partial aggregation: number of hires per year and department.
+    Counts of different chunks of hired_employees can be added up.
 
     Args:
-        hired_employees_df: DataFrame representing the 'hired_employees' table.
-        departments_df: DataFrame representing the 'departments' table.
+        hired_employees_df: DataFrame with 'datetime' and 'department_id' columns.
+        periods (dict): report periods, see periods.parse_periods()
+    Returns:
+        pd.Series: counts indexed by year and department_id
+    """
+    # Filter hires to the requested periods
+    hired_employees_period = hired_employees_df[
+        df_period_filter(hired_employees_df['datetime'], periods)
+    ]
+
+    # Calculate hires per year and department
+    return hired_employees_period.groupby(
+        [hired_employees_period['datetime'].dt.year.rename('year'), 'department_id']
+    ).size()
 
+def select_high_performing(hires_counts, departments_df):
+    """
+    Keep departments that hired more employees than the average of their year and join department names.
+
+    Args:
+        hires_counts (pd.Series): counts from count_hires_per_department()
+        departments_df: DataFrame representing the 'departments' table.
     Returns:
-        DataFrame with 'id', 'department', and 'hired' columns for qualifying departments,
-        sorted by 'hired' in descending order, or None if an error occurs.
+        DataFrame with 'year', 'id', 'department', and 'hired' columns sorted by 'year' and 'hired' in descending order.
     """
-    try:
-        # Filter hires to 2021
-        hired_employees_2021 = hired_employees_df[
-            hired_employees_df['datetime'].dt.year == year
-        ]
+    hires_per_department = hires_counts.astype('int64').reset_index(name='hired')
+
+    # Calculate the mean of hires across all departments for each year
+    mean_hires = hires_per_department.groupby('year')['hired'].transform('mean')
 
-        # Calculate hires per department in 2021
-        hires_per_department = hired_employees_2021.groupby('department_id').size().reset_index(name='hired')
+    # Filter departments that hired above the mean
+    high_performing = hires_per_department[hires_per_department['hired'] > mean_hires]
 
-        # Calculate the mean of hires across all departments in 2021
-        mean_hires_2021 = hires_per_department['hired'].mean()
+    # Join department names on the aggregated rows only (id lookup, no merge)
+    result = high_performing.assign(
+        department=high_performing['department_id'].map(departments_df.set_index('id')['department'])
+    )
 
-        # Filter departments that hired above the mean
-        high_performing = hires_per_department[hires_per_department['hired'] > mean_hires_2021]
+    # Select and rename columns
+    result = result[['year', 'department_id', 'department', 'hired']].rename(columns={'department_id': 'id'})
 
-        # Merge with departments table to get department names
-        result = pd.merge(high_performing, departments_df, left_on='department_id', right_on='id', how='left')
+    # Sort by 'year' and 'hired' in descending order
+    result = result.sort_values(['year', 'hired'], ascending=[True, False])
 
-        # Select and rename columns
-        result = result[['id', 'department', 'hired']].rename(columns={'id': 'id'})
+    return result
 
-        # Sort by 'hired' in descending order
-        result = result.sort_values('hired', ascending=False)
+def high_performing_departments(hired_employees_df, departments_df, year=2021, start_date=None, end_date=None):
+    """
+    Identifies departments that hired more employees than the average of their year.
+    All requested years are computed in a single grouped pass.
 
-        return result
+    Args:
+        hired_employees_df: DataFrame representing the 'hired_employees' table.
+        departments_df: DataFrame representing the 'departments' table.
+        year (int | list): Year or list of years to filter the data. Default is 2021.
+        start_date (str): optional first day of a date range, e.g. "2021-01-01"
+        end_date (str): optional last day of a date range, e.g. "2021-06-30"
+
+    Returns:
+        DataFrame with 'year', 'id', 'department', and 'hired' columns for qualifying departments,
+        sorted by 'year' and 'hired' in descending order, or None if an error occurs.
+    """
+    try:
+        periods = parse_periods(year, start_date, end_date)
+        hires_counts = count_hires_per_department(hired_employees_df, periods)
+        return select_high_performing(hires_counts, departments_df)
 
     except Exception as e:  # Handle potential errors (e.g., missing data, incorrect types)
         error_message = f"\nEerror: {e}"
@@ -77,51 +123,108 @@ def high_performing_departments(hired_employees_df, departments_df, year=2021):
         print(error_message)
         return None
 
-def generate_visualizations(df, uuid_sess):
+def high_performing_departments_streaming(df_chunks, departments_df, year=2021, start_date=None, end_date=None):
+    """
+    Same as high_performing_departments() but reading hired_employees in chunks.
+    Partial counts of each chunk are merged, so memory is bounded by the number of groups, not by the table size.
+
+    Args:
+        df_chunks (iterable): DataFrame chunks with 'datetime' and 'department_id' columns.
+    Returns:
+        DataFrame: same output as high_performing_departments()
+    """
+    try:
+        periods = parse_periods(year, start_date, end_date)
+        hires_counts = None
+        for df in df_chunks:
+            chunk_counts = count_hires_per_department(df, periods)
+            hires_counts = chunk_counts if hires_counts is None else hires_counts.add(chunk_counts, fill_value=0)
+
+        if hires_counts is None:  # empty table
+            index = pd.MultiIndex.from_arrays([[], []], names=['year', 'department_id'])
+            hires_counts = pd.Series([], index=index, dtype='int64')
+        return select_high_performing(hires_counts, departments_df)
+
+    except Exception as e:
+        error_message = f"\nEerror: {e}"
+        print(error_message)
+        return None
+
+def plot_top_departments(df, ax):
+    """ Bar chart with the number of hires per department """
+    # sns.barplot(x='hired', y='department', data=df, palette="viridis")
+    # fix
+    if df['year'].nunique() > 1:
+        # compare departments across years
+        sns.barplot(x='hired', y='department', data=df, hue='year', palette="viridis", ax=ax)
+    else:
+        sns.barplot(x='hired', y='department', data=df, hue='department', dodge=False, palette="viridis", legend=False, ax=ax)
+    ax.set_title('Top Hires per Department')
+    ax.set_xlabel('Number of Hires')
+    ax.set_ylabel('Department')
+
+def generate_visualizations(df, wait=False):
     """
     Plots the number of hires per department using seaborn.
+    Rendering runs in the charts renderer pool, a placeholder image is returned while rendering.
 
     Args:
         data: Pandas DataFrame with 'department' and 'hired' columns.
+        wait (bool): block until the chart is rendered
     """
     try:
         print("Generating plot images ...")
         images = []
-        plt.figure(figsize=(10, 6))
-        # sns.barplot(x='hired', y='department', data=df, palette="viridis")
-        # fix
-        sns.barplot(x='hired', y='department', data=df, hue='department', dodge=False, palette="viridis", legend=False)
-        plt.title('Top Hires per Department')
-        plt.xlabel('Number of Hires')
-        plt.ylabel('Department')
-        file_name = f'{uuid_sess}___req_02_hires_dep_top.png'
-        plt.savefig(f"{RESULT_FOLDER}/{file_name}", bbox_inches='tight', dpi=150)
-        # plt.show()
+        file_name, _ = request_chart('req_02_hires_dep_top', df, plot_top_departments, figsize=(10, 6), wait=wait)
         images.append(file_name)
-        print("Plot images geenrated !")
 
         return images
 
     except Exception as e:
         print(f"An error occurred in generate_visualizations(): {e}")        
 
-def process_requirement2(year=2021):
+def process_requirement2(year=2021, start_date=None, end_date=None, chunk_size=None, wait_for_charts=False):
+    """
+    Process the requirement 2
+    Arguements:
+        year (int | list): year or list of years to process
+        start_date (str): optional first day of a date range, e.g. "2021-01-01"
+        end_date (str): optional last day of a date range, e.g. "2021-06-30"
+        chunk_size (int): read hired_employees in chunks of this size (streaming mode), default REPORT_CHUNK_SIZE. 0 loads the whole table.
+        wait_for_charts (bool): block until plot images are rendered (otherwise placeholders may be returned)
+    Returns:
+        result_dic (dic): Dictionary with the results
+    """
     # create unique id for session
     uuid_sess = "" + str(uuid.uuid4())
 
-    # load data from database
-    sql_query = f"SELECT * FROM hired_employees"
-    hired_employees_df = pd.read_sql(sql_query, engine)
-
-    sql_query = f"SELECT * FROM departments"
-    departments_df = pd.read_sql(sql_query, engine)
-
-    result_df = high_performing_departments(hired_employees_df, departments_df, year)
+    departments_df = dimension_frame('departments')
+    report_columns = ['id', 'datetime', 'department_id']
+
+    chunk_size = REPORT_CHUNK_SIZE if chunk_size is None else chunk_size
+    if is_mirror_ready():
+        # analytics mirror: only the partitions of the requested periods are read (no streaming needed)
+        with REPORT_PHASE_SECONDS.labels(REPORT_NAME, "load").time():
+            hired_employees_df = load_mirror_hired_employees(parse_periods(year, start_date, end_date), columns=report_columns)
+        with REPORT_PHASE_SECONDS.labels(REPORT_NAME, "aggregate").time():
+            result_df = high_performing_departments(hired_employees_df, departments_df, year, start_date, end_date)
+    elif chunk_size:
+        # streaming mode: aggregate hired_employees chunk by chunk
+        df_chunks = iter_hired_employees(chunk_size, columns=report_columns)
+        with REPORT_PHASE_SECONDS.labels(REPORT_NAME, "load_aggregate").time():
+            result_df = high_performing_departments_streaming(df_chunks, departments_df, year, start_date, end_date)
+    else:
+        # load data from database (only required columns, compact dtypes)
+        with REPORT_PHASE_SECONDS.labels(REPORT_NAME, "load").time():
+            hired_employees_df = load_hired_employees(columns=report_columns)
+        with REPORT_PHASE_SECONDS.labels(REPORT_NAME, "aggregate").time():
+            result_df = high_performing_departments(hired_employees_df, departments_df, year, start_date, end_date)
 
     if result_df is not None:
 
         # generate plot images
-        images = generate_visualizations(result_df, uuid_sess)
+        with REPORT_PHASE_SECONDS.labels(REPORT_NAME, "render").time():
+            images = generate_visualizations(result_df, wait=wait_for_charts)
 
         # save results to csv
         report_csv_file = f'{uuid_sess}__req_02_hires_dep_top.csv'
@@ -132,9 +235,11 @@ def process_requirement2(year=2021):
         report_html_file = f'{uuid_sess}__req_02_hires_dep_top.html'
         with open(f"{RESULT_FOLDER}/{report_html_file}", 'w') as f:
             f.write(result_html)
+        compress_artifact(f"{RESULT_FOLDER}/{report_csv_file}")
+        compress_artifact(f"{RESULT_FOLDER}/{report_html_file}")
 
         result_dic = {
-            "report_name": "req_02_hires_dep_top",
+            "report_name": REPORT_NAME,
             "session_id": uuid_sess,
             "datetime": datetime.now(),
             "html": report_html_file,
@@ -148,8 +253,10 @@ def process_requirement2(year=2021):
         # TODO: evaluate better session management
         with Session() as session:
             session.execute(stmt)
+            add_table_count(session, "reports", 1)
             session.commit()
             session.close()
+        invalidate_table_counts_cache()
 
         return result_dic
     else:
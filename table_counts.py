@@ -0,0 +1,148 @@
+# table_counts.py
+"""
+Row counts of the app tables for the dashboard and backups pages.
+Counts are kept in a small stats table (table_counts) updated by the writers in their own transactions
+(import, truncate, restore, backup and report), so pages read them without COUNT(id) scans of large tables.
+"""
+import time
+import threading
+from datetime import datetime
+from sqlalchemy import text, exc
+
+from config import TABLE_COUNTS_CACHE_TTL
+from models import engine
+from read_replica import get_read_engine
+
+# counted tables and their labels, in display order
+COUNTED_TABLES = {
+    'hired_employees': 'Total Hired Employees',
+    'departments': 'Total Departments',
+    'jobs': 'Total Jobs',
+    'backups_files': 'Total Backups',
+    'reports': 'Total Reports',
+    'transactions': 'Total Import Transactions',
+}
+
+# in-process cache in front of the stats table, shared by request threads
+# "fresh": the counts were written since they were cached, reload them from the primary
+table_counts_cache = {"counts": None, "loaded_at": 0.0, "fresh": False}
+table_counts_cache_lock = threading.Lock()
+
+
+def insert_table_count(connection, table_name, row_count=None):
+    """ Add the stats row of a table, counting its rows if row_count is None (sees uncommitted rows of the same transaction) """
+    if row_count is None:
+        row_count = connection.execute(text(f"SELECT COUNT(id) FROM {table_name}")).scalar()
+    connection.execute(
+        text("INSERT INTO table_counts (table_name, row_count, updated_at) VALUES (:table_name, :row_count, :updated_at)"),
+        {"table_name": table_name, "row_count": row_count, "updated_at": datetime.now()},
+    )
+
+
+def insert_missing_table_count(connection, table_name, row_count=None):
+    """
+    Insert the stats row of a table that was not seeded (database not initialized with init-db).
+    Runs in a savepoint: if a concurrent writer inserted the row first, returns False and the caller updates it.
+    """
+    try:
+        with connection.begin_nested():
+            insert_table_count(connection, table_name, row_count)
+        return True
+    except exc.IntegrityError:
+        return False
+
+
+def seed_table_counts():
+    """
+    Add the missing stats rows (counted once with COUNT(id)), called by init-db so writers only UPDATE their row.
+    Returns:
+        list: tables seeded
+    """
+    seeded = []
+    with engine.begin() as connection:
+        stored = {row[0] for row in connection.execute(text("SELECT table_name FROM table_counts"))}
+        for table_name in COUNTED_TABLES:
+            if table_name not in stored:
+                insert_table_count(connection, table_name)
+                seeded.append(table_name)
+    invalidate_table_counts_cache()
+    return seeded
+
+
+def add_table_count(connection, table_name, delta):
+    """
+    Add delta rows to the count of a table.
+    Run it on the writer's connection or session before its commit, so the count is committed (or rolled back) with the rows.
+
+    Args:
+        connection: SQLAlchemy connection or session of the writer transaction
+        table_name (str): counted table
+        delta (int): number of rows inserted (negative for deleted rows)
+    """
+    update_query = text("UPDATE table_counts SET row_count = row_count + :delta, updated_at = :updated_at WHERE table_name = :table_name")
+    params = {"table_name": table_name, "delta": delta, "updated_at": datetime.now()}
+    result = connection.execute(update_query, params)
+    # stats rows are seeded by init-db, the insert is only a fallback (the count includes this transaction rows)
+    if result.rowcount == 0 and not insert_missing_table_count(connection, table_name):
+        connection.execute(update_query, params)
+
+
+def set_table_count(connection, table_name, row_count):
+    """ Replace the count of a table, e.g. 0 after a truncate or the restored rows after a restore """
+    update_query = text("UPDATE table_counts SET row_count = :row_count, updated_at = :updated_at WHERE table_name = :table_name")
+    params = {"table_name": table_name, "row_count": row_count, "updated_at": datetime.now()}
+    result = connection.execute(update_query, params)
+    if result.rowcount == 0 and not insert_missing_table_count(connection, table_name, row_count):
+        connection.execute(update_query, params)
+
+
+def rebuild_table_counts():
+    """
+    Recount every table with COUNT(id) and store the results (e.g. after manual changes to the database).
+    Returns:
+        dict: {table_name: row count}
+    """
+    counts = {}
+    with engine.begin() as connection:
+        for table_name in COUNTED_TABLES:
+            counts[table_name] = connection.execute(text(f"SELECT COUNT(id) FROM {table_name}")).scalar()
+            set_table_count(connection, table_name, counts[table_name])
+    invalidate_table_counts_cache()
+    return counts
+
+
+def get_table_counts():
+    """
+    Row counts from the stats table (read engine), cached for TABLE_COUNTS_CACHE_TTL seconds.
+    Tables without a stats row yet are counted once and stored.
+    Returns:
+        dict: {label: row count} in COUNTED_TABLES order
+    """
+    with table_counts_cache_lock:
+        if table_counts_cache["counts"] is not None and time.monotonic() - table_counts_cache["loaded_at"] < TABLE_COUNTS_CACHE_TTL:
+            return dict(table_counts_cache["counts"])
+        fresh = table_counts_cache["fresh"]
+        table_counts_cache["fresh"] = False
+
+    with get_read_engine(fresh=fresh).connect() as connection:
+        stored = dict(connection.execute(text("SELECT table_name, row_count FROM table_counts")).fetchall())
+    missing_tables = [table_name for table_name in COUNTED_TABLES if table_name not in stored]
+    if missing_tables:
+        # the stats rows are written on the primary
+        with engine.begin() as connection:
+            for table_name in missing_tables:
+                stored[table_name] = connection.execute(text(f"SELECT COUNT(id) FROM {table_name}")).scalar()
+                set_table_count(connection, table_name, stored[table_name])
+    counts = {label: int(stored[table_name]) for table_name, label in COUNTED_TABLES.items()}
+
+    with table_counts_cache_lock:
+        table_counts_cache["counts"] = counts
+        table_counts_cache["loaded_at"] = time.monotonic()
+    return dict(counts)
+
+
+def invalidate_table_counts_cache():
+    """ Drop the cached counts, called by the writers after their commit (next read goes to the primary) """
+    with table_counts_cache_lock:
+        table_counts_cache["counts"] = None
+        table_counts_cache["fresh"] = True
@@ -0,0 +1,152 @@
+# table_locks.py
+"""
+Per-table locks for writers (imports, restores, truncates): writers of different tables run in parallel,
+writers of the same table queue with a bounded wait.
+
+MySQL: GET_LOCK advisory locks, shared by all processes using the database. Each lock (and each waiter) uses its own
+connection of a separate unpooled lock engine, so waiters blocked in GET_LOCK never take connections of the app pool.
+SQLite (and other databases): exclusive flock on RESULTS/LOCKS/<table>.lock, shared by processes on the same host.
+
+Admission control: at most TABLE_LOCK_MAX_WAITERS requests of this process wait for a table, further requests
+fail right away with TableBusyError (HTTP 429 with Retry-After).
+"""
+import os
+import re
+import time
+import fcntl
+import threading
+from contextlib import contextmanager
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from config import LOCKS_FOLDER, TABLE_LOCK_TIMEOUT, TABLE_LOCK_MAX_WAITERS, TABLE_LOCK_RETRY_AFTER
+from models import engine
+from metrics import TABLE_LOCK_WAIT_SECONDS, TABLE_LOCK_REJECTED
+
+# seconds between flock attempts while waiting
+FILE_LOCK_POLL_INTERVAL = 0.1
+
+# MySQL lock connections: opened per lock and closed on release (at most TABLE_LOCK_MAX_WAITERS waiters per table and process)
+lock_engine = create_engine(engine.url, poolclass=NullPool) if engine.dialect.name == "mysql" else None
+
+# requests of this process waiting for each table
+waiters = {}
+waiters_lock = threading.Lock()
+
+
+class TableBusyError(Exception):
+    """ Table lock not available: too many waiting requests or wait timeout """
+
+    def __init__(self, table_name, reason, retry_after=TABLE_LOCK_RETRY_AFTER):
+        super().__init__(f"Table '{table_name}' is busy ({reason}), retry in {retry_after} seconds")
+        self.table_name = table_name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def get_lock_name(table_name):
+    """ Advisory lock name, GET_LOCK names are server wide so they include the database name (max 64 chars) """
+    return f"{engine.url.database}.{table_name}"[-64:]
+
+
+def acquire_mysql_lock(table_name, timeout):
+    """ GET_LOCK on a dedicated lock engine connection, the lock lives as long as the connection holds it """
+    connection = lock_engine.connect()
+    try:
+        acquired = connection.execute(text("SELECT GET_LOCK(:name, :timeout)"), {"name": get_lock_name(table_name), "timeout": timeout}).scalar()
+    except Exception:
+        connection.close()
+        raise
+    if acquired != 1:
+        connection.close()
+        return None
+    return connection
+
+
+def release_mysql_lock(table_name, connection):
+    try:
+        connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": get_lock_name(table_name)})
+    finally:
+        connection.close()
+
+
+def acquire_file_lock(table_name, timeout):
+    """ Exclusive flock, polled until the timeout (each acquisition opens its own file, so threads exclude each other too) """
+    lock_file = open(os.path.join(LOCKS_FOLDER, f"{table_name}.lock"), "a")
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return lock_file
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                lock_file.close()
+                return None
+            time.sleep(FILE_LOCK_POLL_INTERVAL)
+
+
+def release_file_lock(lock_file):
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        lock_file.close()
+
+
+def acquire_table_lock(table_name, operation="write", timeout=None):
+    """
+    Wait for the lock of a table.
+
+    Args:
+        table_name (str): locked table
+        operation (str): import, restore or truncate (metrics label)
+        timeout (int): max seconds to wait, defaults to TABLE_LOCK_TIMEOUT
+    Returns:
+        dict: lock handle for release_table_lock
+    Raises:
+        TableBusyError: the wait queue of the table is full or the wait timed out
+        ValueError: invalid table name
+    """
+    if not re.fullmatch(r"\w+", table_name or ""):
+        raise ValueError(f"Invalid table name: {table_name}")
+    timeout = TABLE_LOCK_TIMEOUT if timeout is None else timeout
+    with waiters_lock:
+        if waiters.get(table_name, 0) >= TABLE_LOCK_MAX_WAITERS:
+            TABLE_LOCK_REJECTED.labels(table_name, "queue_full").inc()
+            raise TableBusyError(table_name, "queue full")
+        waiters[table_name] = waiters.get(table_name, 0) + 1
+
+    start = time.perf_counter()
+    try:
+        if engine.dialect.name == "mysql":
+            holder = acquire_mysql_lock(table_name, timeout)
+        else:
+            holder = acquire_file_lock(table_name, timeout)
+    finally:
+        with waiters_lock:
+            waiters[table_name] -= 1
+    TABLE_LOCK_WAIT_SECONDS.labels(table_name, operation).observe(time.perf_counter() - start)
+
+    if holder is None:
+        TABLE_LOCK_REJECTED.labels(table_name, "timeout").inc()
+        raise TableBusyError(table_name, f"lock wait timeout after {timeout} seconds")
+    return {"table_name": table_name, "holder": holder}
+
+
+def release_table_lock(lock):
+    """ Release a lock returned by acquire_table_lock (None is ignored) """
+    if lock is None:
+        return
+    if engine.dialect.name == "mysql":
+        release_mysql_lock(lock["table_name"], lock["holder"])
+    else:
+        release_file_lock(lock["holder"])
+
+
+@contextmanager
+def table_lock(table_name, operation="write", timeout=None):
+    """ with table_lock("jobs", "import"): ... """
+    lock = acquire_table_lock(table_name, operation, timeout)
+    try:
+        yield
+    finally:
+        release_table_lock(lock)
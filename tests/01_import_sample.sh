@@ -1,4 +1,5 @@
 # IMPORT DATA
+# (without the web app: python3 manage.py import data/departments.csv data/jobs.csv data/hired_employees.csv)
 curl -X POST -F "file=@data/departments.csv" \
 -F "table_name=departments" \
 -F "chunk_size=1000" http://127.0.0.1:8080/import
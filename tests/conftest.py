@@ -0,0 +1,47 @@
+# conftest.py
+"""
+Test settings: a SQLite database and the RESULTS folders in a temporary directory, report scheduler disabled.
+Environment variables are set before the app modules are imported (config.py reads them at import time).
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = tempfile.mkdtemp(prefix="globant_tests_")
+
+os.environ["DATABASE_URI"] = f"sqlite:///{TEST_DIR}/test.db"
+os.environ["REPORT_SCHEDULER_ENABLED"] = "false"
+os.environ["TABLE_LOCK_TIMEOUT"] = "1"
+os.environ["TABLE_LOCK_RETRY_AFTER"] = "3"
+os.environ.pop("READ_DATABASE_URI", None)
+# RESULTS/ folders are relative to the working directory
+os.chdir(TEST_DIR)
+sys.path.insert(0, REPO_DIR)
+
+
+@pytest.fixture
+def db():
+    """ Empty tables (created with init-db) and empty caches for each test """
+    from config import create_result_folders
+    from models import Base, engine, initialize_db
+    from report_data import invalidate_dimension_cache
+    from table_counts import invalidate_table_counts_cache
+
+    create_result_folders()
+    Base.metadata.drop_all(engine)
+    is_initialized, error = initialize_db()
+    assert is_initialized, error
+    invalidate_dimension_cache()
+    invalidate_table_counts_cache()
+    yield engine
+
+
+@pytest.fixture
+def client(db):
+    from app import app
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
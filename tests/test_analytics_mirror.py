@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+import analytics_mirror
+from config import BACKUPS_FOLDER
+from models import HiredEmployee
+from backups import create_backup
+from table_counts import add_table_count
+
+pytest.importorskip("pyarrow")
+
+
+def add_employees(engine, ids):
+    with engine.begin() as connection:
+        connection.execute(insert(HiredEmployee), [
+            {"id": i, "name": f"name {i}", "datetime": datetime(2021, 1 + i % 12, 1), "datetime_str": "",
+             "department_id": 1, "job_id": 1}
+            for i in ids
+        ])
+        add_table_count(connection, "hired_employees", len(ids))
+
+
+def test_rebuild_marks_mirror_ready_only_if_backup_is_current(db, monkeypatch):
+    monkeypatch.setattr(analytics_mirror, "ANALYTICS_MIRROR_ENABLED", True)
+    add_employees(db, range(1, 6))
+    is_created, backup = create_backup("hired_employees")
+    assert is_created, backup
+    backup_file = f"{BACKUPS_FOLDER}/{backup['file_name']}"
+
+    result = analytics_mirror.rebuild_mirror_from_backup(backup_file)
+    assert result["ready"] and result["rows"] == 5
+    assert analytics_mirror.is_mirror_ready()
+
+    # rows committed after the backup
+    add_employees(db, [6])
+    result = analytics_mirror.rebuild_mirror_from_backup(backup_file)
+    assert not result["ready"]
+    assert result["live_rows"] == 6
+    assert not analytics_mirror.is_mirror_ready()
@@ -0,0 +1,140 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from sqlalchemy import inspect, insert, select, func, text
+from sqlalchemy.exc import OperationalError
+
+import backups
+from models import Department, Job, HiredEmployee, Transaction, DepartmentQuarantine
+from file_importer import import_archive
+from table_counts import add_table_count, get_table_counts
+
+DEPARTMENTS = "1,Sales\n2,Legal\n3,\n"
+JOBS = "1,Engineer\n2,Manager\n"
+HIRED_EMPLOYEES = "1,Ann,2021-07-27T16:02:08Z,1,2\n2,Bob,2021-02-01T10:00:00Z,2,1\n"
+
+
+def write_zip(path, files):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return str(path)
+
+
+def write_tar(path, files):
+    with tarfile.open(path, "w:gz") as archive:
+        for name, content in files.items():
+            data = content.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return str(path)
+
+
+def table_ids(engine, model):
+    with engine.connect() as connection:
+        return connection.execute(select(model.id).order_by(model.id)).scalars().all()
+
+
+def add_live_rows(engine):
+    with engine.begin() as connection:
+        connection.execute(insert(Department), [{"id": 9, "department": "Old"}])
+        connection.execute(insert(Job), [{"id": 9, "job": "Old"}])
+        add_table_count(connection, "departments", 1)
+        add_table_count(connection, "jobs", 1)
+
+
+def test_archive_replaces_all_tables(db, tmp_path):
+    add_live_rows(db)
+    archive_path = write_zip(tmp_path / "refresh.zip", {
+        "data/departments.csv": DEPARTMENTS, "data/jobs.csv": JOBS, "data/hired_employees.csv": HIRED_EMPLOYEES,
+    })
+
+    result = import_archive(archive_path, chunk_size=10)
+
+    assert result["status"] == "success", result
+    assert result["total_valid_records"] == 6
+    assert result["total_invalid_records"] == 1
+    assert table_ids(db, Department) == [1, 2]
+    assert table_ids(db, Job) == [1, 2]
+    assert table_ids(db, HiredEmployee) == [1, 2]
+    counts = get_table_counts()
+    assert (counts["Total Departments"], counts["Total Jobs"], counts["Total Hired Employees"]) == (2, 2, 2)
+    assert {index["name"] for index in inspect(db).get_indexes("hired_employees")} == {"ix_hired_employees_datetime"}
+    assert not [name for name in inspect(db).get_table_names() if name.endswith(("__restore", "__old"))]
+    with db.connect() as connection:
+        children = connection.execute(
+            select(Transaction.table_name, Transaction.status).where(Transaction.parent_import_id == result["import_id"])
+        ).fetchall()
+        assert sorted(children) == [("departments", "success"), ("hired_employees", "success"), ("jobs", "success")]
+        # the invalid department row is quarantined
+        assert connection.execute(select(func.count()).select_from(DepartmentQuarantine)).scalar() == 1
+
+
+def test_failed_dimension_rejects_whole_archive(db, tmp_path):
+    add_live_rows(db)
+    # duplicated job ids reject the jobs batch
+    archive_path = write_tar(tmp_path / "refresh.tar.gz", {
+        "departments.csv": DEPARTMENTS, "jobs.csv": "1,Engineer\n1,Manager\n", "hired_employees.csv": HIRED_EMPLOYEES,
+    })
+
+    result = import_archive(archive_path, chunk_size=10)
+
+    assert result["status"] == "rejected"
+    assert result["total_valid_records"] == 0
+    statuses = {file["table_name"]: file["status"] for file in result["files"]}
+    assert statuses["hired_employees"] == "skipped"
+    # live tables are untouched
+    assert table_ids(db, Department) == [9]
+    assert table_ids(db, Job) == [9]
+    assert table_ids(db, HiredEmployee) == []
+    assert get_table_counts()["Total Departments"] == 1
+    assert not [name for name in inspect(db).get_table_names() if name.endswith("__restore")]
+    with db.connect() as connection:
+        assert set(connection.execute(
+            select(Transaction.status).where(Transaction.parent_import_id == result["import_id"])
+        ).scalars()) == {"rejected"}
+        assert connection.execute(text("SELECT COUNT(*) FROM departments_quarantine")).scalar() == 0
+
+
+def test_failed_swap_keeps_all_live_tables(db, tmp_path, monkeypatch):
+    add_live_rows(db)
+    with db.begin() as connection:
+        connection.execute(insert(HiredEmployee), [{"id": 9, "name": "Old", "department_id": 9, "job_id": 9}])
+    swap_tables = backups.swap_tables
+
+    def failing_swap_tables(connection, table_name, shadow_table_name):
+        if table_name != "jobs":
+            return swap_tables(connection, table_name, shadow_table_name)
+        # jobs is swapped last: its first rename is applied, then the swap fails
+        connection.execute(text("ALTER TABLE jobs RENAME TO jobs__old"))
+        raise OperationalError("ALTER TABLE jobs__restore RENAME TO jobs", None, Exception("swap failed"))
+
+    monkeypatch.setattr(backups, "swap_tables", failing_swap_tables)
+    archive_path = write_zip(tmp_path / "refresh.zip", {
+        "departments.csv": DEPARTMENTS, "jobs.csv": JOBS, "hired_employees.csv": HIRED_EMPLOYEES,
+    })
+
+    with pytest.raises(OperationalError):
+        import_archive(archive_path, chunk_size=10)
+
+    assert table_ids(db, Department) == [9]
+    assert table_ids(db, Job) == [9]
+    assert table_ids(db, HiredEmployee) == [9]
+    assert get_table_counts()["Total Departments"] == 1
+    assert not [name for name in inspect(db).get_table_names() if name.endswith(("__restore", "__old"))]
+
+
+def test_import_endpoint_accepts_archives(client, tmp_path):
+    archive_path = write_zip(tmp_path / "refresh.zip", {"departments.csv": DEPARTMENTS, "jobs.csv": JOBS})
+    with open(archive_path, "rb") as f:
+        response = client.post("/import", data={"file": (f, "refresh.zip"), "chunk_size": "100"})
+
+    assert response.status_code == 201, response.get_data(as_text=True)
+    assert response.get_json()["table_name"] == "archive"
+
+    response = client.post("/import", data={"file": (io.BytesIO(b"not an archive"), "refresh.zip"), "chunk_size": "100"})
+    assert response.status_code == 400
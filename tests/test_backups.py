@@ -0,0 +1,208 @@
+import json
+import os
+from datetime import datetime
+
+import fastavro
+import pytest
+from sqlalchemy import insert, inspect, select, func
+from sqlalchemy.exc import OperationalError
+
+from config import BACKUPS_FOLDER
+from models import Department, HiredEmployee
+import backups
+from backups import (
+    create_backup, restore_backup, verify_backup, check_schema_compatibility, get_avro_schema, get_manifest_path,
+    ddl_transaction, swap_tables,
+)
+from table_counts import get_table_counts
+
+
+def count_rows(engine, model):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(model)).scalar()
+
+
+def test_restore_swaps_shadow_table(db):
+    with db.begin() as connection:
+        connection.execute(insert(Department), [{"id": i, "department": f"dep {i}"} for i in range(1, 11)])
+    is_created, result = create_backup("departments")
+    assert is_created, result
+
+    # rows written after the backup are gone once it is restored
+    with db.begin() as connection:
+        connection.execute(insert(Department), [{"id": 11, "department": "dep 11"}])
+    is_restored, result = restore_backup("departments", result["file_name"])
+
+    assert is_restored, result
+    assert result["total_records"] == 10
+    assert count_rows(db, Department) == 10
+    assert get_table_counts()["Total Departments"] == 10
+    assert not inspect(db).has_table("departments__restore")
+    assert not inspect(db).has_table("departments__old")
+
+
+def test_restore_builds_model_indexes(db):
+    with db.begin() as connection:
+        connection.execute(insert(HiredEmployee), [
+            {"id": 1, "name": "Ann", "datetime": datetime(2021, 7, 1), "datetime_str": "2021-07-01T00:00:00Z", "department_id": 1, "job_id": 1},
+        ])
+    is_created, result = create_backup("hired_employees")
+    assert is_created, result
+    is_restored, result = restore_backup("hired_employees", result["file_name"])
+
+    assert is_restored, result
+    index_names = {index["name"] for index in inspect(db).get_indexes("hired_employees")}
+    assert index_names == {index.name for index in HiredEmployee.__table__.indexes}
+
+
+def test_failed_restore_keeps_live_table(db):
+    with db.begin() as connection:
+        connection.execute(insert(Department), [{"id": 1, "department": "kept"}])
+    # duplicated ids fail the load into the shadow table
+    backup_file = "departments___duplicated.avro"
+    with open(f"{BACKUPS_FOLDER}/{backup_file}", "wb") as f:
+        fastavro.writer(f, fastavro.parse_schema(get_avro_schema("departments")), [
+            {"id": 5, "department": "a"},
+            {"id": 5, "department": "b"},
+        ])
+
+    is_restored, result = restore_backup("departments", backup_file)
+
+    assert not is_restored
+    assert count_rows(db, Department) == 1
+    assert not inspect(db).has_table("departments__restore")
+
+
+def test_failed_swap_rolls_back_renames(db):
+    with db.begin() as connection:
+        connection.execute(insert(Department), [{"id": 1, "department": "kept"}])
+
+    # the first rename (departments -> departments__old) succeeds, the second one fails (no shadow table)
+    with pytest.raises(OperationalError):
+        with ddl_transaction() as connection:
+            swap_tables(connection, "departments", "departments__missing")
+
+    assert inspect(db).has_table("departments")
+    assert not inspect(db).has_table("departments__old")
+    assert count_rows(db, Department) == 1
+
+
+def test_restore_rejects_unknown_table(client):
+    response = client.post("/backups-restore", data={"restore_file_name": "users;drop___1.avro"})
+
+    assert response.status_code == 400
+    assert b"Unknown table" in response.data
+
+
+def create_departments_backup(engine):
+    with engine.begin() as connection:
+        connection.execute(insert(Department), [{"id": i, "department": f"dep {i}"} for i in range(1, 11)])
+    is_created, result = create_backup("departments")
+    assert is_created, result
+    return result["file_name"]
+
+
+def test_verify_intact_backup(db):
+    backup_file = create_departments_backup(db)
+
+    is_valid, result = verify_backup(backup_file)
+
+    assert is_valid, result
+    assert (result["status"], result["row_count"], result["min_id"], result["max_id"]) == ("success", 10, 1, 10)
+
+
+def test_verify_detects_tampered_block(db):
+    backup_file = create_departments_backup(db)
+    with open(f"{BACKUPS_FOLDER}/{backup_file}", "r+b") as f:
+        data = bytearray(f.read())
+        # last byte of the last block (before its 16 bytes sync marker): "dep 10" -> "dep 1X"
+        data[-17] = ord("X")
+        f.seek(0)
+        f.write(data)
+
+    is_valid, result = verify_backup(backup_file)
+
+    assert not is_valid
+    assert result["status"] == "corrupted"
+    assert "Checksum mismatch in block 0" in result["errors"]
+
+
+def test_verify_detects_truncated_backup(db):
+    backup_file = create_departments_backup(db)
+    with open(f"{BACKUPS_FOLDER}/{backup_file}", "r+b") as f:
+        f.truncate(f.seek(0, 2) - 20)
+
+    is_valid, result = verify_backup(backup_file)
+
+    assert not is_valid
+    # the last block is incomplete, it cannot be read
+    assert result["status"] == "error"
+
+
+def test_verify_requires_manifest(db):
+    backup_file = create_departments_backup(db)
+    os.remove(get_manifest_path(backup_file))
+
+    is_valid, result = verify_backup(backup_file)
+
+    assert not is_valid
+    assert result["status"] == "error"
+    assert "Manifest not found" in result["error"]
+
+
+def test_verify_detects_manifest_mismatch(db):
+    backup_file = create_departments_backup(db)
+    with open(get_manifest_path(backup_file)) as f:
+        manifest = json.load(f)
+    manifest["row_count"] = 11
+    manifest["schema_fingerprint"] = "0" * 64
+    with open(get_manifest_path(backup_file), "w") as f:
+        json.dump(manifest, f)
+
+    is_valid, result = verify_backup(backup_file)
+
+    assert not is_valid
+    assert result["status"] == "corrupted"
+    assert "Row count mismatch: expected 11, found 10" in result["errors"]
+    assert "Schema fingerprint mismatch" in result["errors"]
+
+
+def test_schema_compatibility(db):
+    schema = get_avro_schema("departments")
+    assert check_schema_compatibility("departments", schema) == (True, "")
+    # a backup of fewer columns can be restored
+    assert check_schema_compatibility("departments", {**schema, "fields": schema["fields"][:1]}) == (True, "")
+
+    extra_column = {**schema, "fields": schema["fields"] + [{"name": "budget", "type": ["null", "long"]}]}
+    is_compatible, error = check_schema_compatibility("departments", extra_column)
+    assert not is_compatible
+    assert error == "Column 'budget' not found in table 'departments'"
+
+    other_type = {**schema, "fields": [{"name": "id", "type": "string"}] + schema["fields"][1:]}
+    is_compatible, error = check_schema_compatibility("departments", other_type)
+    assert not is_compatible
+    assert error == "Column 'id' type does not match table 'departments'"
+
+    assert not check_schema_compatibility("users", schema)[0]
+
+
+def test_restore_refuses_incompatible_schema(db, monkeypatch):
+    with db.begin() as connection:
+        connection.execute(insert(Department), [{"id": 1, "department": "kept"}])
+    schema = get_avro_schema("departments")
+    schema["fields"].append({"name": "budget", "type": ["null", "long"]})
+    backup_file = "departments___incompatible.avro"
+    with open(f"{BACKUPS_FOLDER}/{backup_file}", "wb") as f:
+        fastavro.writer(f, fastavro.parse_schema(schema), [{"id": 5, "department": "new", "budget": 1}])
+
+    def not_called(*args, **kwargs):
+        raise AssertionError("the live table must not be touched")
+
+    monkeypatch.setattr(backups, "create_shadow_table", not_called)
+    monkeypatch.setattr(backups, "swap_tables", not_called)
+    is_restored, result = restore_backup("departments", backup_file)
+
+    assert not is_restored
+    assert result["error"] == "Incompatible backup schema: Column 'budget' not found in table 'departments'"
+    assert count_rows(db, Department) == 1
+    assert not inspect(db).has_table("departments__restore")
@@ -0,0 +1,27 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from db_pool import get_engine_options, register_pool_events, get_pool_stats
+
+POOL_CONFIG = {"pool_size": 1, "max_overflow": 0, "pool_timeout": 0.1, "pool_recycle": 1800, "pool_pre_ping": False}
+
+
+def test_sqlite_memory_keeps_one_database():
+    engine = create_engine("sqlite://", **get_engine_options(POOL_CONFIG, "sqlite://"))
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE t (id INTEGER)"))
+    with engine.connect() as first, engine.connect() as second:
+        assert second.execute(text("SELECT COUNT(*) FROM t")).scalar() == 0
+
+
+def test_checkout_timeout_is_counted(tmp_path):
+    uri = f"sqlite:///{tmp_path}/pool.db"
+    engine = create_engine(uri, **get_engine_options(POOL_CONFIG, uri))
+    register_pool_events(engine, "test_timeout")
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+    stats = get_pool_stats(engine, "test_timeout")
+    assert stats["checkout_timeouts"] == 1
+    assert stats["connects"] == 1
+    assert stats["wait_time_max"] >= 0.1
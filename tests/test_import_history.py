@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from models import Transaction
+from csv_to_db import get_import_transactions
+
+
+def add_transactions(engine, rows):
+    with engine.begin() as connection:
+        connection.execute(insert(Transaction), rows)
+
+
+def test_keyset_pages_cover_all_transactions(db):
+    start = datetime(2021, 7, 1, 10, 0, 0)
+    # several imports in the same second, ordered by id within the same datetime
+    add_transactions(db, [
+        {"table_name": "jobs" if i % 2 else "departments", "datetime": start + timedelta(seconds=i // 3), "status": "success"}
+        for i in range(7)
+    ])
+
+    ids, cursor, pages = [], None, 0
+    while True:
+        page = get_import_transactions(limit=3, cursor=cursor)
+        ids.extend(transaction["id"] for transaction in page["transactions"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert ids == list(range(7, 0, -1))
+
+
+def test_exact_page_size_has_no_next_cursor(db):
+    add_transactions(db, [{"table_name": "jobs", "datetime": datetime(2021, 7, 1), "status": "success"} for _ in range(2)])
+    page = get_import_transactions(limit=2)
+    assert len(page["transactions"]) == 2
+    assert page["next_cursor"] is None
+
+
+def test_filters_and_invalid_arguments(db):
+    add_transactions(db, [
+        {"table_name": "jobs", "datetime": datetime(2021, 7, 1), "status": "partial"},
+        {"table_name": "jobs", "datetime": datetime(2021, 7, 2), "status": "success"},
+        {"table_name": "departments", "datetime": datetime(2021, 7, 3), "status": "partial"},
+    ])
+    page = get_import_transactions(table_name="jobs", status="partial")
+    assert [transaction["id"] for transaction in page["transactions"]] == [1]
+
+    with pytest.raises(ValueError):
+        get_import_transactions(limit=0)
+    with pytest.raises(ValueError):
+        get_import_transactions(status="unknown")
+    with pytest.raises(ValueError):
+        get_import_transactions(cursor="not-a-cursor")
+
+
+def test_api_imports_rejects_bad_cursor(client):
+    response = client.get("/api/imports?cursor=bad")
+    assert response.status_code == 400
@@ -0,0 +1,84 @@
+from sqlalchemy import select, text
+
+from models import DepartmentQuarantine, Transaction
+from csv_to_db import process_valid_invalid_results, reprocess_quarantine
+from table_counts import get_table_counts
+
+
+def import_departments(tmp_path, lines, name="departments.csv"):
+    file_path = tmp_path / name
+    file_path.write_text("\n".join(lines) + "\n")
+    return process_valid_invalid_results(str(file_path), 10, "departments")
+
+
+def quarantined_rows(engine):
+    with engine.connect() as connection:
+        return connection.execute(
+            select(DepartmentQuarantine.id, DepartmentQuarantine.department, DepartmentQuarantine.reason, DepartmentQuarantine.status)
+            .order_by(DepartmentQuarantine.quarantine_id)
+        ).fetchall()
+
+
+def departments_count():
+    return get_table_counts()["Total Departments"]
+
+
+def test_quarantine_fix_and_reprocess(db, tmp_path):
+    import_departments(tmp_path, ["1,Sales", "2,", "abc,Legal", "4,Ops"])
+
+    assert departments_count() == 2
+    assert quarantined_rows(db) == [
+        ("2", None, "missing_department", "pending"),
+        ("abc", "Legal", "invalid_id", "pending"),
+    ]
+    with db.connect() as connection:
+        import_id = connection.execute(select(Transaction.import_id)).scalar()
+        assert connection.execute(select(DepartmentQuarantine.import_id).distinct()).scalars().all() == [import_id]
+
+    # fix the rows: the second one gets an id that already exists
+    with db.begin() as connection:
+        connection.execute(text("UPDATE departments_quarantine SET department = 'HR' WHERE id = '2'"))
+        connection.execute(text("UPDATE departments_quarantine SET id = '1' WHERE id = 'abc'"))
+
+    is_valid, result = reprocess_quarantine("departments", import_id=import_id)
+    assert is_valid, result
+    assert (result["reprocessed"], result["duplicated"], result["invalid"]) == (1, 1, 0)
+    assert departments_count() == 3
+    assert quarantined_rows(db) == [
+        ("2", "HR", "missing_department", "reprocessed"),
+        ("1", "Legal", "duplicate_id", "pending"),
+    ]
+
+    with db.begin() as connection:
+        connection.execute(text("UPDATE departments_quarantine SET id = '5' WHERE status = 'pending'"))
+    is_valid, result = reprocess_quarantine("departments")
+    assert is_valid, result
+    assert result["reprocessed"] == 1
+    assert departments_count() == 4
+    with db.connect() as connection:
+        assert connection.execute(text("SELECT department FROM departments WHERE id = 5")).scalar() == "Legal"
+
+    # nothing pending left
+    is_valid, result = reprocess_quarantine("departments")
+    assert (result["reprocessed"], result["duplicated"], result["invalid"]) == (0, 0, 0)
+
+
+def test_rejected_batch_rows_are_quarantined(db, tmp_path):
+    import_departments(tmp_path, ["1,Sales"])
+    import_departments(tmp_path, ["1,Again", "x,"], name="departments_again.csv")
+
+    assert departments_count() == 1
+    assert quarantined_rows(db) == [
+        ("x", None, "invalid_id,missing_department", "pending"),
+        ("1", "Again", "batch_rejected", "pending"),
+    ]
+    # still a duplicate of the imported row
+    is_valid, result = reprocess_quarantine("departments")
+    assert is_valid and result["duplicated"] == 1 and result["invalid"] == 1
+
+
+def test_reprocess_endpoint_validates_table_name(client):
+    assert client.post("/quarantine/reprocess", data={"table_name": "users"}).status_code == 400
+    response = client.post("/quarantine/reprocess", data={"table_name": "jobs"})
+    assert response.status_code == 200
+    assert response.get_json()["reprocessed"] == 0
@@ -0,0 +1,42 @@
+from sqlalchemy import create_engine
+
+import read_replica
+import table_counts
+from models import engine
+from read_replica import get_read_engine, primary_reads
+
+
+def use_replica(monkeypatch, lag=0.0):
+    # second engine on the same SQLite file as a stand-in replica
+    replica = create_engine(engine.url)
+    monkeypatch.setattr(read_replica, "read_engine", replica)
+    monkeypatch.setattr(read_replica, "get_replica_lag", lambda: lag)
+    return replica
+
+
+def test_reads_after_writes_use_the_primary(db, monkeypatch):
+    replica = use_replica(monkeypatch)
+
+    assert get_read_engine() is replica
+    assert get_read_engine(fresh=True) is engine
+    with primary_reads():
+        assert get_read_engine() is engine
+    assert get_read_engine() is replica
+
+
+def test_lagging_replica_falls_back_to_the_primary(db, monkeypatch):
+    use_replica(monkeypatch, lag=60.0)
+    assert get_read_engine() is engine
+
+
+def test_table_counts_reload_from_primary_after_invalidation(db, monkeypatch):
+    use_replica(monkeypatch)
+    engines = []
+    monkeypatch.setattr(table_counts, "get_read_engine", lambda fresh=False: engines.append(fresh) or get_read_engine(fresh))
+
+    table_counts.invalidate_table_counts_cache()
+    table_counts.get_table_counts()
+    table_counts.table_counts_cache["loaded_at"] = 0.0  # TTL expired
+    table_counts.get_table_counts()
+
+    assert engines == [True, False]
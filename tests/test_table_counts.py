@@ -0,0 +1,21 @@
+from sqlalchemy import insert, text
+
+from models import Department
+from table_counts import COUNTED_TABLES, add_table_count, get_table_counts
+
+
+def test_init_db_seeds_all_counts(db):
+    with db.connect() as connection:
+        stored = dict(connection.execute(text("SELECT table_name, row_count FROM table_counts")).fetchall())
+    assert stored == {table_name: 0 for table_name in COUNTED_TABLES}
+
+
+def test_add_table_count_without_seeded_row(db):
+    with db.begin() as connection:
+        connection.execute(text("DELETE FROM table_counts WHERE table_name = 'departments'"))
+    with db.begin() as connection:
+        connection.execute(insert(Department), [{"id": 1, "department": "a"}, {"id": 2, "department": "b"}])
+        add_table_count(connection, "departments", 2)
+    with db.begin() as connection:
+        add_table_count(connection, "departments", 1)
+    assert get_table_counts()["Total Departments"] == 3
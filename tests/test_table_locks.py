@@ -0,0 +1,52 @@
+import pytest
+
+import file_importer
+import table_locks
+from config import TABLE_LOCK_MAX_WAITERS
+from table_locks import TableBusyError, acquire_table_lock, release_table_lock, table_lock
+
+
+def test_lock_wait_timeout_returns_429(client):
+    lock = acquire_table_lock("jobs", "test")
+    try:
+        response = client.post("/force-truncate-table", data={"table_name": "jobs"})
+    finally:
+        release_table_lock(lock)
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+    assert response.get_json()["table_name"] == "jobs"
+    # the lock is free again once the holder releases it
+    release_table_lock(acquire_table_lock("jobs", "test", timeout=0))
+
+
+def test_full_wait_queue_is_rejected_right_away(db, monkeypatch):
+    monkeypatch.setitem(table_locks.waiters, "departments", TABLE_LOCK_MAX_WAITERS)
+    with pytest.raises(TableBusyError) as error:
+        acquire_table_lock("departments", "test", timeout=10)
+    assert error.value.reason == "queue full"
+
+
+def test_locks_of_different_tables_are_independent(db):
+    with table_lock("jobs", "test"), table_lock("departments", "test", timeout=0):
+        pass
+
+
+def test_invalid_table_name(db):
+    with pytest.raises(ValueError):
+        acquire_table_lock("jobs; DROP TABLE jobs")
+
+
+def test_cli_import_gives_up_on_busy_table(db, monkeypatch):
+    attempts = []
+
+    def busy_table(*args, **kwargs):
+        attempts.append(1)
+        raise TableBusyError("jobs", "lock wait timeout", retry_after=0)
+
+    monkeypatch.setattr(file_importer, "process_valid_invalid_results", busy_table)
+    result = file_importer.import_file("jobs.csv", "jobs", 1000, False, max_lock_wait=0.2)
+
+    assert result["status"] == "error"
+    assert "gave up" in result["error"]
+    assert len(attempts) > 1
@@ -0,0 +1,154 @@
+# tracing.py
+"""
+Span based tracing of import stages.
+A trace is started per import request, stages and batches record spans (duration + row counts) with `span()`
+or the `traced()` decorator. Spans are added to the import JSON log and optionally written to a
+Chrome trace-event file (open in chrome://tracing or https://ui.perfetto.dev).
+"""
+import os
+import json
+import time
+import uuid
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+from config import TRACES_FOLDER, TRACE_IMPORTS_TO_FILE
+from artifacts import compress_artifact
+
+# trace of the current import (per thread/request), None when tracing is not active
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """ Collects the spans of one traced operation """
+
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = str(uuid.uuid4())
+        self.start = time.perf_counter()
+        self.spans = []
+
+    def add_span(self, span):
+        self.spans.append(span)
+
+    def get_spans(self, batch_number=None):
+        """ Spans as dictionaries, optionally only the spans of a batch """
+        spans = self.spans if batch_number is None else [s for s in self.spans if s["attrs"].get("batch_number") == batch_number]
+        return [{
+            "name": s["name"],
+            "start_ms": round((s["start"] - self.start) * 1000, 3),
+            "duration_ms": round(s["duration"] * 1000, 3),
+            **s["attrs"],
+        } for s in spans]
+
+    def to_chrome_trace(self):
+        """ Chrome trace-event format (complete events, timestamps in microseconds) """
+        events = [{
+            "name": s["name"],
+            "cat": self.name,
+            "ph": "X",
+            "ts": round((s["start"] - self.start) * 1e6),
+            "dur": round(s["duration"] * 1e6),
+            "pid": os.getpid(),
+            "tid": s["thread_id"],
+            "args": s["attrs"],
+        } for s in self.spans]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace_id": self.trace_id, "name": self.name}}
+
+
+def start_trace(name):
+    """ Start a trace for the current request/thread. Returns the Trace object """
+    trace = Trace(name)
+    current_trace.set(trace)
+    return trace
+
+
+def get_trace_file_path(trace):
+    """ Path of the Chrome trace file of a trace, None if TRACE_IMPORTS_TO_FILE is disabled """
+    if not TRACE_IMPORTS_TO_FILE:
+        return None
+    return f"{TRACES_FOLDER}/{trace.name}___{trace.trace_id}.trace.json"
+
+
+def end_trace(trace):
+    """
+    Stop tracing and write the Chrome trace file if TRACE_IMPORTS_TO_FILE is enabled.
+    Returns:
+        str: path to the trace file or None
+    """
+    current_trace.set(None)
+    file_path = get_trace_file_path(trace)
+    if file_path is None:
+        return None
+    try:
+        with open(file_path, "w") as f:
+            json.dump(trace.to_chrome_trace(), f)
+        compress_artifact(file_path)
+        return file_path
+    except IOError as e:
+        print(f"An error occurred while writing the trace file: {e}")
+        return None
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Record the duration of a with block in the current trace (no-op when no trace is active).
+    Yields a dict of attributes that can be updated inside the block, e.g. span_attrs["rows"] = len(df)
+    """
+    trace = current_trace.get()
+    span_attrs = dict(attrs)
+    start = time.perf_counter()
+    try:
+        yield span_attrs
+    finally:
+        if trace is not None:
+            trace.add_span({
+                "name": name,
+                "start": start,
+                "duration": time.perf_counter() - start,
+                "thread_id": threading.get_ident(),
+                "attrs": span_attrs,
+            })
+
+
+def traced(name=None):
+    """ Decorator recording a span for each call of a function """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_iter(iterable, name):
+    """
+    Wrap an iterator of DataFrames (e.g. pd.read_csv chunks) recording a span for each next() call,
+    so the lazy parsing time of each batch is traced.
+    """
+    iterator = iter(iterable)
+    batch_number = 0
+    while True:
+        batch_number += 1
+        with span(name, batch_number=batch_number) as span_attrs:
+            item = next(iterator, None)
+            span_attrs["rows"] = 0 if item is None else len(item)
+        if item is None:
+            return
+        yield item
+
+
+def get_current_trace():
+    return current_trace.get()
+
+
+def get_current_spans(batch_number=None):
+    """ Spans of the current trace (optionally of one batch), empty list when no trace is active """
+    trace = current_trace.get()
+    if trace is None:
+        return []
+    return trace.get_spans(batch_number)